@@ -1,32 +1,21 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
-import asyncio
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from pydantic import BaseModel
 
+from app.core.config import settings
 from app.core.db import get_db
-from app.models.chats import ChatMessage
 
-from app.rag.pipeline import AgenticRAGPipeline
-from app.rag.vectorstore.vectore_store import PineconeVectorStore
-from app.rag.embeddings.embedding import GeminiEmbedder
-from app.core.gemini import GeminiLLMClient
+from app.core.registry import ClientRegistry, get_registry
 from app.services.rag_chat import RAGService
+from app.services.chat_history import fetch_chat_history, fetch_full_chat_history
+from app.services.message_sink import chat_message_sink
 
 router = APIRouter()
 
 
-vectorstores = {
-    "products-index": PineconeVectorStore("products-index", embedder=GeminiEmbedder()),
-    "services-index": PineconeVectorStore("services-index", embedder=GeminiEmbedder()),
-}
-
-llm = GeminiLLMClient()
-pipeline = AgenticRAGPipeline(vectorstores, llm)
-
 class ChatRequest(BaseModel):
     user_id: str
     query: str
@@ -34,18 +23,21 @@ class ChatRequest(BaseModel):
 
 def get_rag_service(
     db: AsyncSession = Depends(get_db),
+    registry: ClientRegistry = Depends(get_registry),
 ):
-    return RAGService(pipeline=pipeline, db=db)
+    return RAGService(pipeline=registry.get_pipeline(), db=db, sink=chat_message_sink)
 
 
 
-async def stream_answer(service: RAGService, query: str, shop_id: int, user_id: str):
-    result = await service.chat(shop_id=shop_id, query=query, user_id=user_id)
-    answer = result.get("answer", "")
+def to_sse_event(token: str) -> str:
+    # A token may contain newlines; each line must be its own `data:` field
+    # so the client reassembles the token exactly.
+    return "".join(f"data: {line}\n" for line in token.split("\n")) + "\n"
+
 
-    for line in answer.splitlines():
-        yield f"data: {line}\n\n"
-        await asyncio.sleep(0.05)
+async def stream_answer(service: RAGService, query: str, shop_id: int, user_id: str):
+    async for token in service.stream_chat(shop_id=shop_id, query=query, user_id=user_id):
+        yield to_sse_event(token)
 
 
 
@@ -57,7 +49,8 @@ async def chat(
 ):
     return StreamingResponse(
         stream_answer(service, data.query, shop_id, data.user_id),
-        media_type="text/event-stream"
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -65,19 +58,21 @@ async def chat(
 async def get_chat_history(
     shop_id: int,
     user_id: str,
+    limit: int | None = Query(None, ge=1, le=settings.CHAT_HISTORY_MAX_PAGE_SIZE),
+    before: str | None = Query(None, description="next_cursor of the previous page"),
     db: AsyncSession = Depends(get_db)
 ):
-
-    stmt = (
-        select(ChatMessage)
-        .where(
-            ChatMessage.shop_id == shop_id,
-            ChatMessage.user_id == user_id
-        )
-        .order_by(ChatMessage.created_at.asc())
+    """
+    With `limit` and/or `before`: one page, {messages, next_cursor}, of
+    the latest `limit` messages (default CHAT_HISTORY_PAGE_SIZE, oldest
+    first); pass `before=<next_cursor>` to page further back.
+
+    Without either: the whole conversation as a bare list, as before
+    paging existed. Deprecated; kept for existing clients.
+    """
+    if limit is None and before is None:
+        return await fetch_full_chat_history(db, shop_id, user_id)
+    page = await fetch_chat_history(
+        db, shop_id, user_id, limit=limit or settings.CHAT_HISTORY_PAGE_SIZE, before=before
     )
-
-    result = await db.execute(stmt)
-    chats = result.scalars().all()
-
-    return chats
+    return ORJSONResponse(page)
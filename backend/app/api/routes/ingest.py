@@ -1,50 +1,128 @@
 # backend/app/rag/ingest/ingest.py
-from fastapi import APIRouter,Depends
+from typing import Dict
+from fastapi import APIRouter,Depends, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.core.db import get_db
+from app.core.registry import ClientRegistry, get_registry, PRODUCTS_INDEX, SERVICES_INDEX
 
 from app.schemas.product import Product, ProductRequest
 from app.schemas.service import Service
 from app.services.product_ingestor import ProductIngestor
 from app.services.services_ingestor import ServiceIngestor
+from app.services.batch_ingest import collect_batch, ingest_in_windows, summarize
+from app.services.ingest_jobs import ingest_job_queue
 
 router = APIRouter()
 
+
+def get_product_ingestor(
+    shop_id: int,
+    db: AsyncSession = Depends(get_db),
+    registry: ClientRegistry = Depends(get_registry),
+) -> ProductIngestor:
+    return ProductIngestor(
+        shop_id,
+        db=db,
+        vectorstore=registry.store(PRODUCTS_INDEX),
+        sparse_index=registry.sparse_index(PRODUCTS_INDEX)
+    )
+
+
+def get_service_ingestor(
+    shop_id: int,
+    db: AsyncSession = Depends(get_db),
+    registry: ClientRegistry = Depends(get_registry),
+) -> ServiceIngestor:
+    return ServiceIngestor(
+        shop_id,
+        db=db,
+        vectorstore=registry.store(SERVICES_INDEX),
+        sparse_index=registry.sparse_index(SERVICES_INDEX)
+    )
+
+
+def queued() -> bool:
+    return settings.INGEST_MODE == "queued"
+
+
+async def enqueue(response: Response, shop_id: int, kind: str, operation: str, payload: Dict, total: int = 1) -> Dict:
+    """
+    Queue the work for the ingest workers and answer 202 with the job id
+    (progress at GET /jobs/{job_id}).
+    """
+    job = await ingest_job_queue.enqueue(shop_id, kind, operation, payload, total=total)
+    response.status_code = status.HTTP_202_ACCEPTED
+    return {"status": "queued", "job_id": job.id}
+
+
+async def enqueue_batch(request: Request, response: Response, shop_id: int, kind: str, schema) -> Dict:
+    entries, errors = await collect_batch(request, schema)
+    payload = {"items": entries, "errors": errors}
+    return await enqueue(response, shop_id, kind, "ingest_batch", payload, total=len(entries) + len(errors))
+
+
 @router.post("/shops/{shop_id}/products")
-async def ingest_products(shop_id: int, product: ProductRequest,db: AsyncSession = Depends(get_db)):
-  
-    ingestor = ProductIngestor(shop_id,db = db)
+async def ingest_products(shop_id: int, product: ProductRequest, response: Response, ingestor: ProductIngestor = Depends(get_product_ingestor)):
+    if queued():
+        return await enqueue(response, shop_id, "product", "ingest", {"item": product.model_dump(mode="json")})
     await ingestor.preprocess_to_store_embedding(product)
     return {"status": "success", "ingested_products": 1}
 
+@router.post("/shops/{shop_id}/products/batch")
+async def ingest_products_batch(shop_id: int, request: Request, response: Response, ingestor: ProductIngestor = Depends(get_product_ingestor)):
+    """
+    Body: JSON array of products, or NDJSON (Content-Type: application/x-ndjson).
+    """
+    if queued():
+        return await enqueue_batch(request, response, shop_id, "product", ProductRequest)
+    results = await ingest_in_windows(request, ProductRequest, ingestor.ingest_batch)
+    return {**summarize(results), "results": results}
+
 @router.put("/shops/{shop_id}/products")
-async def update_product_embeddings(shop_id: int, product: ProductRequest,db: AsyncSession = Depends(get_db)):
-    ingestor = ProductIngestor(shop_id,db = db)
+async def update_product_embeddings(shop_id: int, product: ProductRequest, response: Response, ingestor: ProductIngestor = Depends(get_product_ingestor)):
+    if queued():
+        return await enqueue(response, shop_id, "product", "update", {"item": product.model_dump(mode="json")})
     await ingestor.update_product_embedding(product)
     return {"status": "success", "updated_product_uid": product.uid}
 
 @router.delete("/shops/{shop_id}/products/{product_uid}")
-async def delete_product_embeddings(shop_id: int, product_uid: str,db: AsyncSession = Depends(get_db)):
-    ingestor = ProductIngestor(shop_id,db = db)
+async def delete_product_embeddings(shop_id: int, product_uid: str, response: Response, ingestor: ProductIngestor = Depends(get_product_ingestor)):
+    if queued():
+        return await enqueue(response, shop_id, "product", "delete", {"uid": product_uid})
     await ingestor.delete_product_embedding(product_uid)
     return {"status": "success", "deleted_product_uid": product_uid}
 
 
 @router.post("/shops/{shop_id}/service")
-async def ingest_service(shop_id: int, service: Service,db: AsyncSession = Depends(get_db)):
-    ingestor = ServiceIngestor(shop_id,db = db)
+async def ingest_service(shop_id: int, service: Service, response: Response, ingestor: ServiceIngestor = Depends(get_service_ingestor)):
+    if queued():
+        return await enqueue(response, shop_id, "service", "ingest", {"item": service.model_dump(mode="json")})
     await ingestor.preprocess_to_store_embedding(service)
     return {"status": "success", "ingested_service": service.id}
 
 
+@router.post("/shops/{shop_id}/service/batch")
+async def ingest_services_batch(shop_id: int, request: Request, response: Response, ingestor: ServiceIngestor = Depends(get_service_ingestor)):
+    """
+    Body: JSON array of services, or NDJSON (Content-Type: application/x-ndjson).
+    """
+    if queued():
+        return await enqueue_batch(request, response, shop_id, "service", Service)
+    results = await ingest_in_windows(request, Service, ingestor.ingest_batch)
+    return {**summarize(results), "results": results}
+
+
 @router.put("/shops/{shop_id}/service")
-async def update_service_embeddings(shop_id: int, service: Service,db: AsyncSession = Depends(get_db)):
-    ingestor = ServiceIngestor(shop_id,db = db)
+async def update_service_embeddings(shop_id: int, service: Service, response: Response, ingestor: ServiceIngestor = Depends(get_service_ingestor)):
+    if queued():
+        return await enqueue(response, shop_id, "service", "update", {"item": service.model_dump(mode="json")})
     await ingestor.update_service_embedding(service)
     return {"status": "success", "updated_service_uid": service.uid}
 
 @router.delete("/shops/{shop_id}/service/{service_uid}")
-async def delete_service_embeddings(shop_id: int, service_uid: str,db: AsyncSession = Depends(get_db)):
-    ingestor = ServiceIngestor(shop_id,db = db)
+async def delete_service_embeddings(shop_id: int, service_uid: str, response: Response, ingestor: ServiceIngestor = Depends(get_service_ingestor)):
+    if queued():
+        return await enqueue(response, shop_id, "service", "delete", {"uid": service_uid})
     await ingestor.delete_service_embedding(service_uid)
     return {"status": "success", "deleted_service_uid": service_uid}
\ No newline at end of file
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException
+
+from app.schemas.ingest_job import IngestJobStatus
+from app.services.ingest_jobs import ingest_job_queue
+
+router = APIRouter()
+
+
+@router.get("/jobs/{job_id}", response_model=IngestJobStatus)
+async def get_ingest_job(job_id: str):
+    """
+    Progress of a queued ingest job: status (queued, running, succeeded,
+    partial, failed), processed/succeeded/failed item counts, per-item
+    results of batches and the error of a failed job.
+    """
+    job = await ingest_job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -4,5 +4,142 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+
+    # Shared client pools, created once per process by app.core.registry
+    PINECONE_POOL_THREADS: int = int(os.getenv("PINECONE_POOL_THREADS", "4"))
+    PINECONE_CONNECTION_POOL_MAXSIZE: int = int(os.getenv("PINECONE_CONNECTION_POOL_MAXSIZE", "20"))
+    GEMINI_MAX_CONNECTIONS: int = int(os.getenv("GEMINI_MAX_CONNECTIONS", "50"))
+
+    # Embedding size used for ingestion, queries and index creation (768, 1536
+    # or 3072). Existing Pinecone indexes must be rebuilt when this changes.
+    EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "3072"))
+
+    # Vector store backend: "pinecone" or "numpy" (in-process, per-shop
+    # matrices persisted under VECTOR_STORE_DIR as memory-mapped snapshots
+    # plus append-only change logs; an empty dir keeps vectors in memory only)
+    VECTOR_STORE_BACKEND: str = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+    VECTOR_STORE_DIR: str = os.getenv("VECTOR_STORE_DIR", "data/vectors")
+
+    # Hybrid retrieval: per-shop BM25 fused with dense results (RRF).
+    # BM25_DIR persists the keyword index (processes on one host may share
+    # it; an index that starts empty is rebuilt from the chunk texts in the
+    # database, see scripts/rebuild_bm25.py); empty keeps it in memory only.
+    HYBRID_RETRIEVAL_ENABLED: bool = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+    BM25_DIR: str = os.getenv("BM25_DIR", "data/bm25")
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    HYBRID_FETCH_MULTIPLIER: int = int(os.getenv("HYBRID_FETCH_MULTIPLIER", "2"))
+
+    # Bulk catalog ingestion
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+    UPSERT_BATCH_SIZE: int = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+    INGEST_CONCURRENCY: int = int(os.getenv("INGEST_CONCURRENCY", "4"))
+    INGEST_BATCH_WINDOW: int = int(os.getenv("INGEST_BATCH_WINDOW", "500"))
+    INGEST_BATCH_MAX_ITEMS: int = int(os.getenv("INGEST_BATCH_MAX_ITEMS", "10000"))
+
+    # Shared embedding scheduler: packs texts of concurrent callers into
+    # EMBED_BATCH_SIZE-text requests within the embedding API quota (token
+    # buckets refilled per minute holding up to EMBED_BURST_SECONDS of
+    # quota; 0 disables a limit). Query embeddings go first; ingestion
+    # texts wait up to EMBED_SCHEDULER_MAX_WAIT_MS to fill a batch
+    EMBED_SCHEDULER_ENABLED: bool = os.getenv("EMBED_SCHEDULER_ENABLED", "true").lower() == "true"
+    EMBED_RPM_LIMIT: float = float(os.getenv("EMBED_RPM_LIMIT", "3000"))
+    EMBED_TPM_LIMIT: float = float(os.getenv("EMBED_TPM_LIMIT", "1000000"))
+    EMBED_BURST_SECONDS: float = float(os.getenv("EMBED_BURST_SECONDS", "5"))
+    EMBED_SCHEDULER_MAX_WAIT_MS: float = float(os.getenv("EMBED_SCHEDULER_MAX_WAIT_MS", "20"))
+    EMBED_SCHEDULER_MAX_IN_FLIGHT: int = int(os.getenv("EMBED_SCHEDULER_MAX_IN_FLIGHT", "4"))
+
+    # Ingest routes: "queued" (answer 202 with a job id; background workers
+    # run the job from the ingest_jobs table) or "inline" (run within the
+    # request). INGEST_JOB_WORKERS=0 runs no workers in this process.
+    # Jobs failing with a transient error are retried after
+    # INGEST_JOB_RETRY_SECONDS, doubling per attempt
+    INGEST_MODE: str = os.getenv("INGEST_MODE", "queued")
+    INGEST_JOB_WORKERS: int = int(os.getenv("INGEST_JOB_WORKERS", "4"))
+    INGEST_JOB_POLL_SECONDS: float = float(os.getenv("INGEST_JOB_POLL_SECONDS", "1"))
+    INGEST_JOB_LEASE_SECONDS: float = float(os.getenv("INGEST_JOB_LEASE_SECONDS", "300"))
+    INGEST_JOB_MAX_ATTEMPTS: int = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+    INGEST_JOB_RETRY_SECONDS: float = float(os.getenv("INGEST_JOB_RETRY_SECONDS", "5"))
+
+    # Upper bound on threads running CPU-bound cross-encoder scoring
+    RERANK_MAX_WORKERS: int = int(os.getenv("RERANK_MAX_WORKERS", "2"))
+
+    # Cross-request micro-batching of cross-encoder pairs
+    RERANK_BATCHING_ENABLED: bool = os.getenv("RERANK_BATCHING_ENABLED", "true").lower() == "true"
+    RERANK_MAX_BATCH_SIZE: int = int(os.getenv("RERANK_MAX_BATCH_SIZE", "64"))
+    RERANK_MAX_WAIT_MS: float = float(os.getenv("RERANK_MAX_WAIT_MS", "5"))
+
+    # Reranker backend: "torch" (sentence-transformers) or "onnx" (int8 ONNX Runtime)
+    RERANKER_BACKEND: str = os.getenv("RERANKER_BACKEND", "torch")
+    RERANKER_ONNX_DIR: str = os.getenv("RERANKER_ONNX_DIR", "models/reranker-onnx")
+    RERANKER_MAX_LENGTH: int = int(os.getenv("RERANKER_MAX_LENGTH", "256"))
+    RERANKER_BUCKET_SIZE: int = int(os.getenv("RERANKER_BUCKET_SIZE", "16"))
+    RERANKER_INTRA_OP_THREADS: int = int(os.getenv("RERANKER_INTRA_OP_THREADS", "1"))
+
+    # Query-embedding cache in front of the embedder on the chat path
+    EMBED_CACHE_MAX_SIZE: int = int(os.getenv("EMBED_CACHE_MAX_SIZE", "2048"))
+    EMBED_CACHE_TTL_SECONDS: int = int(os.getenv("EMBED_CACHE_TTL_SECONDS", "3600"))
+    EMBED_CACHE_REDIS_URL: str | None = os.getenv("EMBED_CACHE_REDIS_URL")
+
+    # Local index router: below this confidence the LLM router is consulted
+    ROUTER_CONFIDENCE_THRESHOLD: float = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.6"))
+    ROUTER_CACHE_SIZE: int = int(os.getenv("ROUTER_CACHE_SIZE", "4096"))
+
+    # Speculative retrieval: query every index while the router decides,
+    # then drop the indexes it did not pick (hides retrieval latency behind
+    # the routing call at the cost of extra vector queries)
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "false").lower() == "true"
+
+    # Static prompt prefixes (routing/answer instructions) are sent as a
+    # system instruction; with LLM_CONTEXT_CACHE_ENABLED they are registered
+    # once as Gemini cached content instead (prefixes below the model's
+    # minimum cacheable size fall back to the system instruction)
+    LLM_CONTEXT_CACHE_ENABLED: bool = os.getenv("LLM_CONTEXT_CACHE_ENABLED", "false").lower() == "true"
+    LLM_CONTEXT_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+
+    # Resilience of Gemini / Pinecone calls: per-attempt timeout and overall
+    # deadline (seconds) per dependency, jittered retries on transient
+    # errors, hedged duplicates of idempotent reads once an attempt runs
+    # past HEDGE_PERCENTILE of recent latencies (0 disables hedging), and
+    # circuit breakers that fail fast while a dependency keeps failing
+    GEMINI_LLM_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_LLM_TIMEOUT_SECONDS", "30"))
+    GEMINI_LLM_DEADLINE_SECONDS: float = float(os.getenv("GEMINI_LLM_DEADLINE_SECONDS", "45"))
+    GEMINI_LLM_HEDGING_ENABLED: bool = os.getenv("GEMINI_LLM_HEDGING_ENABLED", "false").lower() == "true"
+    GEMINI_EMBED_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_EMBED_TIMEOUT_SECONDS", "5"))
+    GEMINI_EMBED_DEADLINE_SECONDS: float = float(os.getenv("GEMINI_EMBED_DEADLINE_SECONDS", "12"))
+    PINECONE_QUERY_TIMEOUT_SECONDS: float = float(os.getenv("PINECONE_QUERY_TIMEOUT_SECONDS", "2"))
+    PINECONE_QUERY_DEADLINE_SECONDS: float = float(os.getenv("PINECONE_QUERY_DEADLINE_SECONDS", "5"))
+    RESILIENCE_MAX_RETRIES: int = int(os.getenv("RESILIENCE_MAX_RETRIES", "2"))
+    RESILIENCE_BACKOFF_BASE_SECONDS: float = float(os.getenv("RESILIENCE_BACKOFF_BASE_SECONDS", "0.2"))
+    RESILIENCE_BACKOFF_MAX_SECONDS: float = float(os.getenv("RESILIENCE_BACKOFF_MAX_SECONDS", "2"))
+    RESILIENCE_SYNC_WORKERS: int = int(os.getenv("RESILIENCE_SYNC_WORKERS", "32"))
+    HEDGE_PERCENTILE: float = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    HEDGE_MIN_DELAY_MS: float = float(os.getenv("HEDGE_MIN_DELAY_MS", "50"))
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_SECONDS: float = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+    # Prompt context budget (estimated tokens) for the context packer
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+
+    # Chat history pagination
+    CHAT_HISTORY_PAGE_SIZE: int = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "50"))
+    CHAT_HISTORY_MAX_PAGE_SIZE: int = int(os.getenv("CHAT_HISTORY_MAX_PAGE_SIZE", "200"))
+
+    # Chat message persistence: "write_behind" (queued, batched inserts by a
+    # background task) or "sync" (written before the request continues)
+    CHAT_PERSISTENCE_MODE: str = os.getenv("CHAT_PERSISTENCE_MODE", "write_behind")
+    CHAT_SINK_MAX_QUEUE: int = int(os.getenv("CHAT_SINK_MAX_QUEUE", "10000"))
+    CHAT_SINK_BATCH_SIZE: int = int(os.getenv("CHAT_SINK_BATCH_SIZE", "500"))
+
+    # Per-shop semantic answer cache, invalidated by catalog ingestion. Shop
+    # versions live in Redis when SEMANTIC_CACHE_REDIS_URL is set (required
+    # with several app processes or separate ingest workers); nothing is
+    # cached for SEMANTIC_CACHE_SETTLE_SECONDS after an invalidation while
+    # new vectors become visible to queries
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+    SEMANTIC_CACHE_TTL_SECONDS: int = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "600"))
+    SEMANTIC_CACHE_SETTLE_SECONDS: float = float(os.getenv("SEMANTIC_CACHE_SETTLE_SECONDS", "10"))
+    SEMANTIC_CACHE_REDIS_URL: str | None = os.getenv("SEMANTIC_CACHE_REDIS_URL", os.getenv("EMBED_CACHE_REDIS_URL"))
     
-settings = Settings()
\ No newline at end of file
+settings = Settings()
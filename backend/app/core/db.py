@@ -1,3 +1,4 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
@@ -23,6 +24,37 @@ async def create_db():
         await conn.run_sync(Base.metadata.create_all)
         
         
+async def ensure_indexes(conn) -> None:
+    """
+    create_all only creates indexes together with new tables, so indexes
+    added to an existing table's model are created here (if missing).
+    """
+    def create(sync_conn):
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(sync_conn, checkfirst=True)
+
+    await conn.run_sync(create)
+
+
+async def ensure_columns(conn) -> None:
+    """
+    create_all does not alter existing tables either, so nullable columns
+    added to a model since its table was created are added here.
+    """
+    def add(sync_conn):
+        inspector = inspect(sync_conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+    await conn.run_sync(add)
+
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
@@ -1,36 +1,223 @@
 from google import genai
+from google.genai import types
 from dotenv import load_dotenv
+import asyncio
+import hashlib
+import logging
 import os
+import time
+from typing import AsyncIterator
+from app.core.config import settings
+from app.core.resilience import CallPolicy, ResilientCaller, hedge_percentile
 from app.rag.generation.base.base_generator import BaseLLMClient
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
 
 class GeminiLLMClient(BaseLLMClient):
     """
     Gemini LLM client using Google GenAI.
     Handles initialization and text generation.
+
+    Calls run under a ResilientCaller (deadline, retries, circuit
+    breaker); duplicate hedged generations are opt-in since they are
+    billed.
+
+    Static prompt prefixes (`system`) are sent as the system instruction,
+    or, with context caching enabled, registered once per prefix as
+    cached content so each call only sends and bills the dynamic part.
     """
 
-    def __init__(self, api_key: str | None = None):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model_name: str = "gemini-2.5-flash",
+        client: genai.Client | None = None,
+        context_cache: bool | None = None,
+        cache_ttl_seconds: int | None = None
+    ):
         """
         Initialize Gemini client.
+        client: shared genai.Client; a new one is created when omitted.
+        context_cache: register static prefixes as cached content;
+                       defaults to LLM_CONTEXT_CACHE_ENABLED
+        cache_ttl_seconds: lifetime of each cached prefix
         """
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY must be set in environment variables")
-        self.client = genai.Client(api_key=self.api_key)
+        self.client = client or genai.Client(api_key=self.api_key)
+        self.model_name = model_name
+        self.context_cache = settings.LLM_CONTEXT_CACHE_ENABLED if context_cache is None else context_cache
+        self.cache_ttl_seconds = cache_ttl_seconds or settings.LLM_CONTEXT_CACHE_TTL_SECONDS
+
+        # prefix hash -> (cached content name or None if uncacheable, expiry)
+        self._prefix_caches: dict[str, tuple[str | None, float]] = {}
+        self._cache_lock = asyncio.Lock()
+
+        self.resilience = ResilientCaller("gemini_llm", CallPolicy(
+            attempt_timeout=settings.GEMINI_LLM_TIMEOUT_SECONDS,
+            deadline=settings.GEMINI_LLM_DEADLINE_SECONDS,
+            hedge_percentile=hedge_percentile(settings.GEMINI_LLM_HEDGING_ENABLED)
+        ))
+
+    @staticmethod
+    def _prefix_key(system: str) -> str:
+        return hashlib.sha256(system.encode()).hexdigest()
+
+    def _cached_prefix(self, key: str) -> tuple[bool, str | None]:
+        """
+        (known, cached content name). Entries are refreshed shortly before
+        the server-side TTL runs out.
+        """
+        entry = self._prefix_caches.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return False, None
+        return True, entry[0]
+
+    def _cache_request(self, system: str, key: str) -> dict:
+        return dict(
+            model=self.model_name,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system,
+                display_name=f"prefix-{key[:16]}",
+                ttl=f"{self.cache_ttl_seconds}s"
+            )
+        )
+
+    def _remember_prefix(self, key: str, name: str | None) -> str | None:
+        # Uncacheable prefixes (e.g. below the minimum token count) are
+        # retried after a TTL rather than on every call
+        self._prefix_caches[key] = (name, time.monotonic() + self.cache_ttl_seconds * 0.9)
+        return name
+
+    def register_prefix(self, system: str) -> str | None:
+        """
+        Cached content name for a static prefix, creating it on first use.
+        Returns None when caching is disabled or the prefix is not cacheable.
+        """
+        if not self.context_cache:
+            return None
+        key = self._prefix_key(system)
+        known, name = self._cached_prefix(key)
+        if known:
+            return name
+        try:
+            name = self.client.caches.create(**self._cache_request(system, key)).name
+        except Exception as e:
+            logger.warning(f"Context caching unavailable for prompt prefix, using system instruction: {e}")
+            name = None
+        return self._remember_prefix(key, name)
+
+    async def aregister_prefix(self, system: str) -> str | None:
+        """
+        Async variant of `register_prefix`; concurrent first calls create
+        the cached content once.
+        """
+        if not self.context_cache:
+            return None
+        key = self._prefix_key(system)
+        known, name = self._cached_prefix(key)
+        if known:
+            return name
+        async with self._cache_lock:
+            known, name = self._cached_prefix(key)
+            if known:
+                return name
+            try:
+                name = (await self.client.aio.caches.create(**self._cache_request(system, key))).name
+            except Exception as e:
+                logger.warning(f"Context caching unavailable for prompt prefix, using system instruction: {e}")
+                name = None
+            return self._remember_prefix(key, name)
+
+    @staticmethod
+    def _with_prefix(kwargs: dict, system: str | None, cached_name: str | None) -> dict:
+        """
+        Add the static prefix to the request config, keeping any config the
+        caller passed (temperature, schema, ...). A caller's own system
+        instruction goes after the prefix; the two cannot be split between
+        cached content and the request, so the cache is skipped then.
+        """
+        if not system:
+            return kwargs
+        config = kwargs.get("config")
+        if config is None:
+            config = types.GenerateContentConfig()
+        elif isinstance(config, dict):
+            config = types.GenerateContentConfig.model_validate(config)
+
+        if config.cached_content:
+            raise ValueError("A system prefix cannot be combined with a caller-supplied cached_content")
+        if config.system_instruction is not None:
+            own = config.system_instruction
+            if isinstance(own, types.Content):
+                own = own.parts or []
+            update = {"system_instruction": [system, *(own if isinstance(own, list) else [own])]}
+        elif cached_name:
+            update = {"cached_content": cached_name}
+        else:
+            update = {"system_instruction": system}
+        return {**kwargs, "config": config.model_copy(update=update)}
 
-    def generate(self, prompt: str, **kwargs) -> str:
+    def generate(self, prompt: str, system: str | None = None, **kwargs) -> str:
         """
         Generate text using Gemini LLM.
 
         Args:
-            prompt (str): The input prompt to generate text from.
+            prompt (str): The dynamic part of the prompt.
+            system (str): Optional static prefix (system instruction).
+            **kwargs: Additional parameters for the model.
+
+        Returns:
+            str: Generated text from the model.
+        """
+        cached_name = self.register_prefix(system) if system else None
+        kwargs = self._with_prefix(kwargs, system, cached_name)
+        response = self.resilience.call(
+            lambda: self.client.models.generate_content(model=self.model_name, contents=prompt, **kwargs)
+        )
+        return response.text
+
+    async def agenerate(self, prompt: str, system: str | None = None, **kwargs) -> str:
+        """
+        Generate text using Gemini's native async client so the
+        event loop stays free while waiting on the network.
+
+        Args:
+            prompt (str): The dynamic part of the prompt.
+            system (str): Optional static prefix (system instruction).
             **kwargs: Additional parameters for the model.
 
         Returns:
             str: Generated text from the model.
         """
-        response = self.client.models.generate_content(model="gemini-2.5-flash", contents=prompt, **kwargs)
-        return response.text
\ No newline at end of file
+        cached_name = await self.aregister_prefix(system) if system else None
+        kwargs = self._with_prefix(kwargs, system, cached_name)
+        response = await self.resilience.acall(
+            lambda: self.client.aio.models.generate_content(model=self.model_name, contents=prompt, **kwargs)
+        )
+        return response.text
+
+    async def astream(self, prompt: str, system: str | None = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream text from Gemini as the model produces it. Failures before
+        the first chunk are retried; later ones are raised.
+
+        Args:
+            prompt (str): The dynamic part of the prompt.
+            system (str): Optional static prefix (system instruction).
+            **kwargs: Additional parameters for the model.
+
+        Yields:
+            str: Text chunks in generation order.
+        """
+        cached_name = await self.aregister_prefix(system) if system else None
+        kwargs = self._with_prefix(kwargs, system, cached_name)
+        stream = self.resilience.astream(
+            lambda: self.client.aio.models.generate_content_stream(model=self.model_name, contents=prompt, **kwargs)
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
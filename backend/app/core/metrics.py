@@ -0,0 +1,158 @@
+import asyncio
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Stages of the chat pipeline, chat service and ingestors
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Duration of a chat or ingest stage",
+    ["stage", "index", "outcome"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+CACHE_EVENTS = Counter(
+    "rag_cache_events_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"]
+)
+FALLBACKS = Counter(
+    "rag_fallbacks_total",
+    "Degraded paths taken (default route, unfiltered retrieval, failed rerank, ...)",
+    ["kind"]
+)
+RESILIENCE_EVENTS = Counter(
+    "rag_resilience_events_total",
+    "Retries, hedges, timeouts and circuit breaker events per dependency",
+    ["dependency", "event"]
+)
+
+ALL_INDEXES = "all"
+
+
+class Stage:
+    """
+    A running stage; set `outcome` to record something other than "ok"
+    (exceptions are recorded as "error" automatically).
+    """
+
+    def __init__(self):
+        self.outcome = "ok"
+
+
+class StageTimings:
+    """
+    Stage durations of one request, in milliseconds, keyed by stage
+    ("rerank") or stage and index ("vector_query:products-index").
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, index: str, seconds: float) -> None:
+        key = stage if index == ALL_INDEXES else f"{stage}:{index}"
+        self.stages[key] = round(self.stages.get(key, 0.0) + seconds * 1000, 2)
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(self.stages)
+
+
+_current_timings: ContextVar[StageTimings | None] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def track_request() -> Iterator[StageTimings]:
+    """
+    Collect the stages timed below this point (including in tasks spawned
+    from it) into a StageTimings. Nested calls share the outer request's.
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        yield timings
+        return
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def current_timings() -> StageTimings | None:
+    return _current_timings.get()
+
+
+@contextmanager
+def stage(name: str, index: str = ALL_INDEXES) -> Iterator[Stage]:
+    """
+    Time a block into rag_stage_seconds and the current request's timings.
+    """
+    running = Stage()
+    start = time.perf_counter()
+    try:
+        yield running
+    except (asyncio.CancelledError, GeneratorExit):
+        # Client went away mid-stream or the task was cancelled
+        running.outcome = "cancelled"
+        raise
+    except BaseException:
+        running.outcome = "error"
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, index, running.outcome)
+
+
+def observe(name: str, seconds: float, index: str = ALL_INDEXES, outcome: str = "ok") -> None:
+    """
+    Record a duration measured by the caller (e.g. time to first token).
+    """
+    STAGE_SECONDS.labels(stage=name, index=index, outcome=outcome).observe(seconds)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(name, index, seconds)
+
+
+def timed(name: str, index: str = ALL_INDEXES):
+    """
+    Decorator form of `stage` for async functions.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage(name, index):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache: str, hit: bool, count: int = 1) -> None:
+    if count:
+        CACHE_EVENTS.labels(cache=cache, result="hit" if hit else "miss").inc(count)
+
+
+def record_fallback(kind: str) -> None:
+    FALLBACKS.labels(kind=kind).inc()
+
+
+def render_latest() -> tuple[bytes, str]:
+    """
+    Exposition for /metrics. Under multi-process servers (gunicorn
+    workers) set PROMETHEUS_MULTIPROC_DIR so every worker is aggregated.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+
+import httpx
+from google import genai
+from google.genai import types
+from pinecone import Pinecone
+
+from app.core.config import settings
+from app.core.gemini import GeminiLLMClient
+from app.rag.cache.semantic_cache import semantic_answer_cache
+from app.rag.embeddings.cached_embedder import CachingEmbedder, RedisEmbeddingBackend
+from app.rag.embeddings.embedding import GeminiEmbedder
+from app.rag.embeddings.scheduler import EmbeddingScheduler
+from app.rag.generation.batching_reranker import BatchingReranker
+from app.rag.generation.reranker import create_reranker
+from app.rag.pipeline import AgenticRAGPipeline
+from app.rag.vectorstore.bm25_index import BM25Index
+from app.rag.vectorstore.numpy_store import NumpyVectorStore
+from app.rag.vectorstore.vectore_store import PineconeVectorStore
+
+logger = logging.getLogger(__name__)
+
+PRODUCTS_INDEX = "products-index"
+SERVICES_INDEX = "services-index"
+INDEX_NAMES = [PRODUCTS_INDEX, SERVICES_INDEX]
+# Metadata key holding the product/service id of each index's chunks
+INDEX_ID_KEYS = {PRODUCTS_INDEX: "product_id", SERVICES_INDEX: "service_id"}
+
+
+class RegistryNotReadyError(RuntimeError):
+    """
+    A client was requested before the registry was initialized.
+    """
+
+
+class ClientRegistry:
+    """
+    Process-wide owner of long-lived clients.
+
+    Built once at startup: one Gemini client (shared HTTP pools), one
+    embedder (behind the shared embedding scheduler: ingestion embeds at
+    background priority, chat queries at interactive), one vector store per index (Pinecone, sharing one client, or
+    the in-process NumPy backend per VECTOR_STORE_BACKEND), plus the
+    chat pipeline. Request handlers and ingestors borrow instances from here
+    instead of constructing their own.
+    """
+
+    def __init__(self):
+        self.genai_client: genai.Client | None = None
+        self.pinecone: Pinecone | None = None
+        self.embedder = None
+        self.embed_scheduler: EmbeddingScheduler | None = None
+        self.query_embedder = None
+        self.llm = None
+        self.vectorstores: dict = {}
+        self.sparse_indexes: dict = {}
+        self.pipeline: AgenticRAGPipeline | None = None
+        self._http_clients: tuple[httpx.Client, httpx.AsyncClient] | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.pipeline is not None
+
+    def _build_genai_client(self) -> genai.Client:
+        limits = httpx.Limits(
+            max_connections=settings.GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GEMINI_MAX_CONNECTIONS
+        )
+        self._http_clients = (httpx.Client(limits=limits), httpx.AsyncClient(limits=limits))
+        return genai.Client(
+            api_key=os.getenv("GEMINI_API_KEY"),
+            http_options=types.HttpOptions(
+                httpx_client=self._http_clients[0],
+                httpx_async_client=self._http_clients[1]
+            )
+        )
+
+    def _build_vectorstores(self) -> dict:
+        if settings.VECTOR_STORE_BACKEND == "numpy":
+            return {
+                name: NumpyVectorStore(
+                    name,
+                    embedder=self.embedder,
+                    dimension=settings.EMBEDDING_DIMENSION,
+                    data_dir=settings.VECTOR_STORE_DIR or None
+                )
+                for name in INDEX_NAMES
+            }
+
+        self.pinecone = Pinecone(
+            api_key=os.getenv("PINECONE_API_KEY"),
+            pool_threads=settings.PINECONE_POOL_THREADS
+        )
+        existing = {index.name: index.dimension for index in self.pinecone.list_indexes()}
+        return {
+            name: PineconeVectorStore(
+                name,
+                embedder=self.embedder,
+                dimension=settings.EMBEDDING_DIMENSION,
+                client=self.pinecone,
+                existing_indexes=existing,
+                pool_threads=settings.PINECONE_POOL_THREADS,
+                connection_pool_maxsize=settings.PINECONE_CONNECTION_POOL_MAXSIZE
+            )
+            for name in INDEX_NAMES
+        }
+
+    def init(self) -> None:
+        """
+        Create every client. Blocking (lists Pinecone indexes once or loads
+        the local vector partitions), so call it via `ainit` from async code.
+        """
+        if self.ready:
+            return
+
+        self.genai_client = self._build_genai_client()
+        self.embedder = GeminiEmbedder(
+            client=self.genai_client,
+            output_dimensionality=settings.EMBEDDING_DIMENSION
+        )
+        query_embedder = self.embedder
+        if settings.EMBED_SCHEDULER_ENABLED:
+            self.embed_scheduler = EmbeddingScheduler(self.embedder)
+            self.embedder = self.embed_scheduler.background
+            query_embedder = self.embed_scheduler.interactive
+        self.llm = GeminiLLMClient(client=self.genai_client)
+
+        self.vectorstores = self._build_vectorstores()
+        if settings.HYBRID_RETRIEVAL_ENABLED:
+            self.sparse_indexes = {
+                name: BM25Index(name, data_dir=settings.BM25_DIR or None) for name in INDEX_NAMES
+            }
+
+        self.query_embedder = CachingEmbedder(
+            query_embedder,
+            max_size=settings.EMBED_CACHE_MAX_SIZE,
+            ttl_seconds=settings.EMBED_CACHE_TTL_SECONDS,
+            backend=RedisEmbeddingBackend(settings.EMBED_CACHE_REDIS_URL) if settings.EMBED_CACHE_REDIS_URL else None
+        )
+
+        reranker = create_reranker()
+        if settings.RERANK_BATCHING_ENABLED:
+            reranker = BatchingReranker(reranker)
+
+        self.pipeline = AgenticRAGPipeline(
+            self.vectorstores,
+            self.llm,
+            embedder=self.query_embedder,
+            answer_cache=semantic_answer_cache if settings.SEMANTIC_CACHE_ENABLED else None,
+            reranker=reranker,
+            sparse_indexes=self.sparse_indexes
+        )
+        logger.info(f"ClientRegistry ready with indexes: {list(self.vectorstores)}")
+
+    async def ainit(self) -> None:
+        await asyncio.to_thread(self.init)
+
+    def _require_ready(self) -> None:
+        # Never build clients lazily here: `init` blocks, and these are
+        # called from request handlers on the event loop
+        if not self.ready:
+            raise RegistryNotReadyError(
+                "ClientRegistry is not initialized; await registry.ainit() at startup "
+                "(the app lifespan does) or call registry.init() in scripts"
+            )
+
+    def store(self, index_name: str) -> PineconeVectorStore | NumpyVectorStore:
+        self._require_ready()
+        return self.vectorstores[index_name]
+
+    def sparse_index(self, index_name: str) -> BM25Index | None:
+        self._require_ready()
+        return self.sparse_indexes.get(index_name)
+
+    def get_pipeline(self) -> AgenticRAGPipeline:
+        self._require_ready()
+        return self.pipeline
+
+    async def aclose(self) -> None:
+        if self.embed_scheduler is not None:
+            await self.embed_scheduler.aclose()
+        for vectorstore in self.vectorstores.values():
+            await vectorstore.aclose()
+        if self._http_clients is not None:
+            self._http_clients[0].close()
+            await self._http_clients[1].aclose()
+
+
+registry = ClientRegistry()
+
+
+def get_registry() -> ClientRegistry:
+    return registry
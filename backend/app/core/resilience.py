@@ -0,0 +1,467 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import RESILIENCE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised without calling the dependency while its breaker is open.
+    """
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Timeouts, connection failures, throttling and 5xx are worth another
+    attempt (and count against the breaker); other errors are the caller's
+    and are raised as is.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    for attr in ("code", "status", "status_code"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int):
+            return status in RETRYABLE_STATUS
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name or "ServerError" in name
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker. After `failure_threshold` failures in a
+    row it opens and rejects calls for `reset_seconds`; then one trial call
+    is let through (half-open) and its outcome closes or re-opens it.
+
+    `allow` hands out a ticket ("closed" or "trial"); every admitted call
+    must end with `record_success`, `record_failure` or `release` for its
+    ticket, including when it is cancelled.
+    """
+
+    def __init__(self, name: str, failure_threshold: int | None = None, reset_seconds: float | None = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_seconds = settings.CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> str | None:
+        """
+        Ticket for a call, or None when it must be rejected.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return "trial"
+            return None
+
+    def record_success(self, ticket: str = "closed") -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit {self.name} closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self, ticket: str = "closed") -> None:
+        with self._lock:
+            self.failures += 1
+            trial = ticket == "trial"
+            if trial or self.failures >= self.failure_threshold:
+                if self.opened_at is None or trial:
+                    logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                    RESILIENCE_EVENTS.labels(dependency=self.name, event="circuit_opened").inc()
+                self.opened_at = time.monotonic()
+            if trial:
+                self._trial_in_flight = False
+
+    def release(self, ticket: str = "closed") -> None:
+        """
+        Call ended without a verdict (a caller error or cancellation).
+        """
+        if ticket == "trial":
+            with self._lock:
+                self._trial_in_flight = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(name: str) -> CircuitBreaker:
+    """
+    One breaker per dependency, shared by every client talking to it.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+class LatencyTracker:
+    """
+    Rolling window of successful attempt durations.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+@dataclass
+class CallPolicy:
+    """
+    attempt_timeout: deadline of a single attempt (seconds)
+    deadline: budget for the whole call, retries and backoff included
+    retries: extra attempts after a retryable failure
+    hedge_percentile: send a duplicate attempt once the first has run
+                      longer than this percentile of recent latencies;
+                      None disables hedging (non-idempotent or costly calls)
+    """
+    attempt_timeout: float
+    deadline: float
+    retries: int = settings.RESILIENCE_MAX_RETRIES
+    backoff_base: float = settings.RESILIENCE_BACKOFF_BASE_SECONDS
+    backoff_max: float = settings.RESILIENCE_BACKOFF_MAX_SECONDS
+    hedge_percentile: float | None = None
+    hedge_min_delay: float = settings.HEDGE_MIN_DELAY_MS / 1000
+
+
+def hedge_percentile(enabled: bool = True) -> float | None:
+    """
+    Configured hedging percentile, or None when hedging is off.
+    """
+    return (settings.HEDGE_PERCENTILE or None) if enabled else None
+
+
+async def _aclose(iterator) -> None:
+    # Releases the provider's connection; the iterator may already be done
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is None:
+        return
+    try:
+        await aclose()
+    except Exception as e:
+        logger.debug(f"Closing a stream failed: {e}")
+
+
+_sync_executor: ThreadPoolExecutor | None = None
+_sync_executor_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _sync_executor
+    with _sync_executor_lock:
+        if _sync_executor is None:
+            _sync_executor = ThreadPoolExecutor(
+                max_workers=settings.RESILIENCE_SYNC_WORKERS, thread_name_prefix="resilient-call"
+            )
+        return _sync_executor
+
+
+class ResilientCaller:
+    """
+    Deadlines, jittered retries, hedging and a circuit breaker around calls
+    to one dependency.
+
+    Callers pass a zero-argument function that starts the call (so it can
+    be started again for a retry or a hedge). Sync calls run on a bounded
+    thread pool so they can time out; a timed-out thread is abandoned, not
+    killed, and its result is discarded.
+    """
+
+    def __init__(self, name: str, policy: CallPolicy, breaker: CircuitBreaker | None = None):
+        self.name = name
+        self.policy = policy
+        self.breaker = breaker or breaker_for(name)
+        self.latencies = LatencyTracker()
+
+    def _event(self, event: str) -> None:
+        RESILIENCE_EVENTS.labels(dependency=self.name, event=event).inc()
+
+    def _admit(self) -> str:
+        ticket = self.breaker.allow()
+        if ticket is None:
+            self._event("short_circuit")
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        return ticket
+
+    def _hedge_delay(self) -> float | None:
+        if self.policy.hedge_percentile is None:
+            return None
+        observed = self.latencies.percentile(self.policy.hedge_percentile)
+        if observed is None:
+            return None
+        return max(observed, self.policy.hedge_min_delay)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries of many callers hit by the same blip
+        return random.uniform(0, min(self.policy.backoff_max, self.policy.backoff_base * 2 ** attempt))
+
+    def _deadline_exceeded(self, last_error: BaseException | None = None) -> TimeoutError:
+        self._event("timeout")
+        error = TimeoutError(f"{self.name} call exceeded its {self.policy.deadline:.2f}s deadline")
+        error.__cause__ = last_error
+        return error
+
+    def _should_retry(self, exc: BaseException, attempt: int, remaining: float) -> bool:
+        return is_retryable(exc) and attempt < self.policy.retries and remaining > 0
+
+    def _finish(self, ticket: str, exc: BaseException | None) -> None:
+        if exc is None:
+            self.breaker.record_success(ticket)
+        elif isinstance(exc, Exception) and is_retryable(exc):
+            self.breaker.record_failure(ticket)
+        else:
+            # Caller errors, and cancellation (BaseException), say nothing
+            # about the dependency but must free a half-open trial
+            self.breaker.release(ticket)
+
+    # Async
+
+    async def _aattempt(self, start: Callable[[], Awaitable[T]], timeout: float) -> T:
+        began = time.monotonic()
+        delay = self._hedge_delay()
+        tasks = [asyncio.ensure_future(start())]
+        try:
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self._event("hedge")
+                    tasks.append(asyncio.ensure_future(start()))
+
+            error: BaseException | None = None
+            pending = set(tasks)
+            while pending:
+                remaining = timeout - (time.monotonic() - began)
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1 and task is tasks[1]:
+                            self._event("hedge_won")
+                        self.latencies.record(time.monotonic() - began)
+                        return task.result()
+                    error = task.exception()
+            if error is not None and not pending:
+                raise error
+            self._event("timeout")
+            raise TimeoutError(f"{self.name} call exceeded {timeout:.2f}s")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # Mark a losing attempt's failure as seen
+                    task.exception()
+
+    async def acall(self, start: Callable[[], Awaitable[T]]) -> T:
+        ticket = self._admit()
+        try:
+            result = await self._acall(start)
+        except BaseException as e:
+            self._finish(ticket, e)
+            raise
+        self._finish(ticket, None)
+        return result
+
+    async def _acall(self, start: Callable[[], Awaitable[T]]) -> T:
+        began = time.monotonic()
+        attempt = 0
+        last_error: Exception | None = None
+        while True:
+            remaining = self.policy.deadline - (time.monotonic() - began)
+            if remaining <= 0:
+                # The backoff used up the deadline: no attempt without time
+                raise self._deadline_exceeded(last_error)
+            try:
+                return await self._aattempt(start, min(self.policy.attempt_timeout, remaining))
+            except Exception as e:
+                last_error = e
+                remaining = self.policy.deadline - (time.monotonic() - began)
+                if not self._should_retry(e, attempt, remaining):
+                    raise
+                backoff = min(self._backoff(attempt), remaining)
+                logger.warning(f"{self.name} attempt {attempt + 1} failed ({e}); retrying in {backoff:.2f}s")
+                self._event("retry")
+                await asyncio.sleep(backoff)
+                attempt += 1
+
+    async def astream(self, open_stream: Callable[[], Awaitable[AsyncIterator[T]]]) -> AsyncIterator[T]:
+        """
+        Stream with the same protections up to the first item: opening the
+        stream and receiving the first item are retried within the
+        deadline. Once items have been yielded a failure is raised as is,
+        and each further item must arrive within `attempt_timeout`. The
+        provider's iterator is closed however the stream ends, including
+        when the consumer stops early.
+        """
+        ticket = self._admit()
+        try:
+            iterator, first = await self._open_stream(open_stream)
+        except StopAsyncIteration:
+            self._finish(ticket, None)
+            return
+        except BaseException as e:
+            self._finish(ticket, e)
+            raise
+        self._finish(ticket, None)
+
+        try:
+            yield first
+            while True:
+                try:
+                    item = await asyncio.wait_for(iterator.__anext__(), self.policy.attempt_timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    self._event("timeout")
+                    self.breaker.record_failure()
+                    raise
+                yield item
+        finally:
+            await _aclose(iterator)
+
+    async def _open_stream(self, open_stream: Callable[[], Awaitable[AsyncIterator[T]]]) -> tuple[AsyncIterator[T], T]:
+        """
+        (iterator, first item), retried like `acall`. Each attempt gets its
+        own `attempt_timeout` (capped by what is left of the deadline) for
+        opening the stream and receiving the first item.
+        """
+        began = time.monotonic()
+        attempt = 0
+        last_error: Exception | None = None
+        while True:
+            attempt_began = time.monotonic()
+            timeout = min(self.policy.attempt_timeout, self.policy.deadline - (attempt_began - began))
+            if timeout <= 0:
+                raise self._deadline_exceeded(last_error)
+            iterator = None
+            try:
+                stream = await asyncio.wait_for(open_stream(), timeout)
+                iterator = stream.__aiter__()
+                remaining = timeout - (time.monotonic() - attempt_began)
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                return iterator, await asyncio.wait_for(iterator.__anext__(), remaining)
+            except BaseException as e:
+                if iterator is not None:
+                    await _aclose(iterator)
+                if not isinstance(e, Exception) or isinstance(e, StopAsyncIteration):
+                    raise
+                last_error = e
+                if isinstance(e, asyncio.TimeoutError):
+                    self._event("timeout")
+                remaining = self.policy.deadline - (time.monotonic() - began)
+                if not self._should_retry(e, attempt, remaining):
+                    raise
+                self._event("retry")
+                await asyncio.sleep(min(self._backoff(attempt), remaining))
+                attempt += 1
+
+    # Sync
+
+    def _attempt(self, start: Callable[[], T], timeout: float) -> T:
+        began = time.monotonic()
+        delay = self._hedge_delay()
+        futures = [_executor().submit(start)]
+        if delay is not None and delay < timeout:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                self._event("hedge")
+                futures.append(_executor().submit(start))
+
+        error: BaseException | None = None
+        pending = set(futures)
+        while pending:
+            remaining = timeout - (time.monotonic() - began)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if len(futures) > 1 and future is futures[1]:
+                        self._event("hedge_won")
+                    self.latencies.record(time.monotonic() - began)
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+        for future in pending:
+            future.cancel()
+        if error is not None and not pending:
+            raise error
+        self._event("timeout")
+        raise TimeoutError(f"{self.name} call exceeded {timeout:.2f}s")
+
+    def call(self, start: Callable[[], T]) -> T:
+        """
+        Blocking variant of `acall`.
+        """
+        ticket = self._admit()
+        try:
+            result = self._call(start)
+        except BaseException as e:
+            self._finish(ticket, e)
+            raise
+        self._finish(ticket, None)
+        return result
+
+    def _call(self, start: Callable[[], T]) -> T:
+        began = time.monotonic()
+        attempt = 0
+        last_error: Exception | None = None
+        while True:
+            remaining = self.policy.deadline - (time.monotonic() - began)
+            if remaining <= 0:
+                raise self._deadline_exceeded(last_error)
+            try:
+                return self._attempt(start, min(self.policy.attempt_timeout, remaining))
+            except Exception as e:
+                last_error = e
+                remaining = self.policy.deadline - (time.monotonic() - began)
+                if not self._should_retry(e, attempt, remaining):
+                    raise
+                backoff = min(self._backoff(attempt), remaining)
+                logger.warning(f"{self.name} attempt {attempt + 1} failed ({e}); retrying in {backoff:.2f}s")
+                self._event("retry")
+                time.sleep(backoff)
+                attempt += 1
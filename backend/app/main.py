@@ -1,9 +1,14 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import ingest, register_test,chat
+from app.api.routes import ingest, jobs, register_test,chat
 from contextlib import asynccontextmanager
-from app.core.db import engine, Base
-from fastapi.responses import JSONResponse
+from app.core.db import AsyncSessionLocal, engine, Base, ensure_columns, ensure_indexes
+from app.core.registry import registry, INDEX_ID_KEYS
+from app.services.chunk_sync import rebuild_sparse_index
+from app.services.message_sink import chat_message_sink
+from app.services.ingest_jobs import ingest_job_queue
+from fastapi.responses import JSONResponse, Response
+from app.core.metrics import render_latest
 from fastapi.exceptions import RequestValidationError
 import logging
 
@@ -14,10 +19,28 @@ async def lifespan(app: FastAPI):
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_columns(conn)
+        await ensure_indexes(conn)
         logging.info("✅ All tables ensured at startup")
+    await registry.ainit()
+    logging.info("✅ Vector stores and model clients initialized")
+    # BM25_DIR may be on an ephemeral disk: refill empty keyword indexes
+    # from the chunk texts in the database
+    for name, sparse_index in registry.sparse_indexes.items():
+        if sparse_index.empty:
+            async with AsyncSessionLocal() as db:
+                counts = await rebuild_sparse_index(db, sparse_index, INDEX_ID_KEYS[name])
+            logging.info(f"Rebuilt BM25 index '{name}' from the database: {counts}")
+    await chat_message_sink.start()
+    await ingest_job_queue.start()
     yield
    
     logging.info("🛑 App shutting down...")
+    # Let running ingest jobs finish; unfinished ones resume after their lease
+    await ingest_job_queue.stop()
+    # Flush queued chat messages before the engine goes away
+    await chat_message_sink.stop()
+    await registry.aclose()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -31,9 +54,18 @@ app.add_middleware(
 
 
 app.include_router(ingest.router, prefix="/api/v1")  
+app.include_router(jobs.router, prefix="/api/v1")
 app.include_router(register_test.router, prefix="/api/v1/register")  
 app.include_router(chat.router, prefix="/api/v1/chat")
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus exposition: stage latency histograms, cache and fallback counters.
+    """
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logging.error(f"Validation error for request {request.url}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
 from sqlalchemy.sql import func
 from app.core.db import Base
 
@@ -14,3 +14,9 @@ class ChatMessage(Base):
     message = Column(Text)                   
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Serves keyset-paginated history: equality on (shop_id, user_id),
+        # then ordered range scans on (created_at, id)
+        Index("ix_chat_messages_shop_user_created_id", "shop_id", "user_id", "created_at", "id"),
+    )
@@ -0,0 +1,23 @@
+from sqlalchemy import JSON, Column, Integer, String, Text, UniqueConstraint
+from app.core.db import Base
+
+class ChunkHash(Base):
+    """
+    Content hash of every vector chunk of a product/service, so updates only
+    re-embed the chunks whose text changed. Also the durable copy of the
+    chunk text and metadata the BM25 index is rebuilt from.
+    """
+    __tablename__ = "chunk_hashes"
+    __table_args__ = (
+        UniqueConstraint("id_key", "item_id", "chunk_index", name="uq_chunk_hashes_item_chunk"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    id_key = Column(String, nullable=False)        # "product_id" / "service_id"
+    item_id = Column(Integer, nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    metadata_hash = Column(String(64), nullable=False)
+    # Null for chunks synced before texts were stored
+    text = Column(Text)
+    chunk_metadata = Column(JSON)
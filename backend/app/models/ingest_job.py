@@ -0,0 +1,44 @@
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.sql import func
+from app.core.db import Base
+
+
+class IngestJob(Base):
+    """
+    A queued ingest / update / delete of catalog items, run by the
+    background workers of app.services.ingest_jobs.
+    """
+    __tablename__ = "ingest_jobs"
+
+    id = Column(String(32), primary_key=True)           # uuid4 hex
+    shop_id = Column(Integer, nullable=False, index=True)
+    kind = Column(String, nullable=False)               # "product" / "service"
+    operation = Column(String, nullable=False)          # "ingest" / "ingest_batch" / "update" / "delete"
+    payload = Column(JSON, nullable=False)
+    # uid of the item a single-item job touches (the job id for items
+    # without one); null for batches, which may touch any item
+    item_key = Column(String)
+
+    status = Column(String, nullable=False, default="queued")  # queued / running / succeeded / partial / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    # Retry backoff: a queued job is not claimed before this time
+    not_before = Column(DateTime(timezone=True))
+    total = Column(Integer, nullable=False, default=1)
+    processed = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    result = Column(JSON)
+    error = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    # Heartbeat while running; a stale one means the worker died
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # Serves the workers' claim query: oldest runnable jobs first
+        Index("ix_ingest_jobs_status_created", "status", "created_at"),
+        # Serves the per-item ordering check: older unfinished jobs of a shop
+        Index("ix_ingest_jobs_shop_kind_status", "shop_id", "kind", "status"),
+    )
@@ -0,0 +1,137 @@
+import asyncio
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.rag.agents.response_generation_agent import TAGALOG_WORDS
+
+
+DEFAULT_EXEMPLARS: Dict[str, List[str]] = {
+    "products-index": [
+        "how much is this phone",
+        "do you have this shirt in medium",
+        "is this item in stock",
+        "what colors are available for the shoes",
+        "I want to buy a laptop",
+        "show me your cheapest headphones",
+        "magkano po ito",
+        "meron pa bang stock ng size large",
+    ],
+    "services-index": [
+        "can I book an appointment tomorrow",
+        "do you offer aircon cleaning",
+        "how much is the repair service",
+        "what services do you offer",
+        "can you install it at my house",
+        "are you available this weekend for a haircut",
+        "pwede po ba magpa-schedule ng serbisyo",
+        "saan po ang location ng shop ninyo",
+    ],
+}
+
+# "magkano" (how much), "meron" (do you have) and "wala" (out of) from the
+# response agent's Tagalog list are stock/price questions; the other Tagalog
+# question words are neutral and carry no routing signal.
+_PRODUCT_TAGALOG = {"magkano", "meron", "wala"} & set(TAGALOG_WORDS)
+
+DEFAULT_KEYWORDS: Dict[str, set] = {
+    "products-index": {
+        "buy", "order", "stock", "size", "color", "colour", "variant", "item",
+        "product", "products", "shipping", "delivery", "sizes", "colors",
+        "bili", "bibili", "presyo", "kulay", "sukat", "stocks", "paninda",
+    } | _PRODUCT_TAGALOG,
+    "services-index": {
+        "service", "services", "book", "booking", "appointment", "schedule",
+        "repair", "install", "installation", "cleaning", "consultation",
+        "subscription", "serbisyo", "ayos",
+        "pagawa", "magpagawa", "magpa-schedule", "iskedyul",
+    },
+}
+
+
+class LocalIndexRouter:
+    """
+    Cheap routing that runs before the LLM router.
+
+    Combines cosine similarity of the query embedding against per-index
+    exemplar centroids with keyword rules, and reports a confidence in
+    [0, 1] so the caller can fall back to the LLM when it is unsure.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        exemplars: Dict[str, List[str]] | None = None,
+        keywords: Dict[str, set] | None = None,
+        margin_scale: float = 0.1,
+        keyword_weight: float = 0.5
+    ):
+        """
+        embedder: embedder used for the chat query (so vectors are comparable)
+        margin_scale: centroid similarity margin that counts as full confidence
+        keyword_weight: confidence contributed by each keyword hit
+        """
+        self.embedder = embedder
+        self.exemplars = exemplars or DEFAULT_EXEMPLARS
+        self.keywords = keywords or DEFAULT_KEYWORDS
+        self.margin_scale = margin_scale
+        self.keyword_weight = keyword_weight
+        self.centroids: Optional[Dict[str, np.ndarray]] = None
+        # Concurrent first requests build the centroids once
+        self._centroids_lock = asyncio.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _build_centroids(self, vectors_by_index: Dict[str, List[List[float]]]) -> None:
+        self.centroids = {
+            name: self._normalize(np.mean([self._normalize(v) for v in vectors], axis=0))
+            for name, vectors in vectors_by_index.items()
+        }
+
+    def ensure_centroids(self) -> None:
+        if self.centroids is None:
+            self._build_centroids({
+                name: self.embedder.embed(texts) for name, texts in self.exemplars.items()
+            })
+
+    async def aensure_centroids(self) -> None:
+        if self.centroids is None:
+            async with self._centroids_lock:
+                if self.centroids is None:
+                    self._build_centroids({
+                        name: await self.embedder.aembed(texts) for name, texts in self.exemplars.items()
+                    })
+
+    def keyword_hits(self, query: str) -> Dict[str, int]:
+        tokens = set(re.findall(r"[\w-]+", query.lower()))
+        return {name: len(tokens & words) for name, words in self.keywords.items()}
+
+    def route(self, query: str, query_vector: List[float] | None) -> tuple[list[str], float]:
+        """
+        Returns (indexes, confidence). Centroids must already be built.
+        """
+        hits = self.keyword_hits(query)
+        matched = [name for name, count in hits.items() if count]
+
+        # Keywords for every index: the query spans both catalogs
+        if len(matched) > 1:
+            return list(self.keywords), 1.0
+
+        # Per-index evidence: centroid similarity (in units of margin_scale)
+        # plus a fixed bonus per keyword hit. Confidence is the lead of the
+        # best index over the runner-up.
+        scores: Dict[str, float] = {name: self.keyword_weight * hits.get(name, 0) for name in self.keywords}
+        if query_vector is not None and self.centroids:
+            q = self._normalize(query_vector)
+            for name, centroid in self.centroids.items():
+                scores[name] = scores.get(name, 0.0) + float(np.dot(q, centroid)) / self.margin_scale
+
+        best, runner_up = sorted(scores, key=scores.get, reverse=True)[:2]
+        confidence = scores[best] - scores[runner_up]
+
+        return [best], max(0.0, min(1.0, confidence))
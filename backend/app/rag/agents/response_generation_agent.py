@@ -1,41 +1,21 @@
+from typing import AsyncIterator
 
-class ResponseGenerationAgent:
-    """
-    Agent responsible for generating the final response
-    from the retrieved and reranked context in the RAG pipeline.
-    """
-
-    def __init__(self, llm):
-        """
-        llm: Synchronous LLM wrapper with .generate(prompt: str) -> str
-        """
-        self.llm = llm
-        self.tagalog_keywords = [
-            'tagalog', 'tagalugin', 'filipino', 'pilipino', 'salita ka ng tagalog'
-        ]
-        self.tagalog_words = ['ano', 'saan', 'magkano', 'paano', 'meron', 'wala']
-
-    def generate(self, query: str, context: str) -> str:
-        """
-        Generate a natural response given a query and context.
-        """
-        if not context:
-            return "I don't have product or service information for that item right now."
+TAGALOG_KEYWORDS = [
+    'tagalog', 'tagalugin', 'filipino', 'pilipino', 'salita ka ng tagalog'
+]
+TAGALOG_WORDS = ['ano', 'saan', 'magkano', 'paano', 'meron', 'wala']
 
-        is_tagalog_request = any(keyword in query.lower() for keyword in self.tagalog_keywords) \
-                             or any(word in query.lower().split() for word in self.tagalog_words)
+NO_CONTEXT_MESSAGE = "I don't have product or service information for that item right now."
+GENERATION_ERROR_MESSAGE = "Sorry, I couldn't generate a response at this time."
 
-        prompt = f"""You are a friendly Shopping Assistant for an online store helping customers find products and services.
 
-AVAILABLE PRODUCTS/SERVICES:
-{context}
+RESPONSE_SYSTEM_PROMPT = """You are a friendly Shopping Assistant for an online store helping customers find products and services.
 
-CUSTOMER QUESTION:
-{query}
+Each message gives you AVAILABLE PRODUCTS/SERVICES and a CUSTOMER QUESTION.
 
 HOW TO RESPOND:
 1. Be warm and conversational - respond to greetings, small talk, and friendly banter
-2. Answer shopping questions using ONLY the information in AVAILABLE PRODUCTS/SERVICES above
+2. Answer shopping questions using ONLY the information in AVAILABLE PRODUCTS/SERVICES
 3. Respond in the customer's language (Tagalog if they use Tagalog words, otherwise English)
 4. Keep responses concise (under 5 sentences for simple queries)
 5. When showing product details:
@@ -55,14 +35,74 @@ WHAT NOT TO DO:
 
 If information is missing: "I don't have that detail in our current listing."
 If multiple products match: Show up to 3 options and ask which they prefer.
-If completely off-topic: Politely redirect to shopping assistance.
+If completely off-topic: Politely redirect to shopping assistance."""
 
-Respond naturally below:"""
+
+class ResponseGenerationAgent:
+    """
+    Agent responsible for generating the final response
+    from the retrieved and reranked context in the RAG pipeline.
+    """
+
+    def __init__(self, llm):
+        """
+        llm: LLM wrapper with .generate(prompt: str, system: str) -> str,
+             .agenerate(prompt, system) -> Awaitable[str]
+             and .astream(prompt, system) -> AsyncIterator[str]
+        """
+        self.llm = llm
+        self.tagalog_keywords = TAGALOG_KEYWORDS
+        self.tagalog_words = TAGALOG_WORDS
+
+    def generate(self, query: str, context: str) -> str:
+        """
+        Generate a natural response given a query and context.
+        """
+        if not context:
+            return NO_CONTEXT_MESSAGE
 
         try:
-            return self.llm.generate(prompt)
+            return self.llm.generate(self._build_prompt(query, context), system=RESPONSE_SYSTEM_PROMPT)
         except Exception as e:
            
-            return "Sorry, I couldn't generate a response at this time."
+            return GENERATION_ERROR_MESSAGE
 
- 
\ No newline at end of file
+    async def agenerate(self, query: str, context: str) -> str:
+        """
+        Async variant of `generate` that awaits the LLM call.
+        """
+        if not context:
+            return NO_CONTEXT_MESSAGE
+
+        try:
+            return await self.llm.agenerate(self._build_prompt(query, context), system=RESPONSE_SYSTEM_PROMPT)
+        except Exception:
+            return GENERATION_ERROR_MESSAGE
+
+    async def astream(self, query: str, context: str) -> AsyncIterator[str]:
+        """
+        Stream the response token by token as the LLM produces it.
+        """
+        if not context:
+            yield NO_CONTEXT_MESSAGE
+            return
+
+        produced = False
+        try:
+            async for token in self.llm.astream(self._build_prompt(query, context), system=RESPONSE_SYSTEM_PROMPT):
+                produced = True
+                yield token
+        except Exception:
+            # Mark a stream that broke off part-way so callers can tell
+            yield GENERATION_ERROR_MESSAGE if not produced else "\n\n" + GENERATION_ERROR_MESSAGE
+
+    def _build_prompt(self, query: str, context: str) -> str:
+        # Only context and question change per request; the instructions
+        # are sent as the static RESPONSE_SYSTEM_PROMPT prefix
+        return f"""AVAILABLE PRODUCTS/SERVICES:
+{context}
+
+CUSTOMER QUESTION:
+{query}
+
+Respond naturally below:"""
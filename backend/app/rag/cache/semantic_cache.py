@@ -0,0 +1,280 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ShopVersions:
+    """
+    Invalidation generation of each shop, plus a settle window after each
+    invalidation during which new answers are not cached. Process-local:
+    only correct with a single app process (no separate ingest workers).
+    """
+
+    def __init__(self):
+        self._versions: Dict[int, int] = {}
+        self._settling_until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, shop_id: int) -> Tuple[int, bool]:
+        """
+        (current version, whether the shop is still settling)
+        """
+        with self._lock:
+            return self._versions.get(shop_id, 0), self._settling_until.get(shop_id, 0.0) > time.monotonic()
+
+    def bump(self, shop_id: int, settle_seconds: float) -> None:
+        with self._lock:
+            self._versions[shop_id] = self._versions.get(shop_id, 0) + 1
+            self._settling_until[shop_id] = time.monotonic() + settle_seconds
+
+    async def aget(self, shop_id: int) -> Tuple[int, bool]:
+        return self.get(shop_id)
+
+    async def abump(self, shop_id: int, settle_seconds: float) -> None:
+        self.bump(shop_id, settle_seconds)
+
+
+class RedisShopVersions(ShopVersions):
+    """
+    Shop versions shared through Redis, so an invalidation by any process
+    (API workers, ingest workers) is seen by all of them on their next
+    lookup.
+    """
+
+    def __init__(self, url: str, prefix: str = "semcache:"):
+        import redis
+        import redis.asyncio as aioredis
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self.aclient = aioredis.Redis.from_url(url)
+
+    def _keys(self, shop_id: int) -> List[str]:
+        return [f"{self.prefix}version:{shop_id}", f"{self.prefix}settling:{shop_id}"]
+
+    @staticmethod
+    def _parse(raw: List[Optional[bytes]]) -> Tuple[int, bool]:
+        version, settling = raw
+        return int(version or 0), settling is not None
+
+    def get(self, shop_id: int) -> Tuple[int, bool]:
+        return self._parse(self.client.mget(self._keys(shop_id)))
+
+    def bump(self, shop_id: int, settle_seconds: float) -> None:
+        version_key, settling_key = self._keys(shop_id)
+        pipe = self.client.pipeline()
+        pipe.incr(version_key)
+        if settle_seconds > 0:
+            pipe.set(settling_key, 1, px=int(settle_seconds * 1000))
+        pipe.execute()
+
+    async def aget(self, shop_id: int) -> Tuple[int, bool]:
+        return self._parse(await self.aclient.mget(self._keys(shop_id)))
+
+    async def abump(self, shop_id: int, settle_seconds: float) -> None:
+        version_key, settling_key = self._keys(shop_id)
+        pipe = self.aclient.pipeline()
+        pipe.incr(version_key)
+        if settle_seconds > 0:
+            pipe.set(settling_key, 1, px=int(settle_seconds * 1000))
+        await pipe.execute()
+
+
+class _ShopEntries:
+    def __init__(self, version: int):
+        self.version = version
+        self.vectors: List[np.ndarray] = []
+        self.results: List[dict] = []
+        self.expires_at: List[float] = []
+        self.matrix: Optional[np.ndarray] = None
+
+    def drop(self, positions: List[int]) -> None:
+        for pos in sorted(positions, reverse=True):
+            del self.vectors[pos], self.results[pos], self.expires_at[pos]
+        self.matrix = None
+
+
+class SemanticAnswerCache:
+    """
+    Per-shop cache of pipeline answers keyed by query embedding.
+
+    A query whose embedding is within `threshold` cosine similarity of a
+    cached query in the same shop is answered from the cache with no LLM
+    calls. Ingestion invalidates the whole shop by bumping its version in
+    `versions` (Redis when SEMANTIC_CACHE_REDIS_URL is set, so every
+    process sees it); entries cached under an older version are never
+    served. Vector upserts are eventually consistent, so for
+    `settle_seconds` after an invalidation nothing is cached for the shop
+    and answers built from not yet visible vectors do not stick.
+    """
+
+    def __init__(
+        self,
+        threshold: float | None = None,
+        max_entries_per_shop: int | None = None,
+        ttl_seconds: int | None = None,
+        settle_seconds: float | None = None,
+        versions: ShopVersions | None = None
+    ):
+        self.threshold = settings.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.max_entries_per_shop = (
+            settings.SEMANTIC_CACHE_MAX_ENTRIES if max_entries_per_shop is None else max_entries_per_shop
+        )
+        self.ttl_seconds = settings.SEMANTIC_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.settle_seconds = settings.SEMANTIC_CACHE_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        if versions is None:
+            url = settings.SEMANTIC_CACHE_REDIS_URL
+            versions = RedisShopVersions(url) if url else ShopVersions()
+        self.versions = versions
+
+        self._shops: Dict[int, _ShopEntries] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _state(self, shop_id: int) -> Tuple[int, bool] | None:
+        try:
+            return self.versions.get(shop_id)
+        except Exception as e:
+            logger.warning(f"Reading the answer cache version of shop {shop_id} failed: {e}")
+            return None
+
+    async def _astate(self, shop_id: int) -> Tuple[int, bool] | None:
+        try:
+            return await self.versions.aget(shop_id)
+        except Exception as e:
+            logger.warning(f"Reading the answer cache version of shop {shop_id} failed: {e}")
+            return None
+
+    def version(self, shop_id: int) -> int | None:
+        """
+        Current invalidation generation of a shop. Pass it back to `store`
+        so answers computed before an invalidation are not cached after it.
+        None when the version store is unreachable (nothing is cached then).
+        """
+        state = self._state(shop_id)
+        return state[0] if state is not None else None
+
+    async def aversion(self, shop_id: int) -> int | None:
+        state = await self._astate(shop_id)
+        return state[0] if state is not None else None
+
+    def lookup(self, shop_id: int, query_vector: List[float]) -> Optional[dict]:
+        if query_vector is None:
+            return None
+        return self._lookup(shop_id, query_vector, self._state(shop_id))
+
+    async def alookup(self, shop_id: int, query_vector: List[float]) -> Optional[dict]:
+        if query_vector is None:
+            return None
+        return self._lookup(shop_id, query_vector, await self._astate(shop_id))
+
+    def _lookup(self, shop_id: int, query_vector: List[float], state: Tuple[int, bool] | None) -> Optional[dict]:
+        q = self._normalize(query_vector)
+        now = time.monotonic()
+
+        with self._lock:
+            entries = self._shops.get(shop_id)
+            if entries is not None and (state is None or entries.version != state[0]):
+                # Invalidated (possibly by another process) since these were cached
+                del self._shops[shop_id]
+                entries = None
+            if entries is None or not entries.vectors:
+                self.misses += 1
+                return None
+
+            expired = [i for i, t in enumerate(entries.expires_at) if t < now]
+            if expired:
+                entries.drop(expired)
+                if not entries.vectors:
+                    self.misses += 1
+                    return None
+
+            if entries.matrix is None:
+                entries.matrix = np.vstack(entries.vectors)
+
+            scores = entries.matrix @ q
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entries.results[best]
+
+    def store(self, shop_id: int, query_vector: List[float], result: dict, version: int | None = None) -> None:
+        if query_vector is None:
+            return
+        self._store(shop_id, query_vector, result, version, self._state(shop_id))
+
+    async def astore(self, shop_id: int, query_vector: List[float], result: dict, version: int | None = None) -> None:
+        if query_vector is None:
+            return
+        self._store(shop_id, query_vector, result, version, await self._astate(shop_id))
+
+    def _store(
+        self,
+        shop_id: int,
+        query_vector: List[float],
+        result: dict,
+        version: int | None,
+        state: Tuple[int, bool] | None
+    ) -> None:
+        if state is None:
+            return
+        current, settling = state
+        if settling or (version is not None and version != current):
+            return
+
+        with self._lock:
+            entries = self._shops.get(shop_id)
+            if entries is None or entries.version != current:
+                entries = self._shops[shop_id] = _ShopEntries(current)
+            if len(entries.vectors) >= self.max_entries_per_shop:
+                entries.drop([0])
+
+            entries.vectors.append(self._normalize(query_vector))
+            entries.results.append(result)
+            entries.expires_at.append(time.monotonic() + self.ttl_seconds)
+            entries.matrix = None
+
+    def invalidate_shop(self, shop_id: int) -> None:
+        with self._lock:
+            self._shops.pop(shop_id, None)
+        try:
+            self.versions.bump(shop_id, self.settle_seconds)
+        except Exception as e:
+            logger.error(f"Invalidating the answer cache of shop {shop_id} failed: {e}")
+
+    async def ainvalidate_shop(self, shop_id: int) -> None:
+        with self._lock:
+            self._shops.pop(shop_id, None)
+        try:
+            await self.versions.abump(shop_id, self.settle_seconds)
+        except Exception as e:
+            logger.error(f"Invalidating the answer cache of shop {shop_id} failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shops": len(self._shops),
+            "entries": sum(len(e.vectors) for e in self._shops.values())
+        }
+
+
+semantic_answer_cache = SemanticAnswerCache()
@@ -0,0 +1,113 @@
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+ITEM_KEYS = (("product_id", "Product", "product_name"), ("service_id", "Service", "service_name"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Offline token estimate. Gemini's tokenizer is only reachable through
+    the API, and catalog text (English/Tagalog, prices, SKUs) averages
+    close to 4 characters per token.
+    """
+    return math.ceil(len(text) / 4)
+
+
+def merge_overlap(left: str, right: str, min_overlap: int = 8) -> str:
+    """
+    Join two consecutive chunks, dropping the text they share because of
+    chunk_overlap (the longest suffix of `left` that prefixes `right`).
+    """
+    for size in range(min(len(left), len(right)), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + " " + right
+
+
+def _compact(text: str) -> str:
+    # Chunks keep the indentation of the preprocess f-strings
+    return re.sub(r"[ \t]*\n[ \t]*", "\n", re.sub(r"[ \t]{2,}", " ", text)).strip()
+
+
+class ContextPacker:
+    """
+    Builds the LLM context from reranked hits under a token budget.
+
+    Chunks of the same product/service are grouped into one block, ordered
+    by the best rank among them. Consecutive chunks are merged with their
+    overlapping text removed, so overlap is paid for once and the budget
+    holds more distinct items.
+    """
+
+    def __init__(self, token_budget: int | None = None, count_tokens: Callable[[str], int] = estimate_tokens):
+        """
+        token_budget: max context tokens; defaults to CONTEXT_TOKEN_BUDGET
+        count_tokens: token counter (swap in a real tokenizer if available)
+        """
+        self.token_budget = token_budget or settings.CONTEXT_TOKEN_BUDGET
+        self.count_tokens = count_tokens
+
+    @staticmethod
+    def item_of(metadata: Dict) -> Optional[Tuple[str, int, str]]:
+        """
+        (kind, item id, name) of the product/service a chunk belongs to.
+        """
+        for id_key, kind, name_key in ITEM_KEYS:
+            if metadata.get(id_key) is not None:
+                return kind, metadata[id_key], metadata.get(name_key, "")
+        return None
+
+    def _block(self, hits: List[Dict]) -> str:
+        item = self.item_of(hits[0]["metadata"])
+        if item is None:
+            return _compact(hits[0]["text"])
+
+        ordered = sorted(hits, key=lambda h: h["metadata"].get("chunk_index", 0))
+        segments: List[str] = []
+        previous_index = None
+        for hit in ordered:
+            index = hit["metadata"].get("chunk_index", 0)
+            text = hit["text"]
+            if segments and previous_index is not None and index == previous_index + 1:
+                segments[-1] = merge_overlap(segments[-1], text)
+            elif not segments or index != previous_index:
+                segments.append(text)
+            previous_index = index
+
+        block = "\n…\n".join(_compact(s) for s in segments)
+
+        # The first chunk carries the "Product: <name>" header; name the item
+        # when only later chunks were retrieved
+        kind, _, name = item
+        if ordered[0]["metadata"].get("chunk_index", 0) != 0 and name:
+            block = f"{kind}: {name}\n…\n{block}"
+        return block
+
+    def pack(self, hits: List[Dict]) -> str:
+        """
+        hits: reranked, best first; each {"id", "text", "metadata"}.
+        """
+        groups: Dict = {}
+        for hit in hits:
+            item = self.item_of(hit["metadata"])
+            key = item[:2] if item else ("chunk", hit["id"])
+            groups.setdefault(key, []).append(hit)
+
+        blocks: List[str] = []
+        used = 0
+        for group in groups.values():
+            block = self._block(group)
+            cost = self.count_tokens(block)
+            if used + cost <= self.token_budget:
+                blocks.append(block)
+                used += cost
+            elif not blocks:
+                # Never return an empty context because the best item is long
+                chars = len(block) * self.token_budget // max(cost, 1)
+                blocks.append(block[:chars])
+                used = self.token_budget
+
+        return "\n\n".join(blocks)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import List
+import asyncio
 
 class BaseEmbedder(ABC):
 
@@ -7,3 +8,10 @@ class BaseEmbedder(ABC):
     def embed(self, texts: List[str]) -> List[List[float]]:
         """Return embeddings for a list of text strings."""
         pass
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Async variant of `embed`. Defaults to running the blocking call in a
+        worker thread so it never stalls the event loop.
+        """
+        return await asyncio.to_thread(self.embed, texts)
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.core.metrics import record_cache
+
+from .base.base_embedder import BaseEmbedder
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCacheBackend:
+    """
+    Base interface for a shared embedding cache tier that several workers
+    can read and write (e.g. Redis).
+    """
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def set_many(self, items: Dict[str, List[float]], ttl_seconds: int) -> None:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    async def aget_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        return await asyncio.to_thread(self.get_many, keys)
+
+    async def aset_many(self, items: Dict[str, List[float]], ttl_seconds: int) -> None:
+        await asyncio.to_thread(self.set_many, items, ttl_seconds)
+
+
+class RedisEmbeddingBackend(EmbeddingCacheBackend):
+    """
+    Redis-backed shared tier. Vectors are stored as packed float32 bytes.
+    """
+
+    def __init__(self, url: str, prefix: str = "emb:"):
+        import redis
+        import redis.asyncio as aioredis
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self.aclient = aioredis.Redis.from_url(url)
+
+    @staticmethod
+    def _pack(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(raw: Optional[bytes]) -> Optional[List[float]]:
+        if raw is None:
+            return None
+        return array("f", raw).tolist()
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        raw = self.client.mget([self.prefix + k for k in keys])
+        return [self._unpack(r) for r in raw]
+
+    def set_many(self, items: Dict[str, List[float]], ttl_seconds: int) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key, vector in items.items():
+            pipe.set(self.prefix + key, self._pack(vector), ex=ttl_seconds)
+        pipe.execute()
+
+    async def aget_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        raw = await self.aclient.mget([self.prefix + k for k in keys])
+        return [self._unpack(r) for r in raw]
+
+    async def aset_many(self, items: Dict[str, List[float]], ttl_seconds: int) -> None:
+        pipe = self.aclient.pipeline(transaction=False)
+        for key, vector in items.items():
+            pipe.set(self.prefix + key, self._pack(vector), ex=ttl_seconds)
+        await pipe.execute()
+
+
+class CachingEmbedder(BaseEmbedder):
+    """
+    Embedder wrapper that serves repeated texts from an in-process LRU/TTL
+    cache, optionally backed by a shared tier, before calling the wrapped
+    embedder for the remaining misses.
+    """
+
+    def __init__(
+        self,
+        embedder: BaseEmbedder,
+        max_size: int = 2048,
+        ttl_seconds: int = 3600,
+        backend: EmbeddingCacheBackend | None = None
+    ):
+        self.embedder = embedder
+        self.model_name = getattr(embedder, "model_name", type(embedder).__name__)
+        # Vectors of different sizes from the same model must not collide
+        self.dimension = getattr(embedder, "dimension", None)
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+
+        self._entries: OrderedDict[str, tuple[float, List[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return re.sub(r"\s+", " ", text).strip().lower()
+
+    def cache_key(self, text: str) -> str:
+        return f"{self.model_name}:{self.dimension}:{self.normalize(text)}"
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "backend_hits": self.backend_hits,
+            "misses": self.misses,
+            "size": len(self._entries)
+        }
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, vector = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _set_local(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _lookup_local(self, texts: List[str]) -> tuple[Dict[str, List[float]], Dict[str, str]]:
+        """
+        Returns (found vectors by key, missing text by key). Duplicate texts
+        in one call collapse to a single key.
+        """
+        found: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+        for text in texts:
+            key = self.cache_key(text)
+            if key in found or key in missing:
+                continue
+            vector = self._get_local(key)
+            if vector is not None:
+                found[key] = vector
+            else:
+                missing[key] = text
+        self.hits += len(found)
+        record_cache("embedding", True, len(found))
+        return found, missing
+
+    def _store(self, found: Dict[str, List[float]], keys: List[str], vectors: List[List[float]]) -> Dict[str, List[float]]:
+        fresh = dict(zip(keys, vectors))
+        for key, vector in fresh.items():
+            self._set_local(key, vector)
+        found.update(fresh)
+        return fresh
+
+    def _merge_backend(self, found, missing, keys, vectors) -> None:
+        for key, vector in zip(keys, vectors):
+            if vector is None:
+                continue
+            self.backend_hits += 1
+            record_cache("embedding", True)
+            self._set_local(key, vector)
+            found[key] = vector
+            missing.pop(key, None)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if isinstance(texts, str):
+            texts = [texts]
+
+        found, missing = self._lookup_local(texts)
+
+        if missing and self.backend is not None:
+            keys = list(missing)
+            try:
+                self._merge_backend(found, missing, keys, self.backend.get_many(keys))
+            except Exception as e:
+                logger.warning(f"Embedding cache backend read failed: {e}")
+
+        if missing:
+            keys = list(missing)
+            self.misses += len(keys)
+            record_cache("embedding", False, len(keys))
+            fresh = self._store(found, keys, self.embedder.embed(list(missing.values())))
+            if self.backend is not None:
+                try:
+                    self.backend.set_many(fresh, self.ttl_seconds)
+                except Exception as e:
+                    logger.warning(f"Embedding cache backend write failed: {e}")
+
+        return [found[self.cache_key(text)] for text in texts]
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        if isinstance(texts, str):
+            texts = [texts]
+
+        found, missing = self._lookup_local(texts)
+
+        if missing and self.backend is not None:
+            keys = list(missing)
+            try:
+                self._merge_backend(found, missing, keys, await self.backend.aget_many(keys))
+            except Exception as e:
+                logger.warning(f"Embedding cache backend read failed: {e}")
+
+        if missing:
+            keys = list(missing)
+            self.misses += len(keys)
+            record_cache("embedding", False, len(keys))
+            fresh = self._store(found, keys, await self.embedder.aembed(list(missing.values())))
+            if self.backend is not None:
+                try:
+                    await self.backend.aset_many(fresh, self.ttl_seconds)
+                except Exception as e:
+                    logger.warning(f"Embedding cache backend write failed: {e}")
+
+        return [found[self.cache_key(text)] for text in texts]
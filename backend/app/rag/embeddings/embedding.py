@@ -1,30 +1,95 @@
 from typing import List
 from .base.base_embedder import BaseEmbedder
 from google import genai
+from google.genai import types
+import numpy as np
+
+from app.core.config import settings
+from app.core.resilience import CallPolicy, ResilientCaller, hedge_percentile
 
 from dotenv import load_dotenv
 import os
 load_dotenv()
 
+# Native output size of gemini-embedding-001
+FULL_DIMENSION = 3072
+
+
+def normalize_embeddings(vectors: List[List[float]], dimension: int | None = None) -> List[List[float]]:
+    """
+    Truncate vectors to `dimension` (when given) and rescale them to unit
+    length. Gemini only normalizes full-size outputs; reduced
+    output_dimensionality vectors must be renormalized before cosine search.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if dimension:
+        matrix = matrix[:, :dimension]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).tolist()
+
 
 class GeminiEmbedder(BaseEmbedder):
 
-    def __init__(self, model_name: str = "gemini-embedding-001"):
+    def __init__(
+        self,
+        model_name: str = "gemini-embedding-001",
+        client: genai.Client | None = None,
+        output_dimensionality: int | None = None
+    ):
         """
         Default embedding model is Gemini.
+        client: shared genai.Client; a new one is created when omitted.
+        output_dimensionality: reduced embedding size (e.g. 768 or 1536);
+                               None keeps the model's full output.
         """
         self.api_key = os.getenv("GEMINI_API_KEY")
-        self.client = genai.Client(api_key=self.api_key)
+        self.client = client or genai.Client(api_key=self.api_key)
         self.model_name = model_name
+        self.output_dimensionality = output_dimensionality
+        # Embedding calls are idempotent reads: safe to retry and hedge
+        self.resilience = ResilientCaller("gemini_embed", CallPolicy(
+            attempt_timeout=settings.GEMINI_EMBED_TIMEOUT_SECONDS,
+            deadline=settings.GEMINI_EMBED_DEADLINE_SECONDS,
+            hedge_percentile=hedge_percentile()
+        ))
+
+    @property
+    def dimension(self) -> int:
+        return self.output_dimensionality or FULL_DIMENSION
+
+    def _config(self) -> types.EmbedContentConfig | None:
+        if not self.output_dimensionality:
+            return None
+        return types.EmbedContentConfig(output_dimensionality=self.output_dimensionality)
+
+    def _vectors(self, result) -> List[List[float]]:
+        vectors = [embedding.values for embedding in result.embeddings]
+        if self.output_dimensionality and self.output_dimensionality < FULL_DIMENSION:
+            return normalize_embeddings(vectors)
+        return vectors
 
     def embed(self, texts: List[str]) -> List[List[float]]:
         if isinstance(texts, str):
             texts = [texts]
             
-        result = self.client.models.embed_content(
+        result = self.resilience.call(lambda: self.client.models.embed_content(
             model=self.model_name,
-            contents=texts
-        )
+            contents=texts,
+            config=self._config()
+        ))
 
     
-        return [embedding.values for embedding in result.embeddings]
\ No newline at end of file
+        return self._vectors(result)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        if isinstance(texts, str):
+            texts = [texts]
+
+        result = await self.resilience.acall(lambda: self.client.aio.models.embed_content(
+            model=self.model_name,
+            contents=texts,
+            config=self._config()
+        ))
+
+        return self._vectors(result)
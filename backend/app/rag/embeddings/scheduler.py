@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Tuple
+
+from app.core.config import settings
+from app.rag.context_packer import estimate_tokens
+from .base.base_embedder import BaseEmbedder
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units a minute, holding at most `burst_seconds`
+    worth of them. A non-positive limit means unlimited. Not locked on its
+    own; EmbeddingQuota serializes access.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` units are available (0 when they are now).
+        Amounts above the capacity only need a full bucket.
+        """
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.tokens -= min(amount, self.capacity)
+
+
+class EmbeddingQuota:
+    """
+    Requests-per-minute and tokens-per-minute budget of the embedding API,
+    shared by the blocking and async paths.
+    """
+
+    def __init__(self, rpm: float, tpm: float, burst_seconds: float):
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.tokens = TokenBucket(tpm, burst_seconds)
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Take one request and `tokens` tokens if both are available and
+        return 0; otherwise take nothing and return the seconds to wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            if wait == 0:
+                self.requests.take(1)
+                self.tokens.take(tokens)
+            return wait
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Blocking reserve; returns the seconds spent waiting.
+        """
+        waited = 0.0
+        while (wait := self.reserve(tokens)) > 0:
+            time.sleep(wait)
+            waited += wait
+        return waited
+
+
+class _Request:
+    """
+    One caller's texts; resolved once every text has its vector.
+    """
+
+    __slots__ = ("future", "vectors", "remaining", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, size: int):
+        self.future = future
+        self.vectors: List[List[float] | None] = [None] * size
+        self.remaining = size
+        self.enqueued_at = time.monotonic()
+
+
+# (request, position in the request, text, estimated tokens)
+_Item = Tuple[_Request, int, str, int]
+
+
+class EmbeddingScheduler:
+    """
+    Shared, quota-aware front for an embedder.
+
+    Concurrent `aembed` calls queue their texts; a single dispatcher packs
+    them into API requests of up to `max_batch_size` texts, reserving one
+    request and the batch's estimated tokens from the quota before each
+    call. Interactive texts (query embeddings) are always taken first and
+    sent at once in batches of their own, so a query never waits for the
+    quota of background texts; background texts (ingestion) wait up to
+    `max_wait_ms` for others to fill the batch. A throttled background
+    batch yields to interactive texts arriving meanwhile. At most
+    `max_in_flight` batches run concurrently.
+
+    Callers use the `interactive` / `background` views, which are plain
+    embedders. Blocking `embed` calls are throttled by the same quota but
+    sent on their own.
+    """
+
+    def __init__(
+        self,
+        embedder: BaseEmbedder,
+        max_batch_size: int | None = None,
+        max_wait_ms: float | None = None,
+        max_in_flight: int | None = None,
+        quota: EmbeddingQuota | None = None
+    ):
+        """
+        embedder: the embedder making the API calls
+        max_batch_size: texts per API request
+        max_wait_ms: longest time a background text waits for a fuller batch
+        max_in_flight: concurrent API requests
+        quota: rate budget; defaults to EMBED_RPM_LIMIT / EMBED_TPM_LIMIT
+        """
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size or settings.EMBED_BATCH_SIZE
+        self.max_wait = (settings.EMBED_SCHEDULER_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.max_in_flight = max_in_flight or settings.EMBED_SCHEDULER_MAX_IN_FLIGHT
+        self.quota = quota or EmbeddingQuota(
+            settings.EMBED_RPM_LIMIT, settings.EMBED_TPM_LIMIT, settings.EMBED_BURST_SECONDS
+        )
+
+        self._queues: Dict[str, Deque[_Item]] = {INTERACTIVE: deque(), BACKGROUND: deque()}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+        self.interactive = ScheduledEmbedder(self, INTERACTIVE)
+        self.background = ScheduledEmbedder(self, BACKGROUND)
+
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.throttled_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "texts_per_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "throttled_ms": round(self.throttled_seconds * 1000, 2)
+        }
+
+    # Blocking path
+
+    def embed(self, texts: List[str], priority: str = BACKGROUND) -> List[List[float]]:
+        if isinstance(texts, str):
+            texts = [texts]
+        self.requests += 1
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.max_batch_size):
+            batch = texts[start:start + self.max_batch_size]
+            self.throttled_seconds += self.quota.acquire(sum(estimate_tokens(t) for t in batch))
+            self.batches += 1
+            self.texts += len(batch)
+            vectors.extend(self.embedder.embed(batch))
+        return vectors
+
+    # Async path
+
+    async def aembed(self, texts: List[str], priority: str = BACKGROUND) -> List[List[float]]:
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return []
+
+        self._ensure_dispatcher()
+        self.requests += 1
+        request = _Request(self._loop.create_future(), len(texts))
+        queue = self._queues[priority]
+        for position, text in enumerate(texts):
+            queue.append((request, position, text, estimate_tokens(text)))
+        self._wakeup.set()
+        return await request.future
+
+    def _ensure_dispatcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (queued items of the old one are dead)
+            for queue in self._queues.values():
+                queue.clear()
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._dispatcher = None
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    def _peek_batch(self) -> Tuple[str, List[_Item]]:
+        # Priorities are never mixed: interactive texts only pay (and wait
+        # for) the quota of other interactive texts
+        priority = INTERACTIVE if self._queues[INTERACTIVE] else BACKGROUND
+        return priority, list(islice(self._queues[priority], self.max_batch_size))
+
+    def _pop_batch(self, priority: str, size: int) -> List[_Item]:
+        queue = self._queues[priority]
+        return [queue.popleft() for _ in range(size)]
+
+    async def _gather_window(self) -> None:
+        """
+        Hold a background-only, not yet full batch until its oldest text
+        has waited `max_wait` or an interactive text arrives.
+        """
+        background = self._queues[BACKGROUND]
+        deadline = background[0][0].enqueued_at + self.max_wait
+        while not self._queues[INTERACTIVE] and len(background) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def _dispatch(self) -> None:
+        while True:
+            if not any(self._queues.values()):
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            if not self._queues[INTERACTIVE]:
+                await self._gather_window()
+
+            await self._slots.acquire()
+            # Re-form the batch after every throttling pause, which new texts
+            # cut short, so interactive ones that arrived meanwhile go first
+            while True:
+                priority, batch = self._peek_batch()
+                wait = self.quota.reserve(sum(item[3] for item in batch))
+                if wait == 0:
+                    batch = self._pop_batch(priority, len(batch))
+                    break
+                paused = time.monotonic()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                self.throttled_seconds += time.monotonic() - paused
+
+            self.batches += 1
+            self.texts += len(batch)
+            task = self._loop.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[_Item]) -> None:
+        try:
+            vectors = await self.embedder.aembed([item[2] for item in batch])
+        except Exception as e:
+            logger.exception(f"Embedding batch of {len(batch)} texts failed: {e}")
+            for request, *_ in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        for (request, position, _, _), vector in zip(batch, vectors):
+            request.vectors[position] = vector
+            request.remaining -= 1
+            if request.remaining == 0 and not request.future.done():
+                request.future.set_result(request.vectors)
+
+    async def aclose(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+
+
+class ScheduledEmbedder(BaseEmbedder):
+    """
+    Embedder view of an EmbeddingScheduler at one priority.
+    """
+
+    def __init__(self, scheduler: EmbeddingScheduler, priority: str):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.model_name = getattr(scheduler.embedder, "model_name", type(scheduler.embedder).__name__)
+
+    @property
+    def dimension(self) -> int | None:
+        return getattr(self.scheduler.embedder, "dimension", None)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.scheduler.embed(texts, self.priority)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        return await self.scheduler.aembed(texts, self.priority)
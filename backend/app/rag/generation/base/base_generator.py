@@ -1,7 +1,29 @@
+import asyncio
+from typing import AsyncIterator
+
+
 class BaseLLMClient:
     """
     Base interface for any LLM client.
     Enforces a consistent method to generate text for different LLM providers.
+
+    `system` is the static part of a prompt (instructions that do not change
+    between requests). Providers that support it send it separately so it
+    can be cached server side; others must put it in front of the prompt.
     """
-    def generate(self, prompt: str, **kwargs) -> str:
-        raise NotImplementedError("Subclasses must implement this method")
\ No newline at end of file
+    def generate(self, prompt: str, system: str | None = None, **kwargs) -> str:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    async def agenerate(self, prompt: str, system: str | None = None, **kwargs) -> str:
+        """
+        Async variant of `generate`. Providers with a native async SDK should
+        override this; the default runs the blocking call in a worker thread.
+        """
+        return await asyncio.to_thread(self.generate, prompt, system=system, **kwargs)
+
+    async def astream(self, prompt: str, system: str | None = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream generated text as it is produced. Providers without native
+        streaming yield the full response as a single chunk.
+        """
+        yield await self.agenerate(prompt, system=system, **kwargs)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import List, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingReranker:
+    """
+    Micro-batching front for a Reranker.
+
+    Concurrent `arerank` calls queue their (query, candidate) pairs; the
+    queue is flushed once it holds `max_batch_size` pairs or `max_wait_ms`
+    has passed since the first pair arrived, and the scores are fanned back
+    to each waiting caller. A flush scores its pairs in cross-encoder
+    `predict` calls of at most `max_batch_size` pairs, so one call never
+    grows past that however many callers (or candidates) arrive at once.
+    """
+
+    def __init__(self, reranker, max_batch_size: int | None = None, max_wait_ms: float | None = None):
+        """
+        reranker: Reranker exposing .predict(pairs) and an .executor
+        max_batch_size: pairs that trigger an immediate flush, and the most
+                        pairs scored in one predict call
+        max_wait_ms: longest time a pair waits for others to join its batch
+        """
+        self.reranker = reranker
+        self.max_batch_size = max_batch_size or settings.RERANK_MAX_BATCH_SIZE
+        self.max_wait = (settings.RERANK_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+
+        self._pending: List[Tuple[List[Tuple[str, str]], asyncio.Future]] = []
+        self._pending_pairs = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def rerank(self, query: str, candidates: list[str]) -> list[tuple[str, float]]:
+        return self.reranker.rerank(query, candidates)
+
+    async def arerank(self, query: str, candidates: list[str]) -> list[tuple[str, float]]:
+        if not candidates:
+            return []
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pairs = [(query, c) for c in candidates]
+
+        self._pending.append((pairs, future))
+        self._pending_pairs += len(pairs)
+
+        if self._pending_pairs >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        scores = await future
+        return sorted(zip(candidates, scores), key=lambda x: x[1], reverse=True)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._pending:
+            return
+
+        batch, self._pending, self._pending_pairs = self._pending, [], 0
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[List[Tuple[str, str]], asyncio.Future]]) -> None:
+        pairs = [pair for request_pairs, _ in batch for pair in request_pairs]
+        loop = asyncio.get_running_loop()
+        size = self.max_batch_size
+        starts = range(0, len(pairs), size)
+
+        # The reranker's executor bounds how many chunks are scored at once
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self.reranker.executor, self.reranker.predict, pairs[start:start + size])
+            for start in starts
+        ], return_exceptions=True)
+
+        scores: List[float | None] = []
+        errors: dict[int, BaseException] = {}
+        for start, result in zip(starts, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Batched rerank of pairs {start}-{start + size} of {len(pairs)} failed: {result}", exc_info=result)
+                errors[start // size] = result
+                scores.extend([None] * min(size, len(pairs) - start))
+            else:
+                scores.extend(result)
+
+        offset = 0
+        for request_pairs, future in batch:
+            end = offset + len(request_pairs)
+            failed = [errors[chunk] for chunk in range(offset // size, (end - 1) // size + 1) if chunk in errors]
+            if not future.done():
+                if failed:
+                    future.set_exception(failed[0])
+                else:
+                    future.set_result(list(scores[offset:end]))
+            offset = end
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.core.config import settings
+
+ONNX_MODEL_FILE = "model_quantized.onnx"
+ONNX_CONFIG_FILE = "reranker_config.json"
+
+
+class OnnxReranker:
+    """
+    CPU reranker running an int8-quantized ONNX export of the cross-encoder
+    (see scripts/export_onnx_reranker.py). Same surface as `Reranker`.
+
+    Inputs are truncated to `max_length` tokens and candidates are sorted by
+    token length before batching, so each batch is padded only to the
+    longest pair in its own length bucket.
+    """
+
+    def __init__(
+        self,
+        model_dir: str | None = None,
+        max_length: int | None = None,
+        bucket_size: int | None = None,
+        max_workers: int | None = None,
+        intra_op_threads: int | None = None
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_dir = model_dir or settings.RERANKER_ONNX_DIR
+        self.max_length = max_length or settings.RERANKER_MAX_LENGTH
+        self.bucket_size = bucket_size or settings.RERANKER_BUCKET_SIZE
+
+        config_path = os.path.join(self.model_dir, ONNX_CONFIG_FILE)
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                config = json.load(f)
+        # Match the activation the sentence-transformers model applies
+        self.activation = config.get("activation", "identity")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads or settings.RERANKER_INTRA_OP_THREADS
+        self.session = ort.InferenceSession(
+            os.path.join(self.model_dir, ONNX_MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.RERANK_MAX_WORKERS,
+            thread_name_prefix="reranker"
+        )
+
+    def _encode(self, pairs: list[tuple[str, str]]) -> dict:
+        return self.tokenizer(
+            [q for q, _ in pairs],
+            [c for _, c in pairs],
+            truncation="longest_first",
+            max_length=self.max_length,
+            padding=False
+        )
+
+    def _run_bucket(self, encoded: dict, positions: np.ndarray) -> np.ndarray:
+        width = max(len(encoded["input_ids"][i]) for i in positions)
+        pad_id = self.tokenizer.pad_token_id or 0
+
+        feeds = {}
+        for name in ("input_ids", "attention_mask", "token_type_ids"):
+            if name not in self.input_names:
+                continue
+            fill = pad_id if name == "input_ids" else 0
+            batch = np.full((len(positions), width), fill, dtype=np.int64)
+            for row, i in enumerate(positions):
+                values = encoded[name][i]
+                batch[row, :len(values)] = values
+            feeds[name] = batch
+
+        logits = self.session.run(None, feeds)[0]
+        return logits.reshape(len(positions), -1)[:, 0]
+
+    def predict(self, pairs: list[tuple[str, str]]) -> list[float]:
+        """
+        Score (query, candidate) pairs, batching them by token length.
+        """
+        if not pairs:
+            return []
+
+        encoded = self._encode(pairs)
+        lengths = np.array([len(ids) for ids in encoded["input_ids"]])
+        order = np.argsort(lengths, kind="stable")
+
+        scores = np.empty(len(pairs), dtype=np.float32)
+        for start in range(0, len(order), self.bucket_size):
+            positions = order[start:start + self.bucket_size]
+            scores[positions] = self._run_bucket(encoded, positions)
+
+        if self.activation == "sigmoid":
+            scores = 1 / (1 + np.exp(-scores))
+        return scores.tolist()
+
+    def rerank(self, query: str, candidates: list[str]) -> list[tuple[str, float]]:
+        scores = self.predict([(query, c) for c in candidates])
+        return sorted(zip(candidates, scores), key=lambda x: x[1], reverse=True)
+
+    async def arerank(self, query: str, candidates: list[str]) -> list[tuple[str, float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.rerank, query, candidates)
+
+
+def check_parity(reference, candidate, samples: list[tuple[str, list[str]]], atol: float = 0.1) -> dict:
+    """
+    Compare two rerankers on (query, candidates) samples.
+
+    Reports the largest absolute score difference, how often both agree on
+    the top candidate, and whether every score is within `atol`.
+    """
+    max_diff = 0.0
+    top1_agree = 0
+
+    for query, candidates in samples:
+        pairs = [(query, c) for c in candidates]
+        ref_scores = np.asarray(reference.predict(pairs), dtype=np.float32)
+        new_scores = np.asarray(candidate.predict(pairs), dtype=np.float32)
+
+        max_diff = max(max_diff, float(np.max(np.abs(ref_scores - new_scores))))
+        top1_agree += int(np.argmax(ref_scores) == np.argmax(new_scores))
+
+    return {
+        "samples": len(samples),
+        "max_abs_diff": max_diff,
+        "top1_agreement": top1_agree / len(samples) if samples else 1.0,
+        "passed": max_diff <= atol
+    }
@@ -1,11 +1,45 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from sentence_transformers import CrossEncoder
+from app.core.config import settings
 
 class Reranker:
-    def __init__(self, model_name='cross-encoder/ms-marco-MiniLM-L-6-v2'):
+    def __init__(self, model_name='cross-encoder/ms-marco-MiniLM-L-6-v2', max_workers: int | None = None):
         self.model = CrossEncoder(model_name)
+        # Bounded pool so concurrent chats cannot oversubscribe the CPU
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.RERANK_MAX_WORKERS,
+            thread_name_prefix="reranker"
+        )
+
+    def predict(self, pairs: list[tuple[str, str]]) -> list[float]:
+        """
+        Score (query, candidate) pairs in a single forward pass.
+        """
+        if not pairs:
+            return []
+        return self.model.predict(pairs, batch_size=len(pairs)).tolist()
 
     def rerank(self, query: str, candidates: list[str]) -> list[tuple[str, float]]:
         pairs = [(query, c) for c in candidates]
         scores = self.model.predict(pairs)
         ranked = sorted(zip(candidates, scores), key=lambda x: x[1], reverse=True)
-        return ranked
\ No newline at end of file
+        return ranked
+
+    async def arerank(self, query: str, candidates: list[str]) -> list[tuple[str, float]]:
+        """
+        Run the CPU-bound cross-encoder on the bounded executor instead of
+        the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.rerank, query, candidates)
+
+
+def create_reranker():
+    """
+    Build the reranker backend selected by RERANKER_BACKEND.
+    """
+    if settings.RERANKER_BACKEND == "onnx":
+        from app.rag.generation.onnx_reranker import OnnxReranker
+        return OnnxReranker()
+    return Reranker()
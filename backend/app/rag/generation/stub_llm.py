@@ -0,0 +1,57 @@
+from typing import Callable
+
+from app.rag.generation.base.base_generator import BaseLLMClient
+
+
+def default_response(prompt: str, system: str | None) -> str:
+    # Routing prompts expect a JSON array of index names
+    if "JSON array" in (system or prompt):
+        return '["products-index", "services-index"]'
+    return "Stub answer."
+
+
+class StubLLMClient(BaseLLMClient):
+    """
+    Offline LLM client for benchmarks and load tests.
+
+    Records the prompt bytes each call would send. With
+    `cache_prefixes=True` a static prefix is billed once, the first time it
+    is seen (as with provider-side cached content); with False it is billed
+    on every call, like a prompt that inlines its instructions.
+    """
+
+    def __init__(
+        self,
+        responder: Callable[[str, str | None], str] = default_response,
+        cache_prefixes: bool = True
+    ):
+        self.responder = responder
+        self.cache_prefixes = cache_prefixes
+        self.calls = 0
+        self.prompt_bytes = 0
+        self.prefix_bytes = 0
+        self._seen_prefixes: set[str] = set()
+
+    def _record(self, prompt: str, system: str | None) -> None:
+        self.calls += 1
+        self.prompt_bytes += len(prompt.encode())
+        if system and (not self.cache_prefixes or system not in self._seen_prefixes):
+            self.prefix_bytes += len(system.encode())
+            self._seen_prefixes.add(system)
+
+    def generate(self, prompt: str, system: str | None = None, **kwargs) -> str:
+        self._record(prompt, system)
+        return self.responder(prompt, system)
+
+    async def agenerate(self, prompt: str, system: str | None = None, **kwargs) -> str:
+        return self.generate(prompt, system=system, **kwargs)
+
+    def stats(self) -> dict:
+        total = self.prompt_bytes + self.prefix_bytes
+        return {
+            "calls": self.calls,
+            "prompt_bytes": self.prompt_bytes,
+            "prefix_bytes": self.prefix_bytes,
+            "total_bytes": total,
+            "bytes_per_call": total / self.calls if self.calls else 0.0
+        }
@@ -1,11 +1,23 @@
 # app/rag/agentic_pipeline.py
-from typing import List
-from app.rag.generation.reranker import Reranker
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import time
+from typing import AsyncIterator, Dict, List
+import asyncio
+from app.rag.generation.reranker import create_reranker
 from app.rag.vectorstore.vectore_store import PineconeVectorStore
 import logging
 
 from app.rag.agents.index_routing_agent import IndexRoutingAgent
-from app.rag.agents.response_generation_agent import ResponseGenerationAgent
+from app.rag.agents.local_index_router import LocalIndexRouter
+from app.rag.agents.response_generation_agent import ResponseGenerationAgent, GENERATION_ERROR_MESSAGE
+from app.rag.cache.semantic_cache import SemanticAnswerCache
+from app.rag.vectorstore.bm25_index import reciprocal_rank_fusion
+from app.rag.query_filters import parse_query_filters
+from app.rag.context_packer import ContextPacker
+from app.core.config import settings
+from app.core.metrics import Stage, observe, record_cache, record_fallback, stage, track_request
 logger = logging.getLogger(__name__)
 
 class AgenticRAGPipeline:
@@ -14,77 +26,538 @@ class AgenticRAGPipeline:
     builds context, and generates a response.
     """
 
-    def __init__(self, vectorstores: dict, llm):
+    def __init__(
+        self,
+        vectorstores: dict,
+        llm,
+        embedder=None,
+        answer_cache: SemanticAnswerCache | None = None,
+        reranker=None,
+        sparse_indexes: dict | None = None,
+        context_packer: ContextPacker | None = None,
+        speculative_retrieval: bool | None = None
+    ):
         """
         vectorstores: dict of index_name -> PineconeVectorStore
-        llm: synchronous LLM wrapper with .generate(prompt: str) -> str
+        llm: LLM wrapper with .generate(prompt: str, system: str) -> str
+             and .agenerate(prompt, system) -> Awaitable[str]
+        embedder: embedder used for the query vector; defaults to the
+                  embedder of the first vectorstore (all indexes share a model)
+        answer_cache: optional per-shop semantic cache consulted before
+                      routing; near-paraphrases skip every LLM call
+        reranker: object with .rerank/.arerank; defaults to create_reranker()
+        sparse_indexes: optional dict of index_name -> BM25Index; when set,
+                        retrieval fuses dense and keyword results (RRF)
+        context_packer: builds the prompt context; defaults to ContextPacker()
+        speculative_retrieval: retrieve from every index while routing runs;
+                               defaults to SPECULATIVE_RETRIEVAL_ENABLED
         """
         self.vectorstores = vectorstores
         self.llm = llm
-        self.reranker = Reranker()
-        self.routing_agent = IndexRoutingAgent(llm)
+        self.answer_cache = answer_cache
+        self.embedder = embedder or next(iter(vectorstores.values())).embedder
+        self.reranker = reranker or create_reranker()
+        self.sparse_indexes = sparse_indexes or {}
+        self.context_packer = context_packer or ContextPacker()
+        self.speculative_retrieval = (
+            settings.SPECULATIVE_RETRIEVAL_ENABLED if speculative_retrieval is None else speculative_retrieval
+        )
+        self.speculation_counts: Counter = Counter()
+        self._speculation_executor: ThreadPoolExecutor | None = None
+        self.routing_agent = IndexRoutingAgent(llm, local_router=LocalIndexRouter(self.embedder))
         self.response_agent = ResponseGenerationAgent(llm)
 
-    def retrieve(self, query: str, shop_id: int, index_name: str, top_k: int = 5) -> List[str]:
+    def embed_query(self, query: str) -> List[float] | None:
         """
-        Retrieve candidate chunks from a specific index.
+        Embed the query once so every routed index can reuse the vector.
         """
-        try:
-            vs = self.vectorstores[index_name]
-            results = vs.query(query, shop_id=shop_id, top_k=top_k)
-            if not results or not getattr(results, "matches", []):
+        with stage("embed_query") as embedding:
+            try:
+                return self.embedder.embed([query.strip()])[0]
+            except Exception as e:
+                logger.exception(f"Query embedding failed: {e}")
+                embedding.outcome = "error"
+                record_fallback("no_query_vector")
+                return None
+
+    async def aembed_query(self, query: str) -> List[float] | None:
+        with stage("embed_query") as embedding:
+            try:
+                return (await self.embedder.aembed([query.strip()]))[0]
+            except Exception as e:
+                logger.exception(f"Query embedding failed: {e}")
+                embedding.outcome = "error"
+                record_fallback("no_query_vector")
+                return None
+
+    def _fetch_k(self, index_name: str, top_k: int) -> int:
+        # Fusion needs a deeper list from each retriever than it returns
+        if index_name in self.sparse_indexes:
+            return top_k * settings.HYBRID_FETCH_MULTIPLIER
+        return top_k
+
+    def _sparse_matches(self, query: str | None, shop_id: int, index_name: str, top_k: int, filter: Dict | None) -> list:
+        sparse = self.sparse_indexes.get(index_name)
+        if sparse is None or not query:
+            return []
+        with stage("keyword_query", index_name) as querying:
+            try:
+                return sparse.query(query, shop_id=shop_id, top_k=top_k, filter=filter).matches
+            except Exception as e:
+                logger.exception(f"BM25 retrieval failed for {index_name}: {e}")
+                querying.outcome = "error"
                 return []
-            return [
-                match.metadata.get("text", str(match.metadata))
-                for match in results.matches
-            ]
-        except Exception as e:
-            logger.exception(f"Vectorstore retrieval failed for {index_name}: {e}")
+
+    def _fuse(self, dense_results, sparse_matches: list, shop_id: int, index_name: str, top_k: int) -> List[Dict]:
+        """
+        Reciprocal rank fusion of dense and BM25 matches, returned as hits.
+        Dense-only hits take their text from the BM25 index when it has the
+        chunk.
+        """
+        dense_matches = list(getattr(dense_results, "matches", None) or [])
+        sparse = self.sparse_indexes.get(index_name)
+        if sparse is None:
+            return self._matches_to_hits(dense_results)[:top_k]
+
+        by_id = {m.id: m for m in dense_matches}
+        by_id.update({m.id: m for m in sparse_matches})
+        fused = reciprocal_rank_fusion(
+            [[m.id for m in dense_matches], [m.id for m in sparse_matches]],
+            k=settings.RRF_K
+        )[:top_k]
+
+        known = sparse.texts(shop_id, [_id for _id, _ in fused])
+        return [self._hit(by_id[_id], known.get(_id)) for _id, _ in fused]
+
+    def retrieve(
+        self,
+        query_vector: List[float] | None,
+        shop_id: int,
+        index_name: str,
+        top_k: int = 5,
+        query: str | None = None,
+        filter: Dict | None = None
+    ) -> List[Dict]:
+        """
+        Retrieve candidate chunks from a specific index. When the index has
+        a BM25 companion and `query` is given, dense and keyword results
+        are merged with reciprocal rank fusion.
+
+        filter: metadata filter applied inside both retrievers (on top of
+                the shop_id isolation)
+        """
+        fetch_k = self._fetch_k(index_name, top_k)
+        results = None
+        if query_vector is not None:
+            with stage("vector_query", index_name) as querying:
+                try:
+                    vs = self.vectorstores[index_name]
+                    results = vs.query_by_vector(query_vector, shop_id=shop_id, top_k=fetch_k, filter=filter)
+                except Exception as e:
+                    logger.exception(f"Vectorstore retrieval failed for {index_name}: {e}")
+                    querying.outcome = "error"
+
+        sparse_matches = self._sparse_matches(query, shop_id, index_name, fetch_k, filter)
+        return self._fuse(results, sparse_matches, shop_id, index_name, top_k)
+
+    async def aretrieve(
+        self,
+        query_vector: List[float] | None,
+        shop_id: int,
+        index_name: str,
+        top_k: int = 5,
+        query: str | None = None,
+        filter: Dict | None = None
+    ) -> List[Dict]:
+        """
+        Async variant of `retrieve`: the vector search is awaited; the
+        in-process BM25 lookup runs inline.
+        """
+        fetch_k = self._fetch_k(index_name, top_k)
+        results = None
+        if query_vector is not None:
+            with stage("vector_query", index_name) as querying:
+                try:
+                    vs = self.vectorstores[index_name]
+                    results = await vs.aquery_by_vector(query_vector, shop_id=shop_id, top_k=fetch_k, filter=filter)
+                except Exception as e:
+                    logger.exception(f"Vectorstore retrieval failed for {index_name}: {e}")
+                    querying.outcome = "error"
+
+        sparse_matches = self._sparse_matches(query, shop_id, index_name, fetch_k, filter)
+        return self._fuse(results, sparse_matches, shop_id, index_name, top_k)
+
+    async def aretrieve_all(
+        self,
+        query_vector: List[float] | None,
+        shop_id: int,
+        indexes: List[str],
+        top_k: int = 5,
+        query: str | None = None,
+        filter: Dict | None = None
+    ) -> List[Dict]:
+        """
+        Query every routed index concurrently with the same query vector,
+        so retrieval costs the slowest index rather than the sum of all.
+        Without a vector (embedding failed) only BM25 can answer.
+        """
+        if query_vector is None and not (query and self.sparse_indexes):
+            return []
+
+        results = await asyncio.gather(*[
+            self.aretrieve(query_vector, shop_id=shop_id, index_name=index_name, top_k=top_k, query=query, filter=filter)
+            for index_name in indexes
+        ])
+        return [hit for hits in results for hit in hits]
+
+    @staticmethod
+    def _hit(match, text: str | None = None) -> Dict:
+        """
+        Retrieval result passed between stages: chunk id, text and the
+        metadata the context packer groups by.
+        """
+        metadata = dict(match.metadata or {})
+        text = text or metadata.pop("text", None) or str(metadata)
+        metadata.pop("text", None)
+        return {"id": match.id, "text": text, "metadata": metadata}
+
+    def _matches_to_hits(self, results) -> List[Dict]:
+        if not results or not getattr(results, "matches", []):
+            return []
+        return [self._hit(match) for match in results.matches]
+
+    def query_filters(self, query: str, shop_id: int, indexes: List[str]) -> Dict | None:
+        """
+        Structured constraints (price, category, availability) parsed from
+        the query, pushed down to the indexes as a metadata filter.
+        """
+        categories = set()
+        for index_name in indexes:
+            sparse = self.sparse_indexes.get(index_name)
+            if sparse is not None:
+                categories |= sparse.categories(shop_id)
+        return parse_query_filters(query, categories)
+
+    @staticmethod
+    def _reorder(candidates: List[Dict], ranked: List[tuple[str, float]]) -> List[Dict]:
+        # The cross-encoder scores texts; map them back to their hits
+        by_text: Dict[str, List[Dict]] = {}
+        for hit in candidates:
+            by_text.setdefault(hit["text"], []).append(hit)
+        return [by_text[text].pop(0) for text, _ in ranked]
+
+    def rerank(self, query: str, candidates: List[Dict]) -> List[Dict]:
+        if not candidates:
             return []
+        with stage("rerank") as reranking:
+            try:
+                ranked = self.reranker.rerank(query, [c["text"] for c in candidates])
+                return self._reorder(candidates, ranked)
+            except Exception as e:
+                logger.exception(f"Reranking failed: {e}")
+                reranking.outcome = "error"
+                record_fallback("rerank_failed")
+                return candidates
 
-    def rerank(self, query: str, candidates: List[str]) -> List[str]:
+    async def arerank(self, query: str, candidates: List[Dict]) -> List[Dict]:
+        """
+        Async variant of `rerank`; the cross-encoder runs on the reranker's
+        bounded executor.
+        """
         if not candidates:
             return []
+        with stage("rerank") as reranking:
+            try:
+                ranked = await self.reranker.arerank(query, [c["text"] for c in candidates])
+                return self._reorder(candidates, ranked)
+            except Exception as e:
+                logger.exception(f"Reranking failed: {e}")
+                reranking.outcome = "error"
+                record_fallback("rerank_failed")
+                return candidates
+
+    def build_context(self, top_hits: List[Dict]) -> str:
+        """
+        Token-budgeted context: one block per product/service, with the
+        overlap between its adjacent chunks removed.
+        """
+        with stage("build_context"):
+            return self.context_packer.pack(top_hits)
+
+
+
+    def _should_speculate(self, query: str, query_vector: List[float] | None) -> bool:
+        if not self.speculative_retrieval or len(self.vectorstores) < 2:
+            return False
+        # A cached or confident local decision returns at once with no LLM
+        # call: there is no routing latency to hide
+        if self.routing_agent.decision_without_llm(query, query_vector) is not None:
+            return False
+        return query_vector is not None or bool(query and self.sparse_indexes)
+
+    def _settle_speculation(self, pending: dict, indexes: List[str], guessed: Dict | None, filters: Dict | None) -> bool:
+        """
+        Cancel speculative retrievals the router did not select (a running
+        one is discarded when it finishes). Returns whether the selected
+        ones can be used: they must cover every routed index and have run
+        with the filter of the routed indexes.
+        """
+        usable = filters == guessed and all(name in pending for name in indexes)
+        for name, work in pending.items():
+            if name in indexes and usable:
+                continue
+            self.speculation_counts["discarded" if work.done() else "cancelled"] += 1
+            work.cancel()
+        self.speculation_counts["hit" if usable else "miss"] += 1
+        if not usable:
+            record_fallback("speculation_miss")
+        return usable
+
+    @staticmethod
+    def _record_route(routing: Stage, routing_path: str) -> None:
+        routing.outcome = routing_path
+        record_cache("routing", routing_path == "cache")
+        if routing_path == "default":
+            record_fallback("default_route")
+
+    def _route(self, query: str, query_vector: List[float] | None) -> tuple[List[str], str]:
+        with stage("route") as routing:
+            indexes, routing_path = self.routing_agent.route(query, query_vector)
+            self._record_route(routing, routing_path)
+        return indexes, routing_path
+
+    async def _aroute(self, query: str, query_vector: List[float] | None) -> tuple[List[str], str]:
+        with stage("route") as routing:
+            indexes, routing_path = await self.routing_agent.aroute(query, query_vector)
+            self._record_route(routing, routing_path)
+        return indexes, routing_path
+
+    def _route_and_retrieve(self, query: str, query_vector: List[float] | None, shop_id: int, top_k: int):
+        """
+        Route, then retrieve from the routed indexes. In speculative mode
+        every index is queried on worker threads while the router decides.
+        Returns (indexes, routing_path, filters, hits).
+        """
+        if not self._should_speculate(query, query_vector):
+            indexes, routing_path = self._route(query, query_vector)
+            filters = self.query_filters(query, shop_id, indexes)
+            hits = []
+            for index_name in indexes:
+                hits.extend(self.retrieve(
+                    query_vector, shop_id=shop_id, index_name=index_name, top_k=top_k, query=query, filter=filters
+                ))
+            return indexes, routing_path, filters, hits
+
+        if self._speculation_executor is None:
+            self._speculation_executor = ThreadPoolExecutor(
+                max_workers=len(self.vectorstores), thread_name_prefix="speculative-retrieval"
+            )
+        # The routed subset is not known yet: use the categories of every index
+        guessed = self.query_filters(query, shop_id, list(self.vectorstores))
+        pending = {
+            # Worker threads report stage timings to this request
+            name: self._speculation_executor.submit(
+                contextvars.copy_context().run, self.retrieve, query_vector, shop_id=shop_id, index_name=name, top_k=top_k, query=query, filter=guessed
+            )
+            for name in self.vectorstores
+        }
         try:
-            ranked = self.reranker.rerank(query, candidates)
-            return [c for c, _ in ranked]
-        except Exception as e:
-            logger.exception(f"Reranking failed: {e}")
-            return candidates
+            indexes, routing_path = self._route(query, query_vector)
+        except BaseException:
+            for work in pending.values():
+                work.cancel()
+            raise
+
+        filters = self.query_filters(query, shop_id, indexes)
+        hits = []
+        if self._settle_speculation(pending, indexes, guessed, filters):
+            for name in indexes:
+                hits.extend(pending[name].result())
+        else:
+            for index_name in indexes:
+                hits.extend(self.retrieve(
+                    query_vector, shop_id=shop_id, index_name=index_name, top_k=top_k, query=query, filter=filters
+                ))
+        return indexes, routing_path, filters, hits
 
-    def build_context(self, top_contents: List[str], max_chars: int = 2000) -> str:
-        context = ""
-        for chunk in top_contents:
-            if len(context) + len(chunk) > max_chars:
-                break
-            context += chunk + "\n\n"
-        return context.strip()
+    async def _aroute_and_retrieve(self, query: str, query_vector: List[float] | None, shop_id: int, top_k: int):
+        """
+        Async variant of `_route_and_retrieve`: speculative retrievals are
+        tasks running while the routing call is awaited.
+        """
+        if not self._should_speculate(query, query_vector):
+            indexes, routing_path = await self._aroute(query, query_vector)
+            filters = self.query_filters(query, shop_id, indexes)
+            hits = await self.aretrieve_all(query_vector, shop_id=shop_id, indexes=indexes, top_k=top_k, query=query, filter=filters)
+            return indexes, routing_path, filters, hits
 
+        guessed = self.query_filters(query, shop_id, list(self.vectorstores))
+        pending = {
+            name: asyncio.create_task(
+                self.aretrieve(query_vector, shop_id=shop_id, index_name=name, top_k=top_k, query=query, filter=guessed)
+            )
+            for name in self.vectorstores
+        }
+        try:
+            indexes, routing_path = await self._aroute(query, query_vector)
+        except BaseException:
+            for work in pending.values():
+                work.cancel()
+            raise
 
+        filters = self.query_filters(query, shop_id, indexes)
+        if self._settle_speculation(pending, indexes, guessed, filters):
+            results = await asyncio.gather(*[pending[name] for name in indexes])
+            hits = [hit for chunks in results for hit in chunks]
+        else:
+            hits = await self.aretrieve_all(query_vector, shop_id=shop_id, indexes=indexes, top_k=top_k, query=query, filter=filters)
+        return indexes, routing_path, filters, hits
 
     def run(self, query: str, shop_id: int, top_k: int = 5):
         """
         Agentic pipeline execution:
-        1. Ask LLM which indexes to query
-        2. Retrieve from selected indexes
+        1. Embed the query and decide which indexes to query
+           (local router first, LLM when it is unsure)
+        2. Retrieve from selected indexes (in speculative mode, from every
+           index while step 1 runs)
         3. Rerank and build context
         4. Generate answer
         """
-        indexes = self.routing_agent.decide_index(query)
-        all_chunks = []
+        with track_request() as timings, stage("pipeline"):
+            query_vector = self.embed_query(query)
+            indexes, routing_path, filters, all_chunks = self._route_and_retrieve(query, query_vector, shop_id, top_k)
 
-        for index_name in indexes:
-            chunks = self.retrieve(query, shop_id=shop_id, index_name=index_name, top_k=top_k)
-            all_chunks.extend(chunks)
+            # Nothing matched the constraints (or older chunks lack the fields):
+            # answer from the unfiltered candidates instead of "no context"
+            if not all_chunks and filters:
+                filters = None
+                record_fallback("unfiltered_retrieval")
+                for index_name in indexes:
+                    all_chunks.extend(
+                        self.retrieve(query_vector, shop_id=shop_id, index_name=index_name, top_k=top_k, query=query)
+                    )
 
-        top_chunks = self.rerank(query, all_chunks)[:top_k]
+            top_chunks = self.rerank(query, all_chunks)[:top_k]
+            context = self.build_context(top_chunks)
+            with stage("generate") as generating:
+                answer = self.response_agent.generate(query, context)
+                generating.outcome = self._generation_outcome(answer)
+            logger.debug(f"answer: {answer}")
+
+            result = {
+                "answer": answer,
+                "context_used": context,
+                "indexes_queried": indexes,
+                "routing_path": routing_path,
+                "filters_applied": filters,
+                "retrieved_docs": len(top_chunks)
+            }
+        result["timings"] = timings.as_dict()
+        return result
+
+    @staticmethod
+    def _generation_outcome(answer: str) -> str:
+        # The response agent turns LLM failures into an apology message
+        return "error" if answer.endswith(GENERATION_ERROR_MESSAGE) else "ok"
+
+    async def _cached_answer(self, shop_id: int, query: str, query_vector: List[float] | None) -> dict | None:
+        # Embeddings barely separate "under 500" from "under 1000", so
+        # queries with structured constraints never use the semantic cache
+        if self.answer_cache is None or parse_query_filters(query) is not None:
+            return None
+        cached = await self.answer_cache.alookup(shop_id, query_vector)
+        record_cache("answer", cached is not None)
+        if cached is None:
+            return None
+        return {**cached, "cache_hit": True}
+
+    async def _cache_answer(self, shop_id: int, query: str, query_vector: List[float] | None, result: dict, version: int | None) -> None:
+        # Never cache "no context" or failed generations
+        if self.answer_cache is None or version is None or not result["context_used"]:
+            return
+        if parse_query_filters(query) is not None:
+            return
+        if result["answer"].endswith(GENERATION_ERROR_MESSAGE):
+            return
+        result = {k: v for k, v in result.items() if k != "timings"}
+        await self.answer_cache.astore(shop_id, query_vector, result, version=version)
+
+    async def _cache_version(self, shop_id: int) -> int | None:
+        return await self.answer_cache.aversion(shop_id) if self.answer_cache is not None else None
+
+    async def aprepare(self, query: str, shop_id: int, top_k: int = 5, query_vector: List[float] | None = None) -> dict:
+        """
+        Run every stage up to (but not including) answer generation:
+        routing, retrieval, reranking and context building.
+        """
+        # The local router scores the query vector, so embed first; the
+        # LLM is only called when the local decision is not confident
+        if query_vector is None:
+            query_vector = await self.aembed_query(query)
+        indexes, routing_path, filters, all_chunks = await self._aroute_and_retrieve(query, query_vector, shop_id, top_k)
+
+        # Nothing matched the constraints (or older chunks lack the fields):
+        # answer from the unfiltered candidates instead of "no context"
+        if not all_chunks and filters:
+            filters = None
+            record_fallback("unfiltered_retrieval")
+            all_chunks = await self.aretrieve_all(query_vector, shop_id=shop_id, indexes=indexes, top_k=top_k, query=query)
+
+        top_chunks = (await self.arerank(query, all_chunks))[:top_k]
         context = self.build_context(top_chunks)
-        answer = self.response_agent.generate(query, context)
-        print("answer:", answer)
 
         return {
-            "answer": answer,
             "context_used": context,
             "indexes_queried": indexes,
+            "routing_path": routing_path,
+            "filters_applied": filters,
             "retrieved_docs": len(top_chunks)
         }
+
+    async def arun(self, query: str, shop_id: int, top_k: int = 5):
+        """
+        Non-blocking pipeline execution. Same stages and result shape as
+        `run`, but every network call is awaited and reranking is offloaded,
+        so a single worker can serve many chats concurrently.
+        """
+        with track_request() as timings, stage("pipeline"):
+            query_vector = await self.aembed_query(query)
+            result = await self._cached_answer(shop_id, query, query_vector)
+            if result is None:
+                version = await self._cache_version(shop_id)
+                prepared = await self.aprepare(query, shop_id=shop_id, top_k=top_k, query_vector=query_vector)
+                with stage("generate") as generating:
+                    answer = await self.response_agent.agenerate(query, prepared["context_used"])
+                    generating.outcome = self._generation_outcome(answer)
+
+                result = {"answer": answer, **prepared, "cache_hit": False}
+                await self._cache_answer(shop_id, query, query_vector, result, version)
+        return {**result, "timings": timings.as_dict()}
+
+    async def astream(self, query: str, shop_id: int, top_k: int = 5) -> AsyncIterator[str]:
+        """
+        Streaming pipeline execution: prepares the context, then yields
+        answer tokens as soon as the LLM produces them.
+        """
+        with stage("pipeline"):
+            query_vector = await self.aembed_query(query)
+            cached = await self._cached_answer(shop_id, query, query_vector)
+            if cached is not None:
+                yield cached["answer"]
+                return
+
+            version = await self._cache_version(shop_id)
+            prepared = await self.aprepare(query, shop_id=shop_id, top_k=top_k, query_vector=query_vector)
+
+            tokens = []
+            with stage("generate") as generating:
+                started = time.perf_counter()
+                async for token in self.response_agent.astream(query, prepared["context_used"]):
+                    if not tokens:
+                        observe("first_token", time.perf_counter() - started)
+                    tokens.append(token)
+                    yield token
+                generating.outcome = self._generation_outcome("".join(tokens))
+
+        result = {"answer": "".join(tokens), **prepared, "cache_hit": False}
+        await self._cache_answer(shop_id, query, query_vector, result, version)
@@ -0,0 +1,129 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+from app.utils.price import AMOUNT_PATTERN, parse_amount
+
+# Whole amount, then its number and optional "k" (three groups)
+_AMOUNT = rf"({AMOUNT_PATTERN})"
+
+_RANGE_RE = re.compile(rf"\b(?:between|from)\s+{_AMOUNT}\s*(?:and|to|-|hanggang)\s*{_AMOUNT}", re.IGNORECASE)
+_UPPER_RE = re.compile(
+    rf"\b(under|below|less than|cheaper than|at most|not more than|no more than|max(?:imum)?|up to|within|"
+    rf"hanggang|mas mura sa|mababa sa|budget(?: is| of)?)\s+{_AMOUNT}",
+    re.IGNORECASE
+)
+_LOWER_RE = re.compile(
+    rf"\b(over|above|more than|higher than|at least|min(?:imum)?|starting at|mahigit|lampas)\s+{_AMOUNT}",
+    re.IGNORECASE
+)
+# A bare range is as likely to be years or sizes ("from 2020 to 2023"), and
+# these also bound time, quantities and sizes ("within 2 days", "up to 3
+# pcs", "hanggang 5pm"); both only count as a price with a currency or
+# some mention of price
+_WEAK_UPPER = {"up to", "within", "hanggang"}
+# A unit right after the number means it is not a price
+_UNIT_RE = re.compile(
+    r"\s*(?:days?|araw|hours?|hrs?|minutes?|mins?|weeks?|months?|years?|yrs?|am|pm|pcs?|pieces?|items?|"
+    r"units?|pax|people|persons?|tao|kms?|meters?|m|kgs?|g|gb|tb|mb|mah|inch(?:es)?|in|ft|feet|x|"
+    r"stars?|ratings?|percent|%)(?!\w)",
+    re.IGNORECASE
+)
+_CURRENCY_RE = re.compile(r"^(?:₱|php|p\s*\d)|k$", re.IGNORECASE)
+_PESOS_RE = re.compile(r"\s*(?:pesos?|php)\b", re.IGNORECASE)
+_PRICE_CONTEXT_RE = re.compile(
+    r"₱|\b(?:price[sd]?|pricing|presyo|budget|cost|costs|magkano|pesos?|php|cheap|mura|afford)\b", re.IGNORECASE
+)
+
+
+def _amount_at(query: str, match: re.Match, group: int) -> Optional[float]:
+    """
+    The amount in `group` (the whole-amount group of _AMOUNT), or None when
+    a unit follows it.
+    """
+    if _UNIT_RE.match(query, match.end(group)):
+        return None
+    return parse_amount(match.group(group + 1), match.group(group + 2))
+
+
+def _is_priced(query: str, match: re.Match, group: int) -> bool:
+    return bool(
+        _CURRENCY_RE.search(match.group(group).strip())
+        or _PESOS_RE.match(query, match.end(group))
+        or _PRICE_CONTEXT_RE.search(query)
+    )
+
+_AVAILABLE_RE = re.compile(
+    r"\b(?:available|in stock|on hand|may stock|meron pa|open today|bukas)\b", re.IGNORECASE
+)
+# Without another constraint, availability words usually ask about a single
+# item ("is the iphone available?"); only filter when the shopper is listing
+_LISTING_RE = re.compile(r"\b(?:what|which|show|list|any|all|ano|anong|alin|mga)\b", re.IGNORECASE)
+
+
+def _category_pattern(category: str) -> re.Pattern:
+    words = re.escape(category.strip().lower()).replace(r"\ ", r"\s+")
+    # Accept the singular or plural form of the category name
+    stem = words[:-1] if words.endswith("s") else words
+    return re.compile(rf"\b{stem}(?:s|es)?\b", re.IGNORECASE)
+
+
+def parse_query_filters(query: str, categories: Iterable[str] = ()) -> Optional[Dict]:
+    """
+    Extract price, category and availability constraints from a shopper
+    question as a Pinecone-style metadata filter over the chunk metadata
+    written by preprocess_product / preprocess_service.
+
+    "electronics below 1000"             -> category + min_price <= 1000
+    "services under 500 available today" -> min_price <= 500 + availability
+    "between 1k and 2,500"               -> min_price <= 2500, max_price >= 1000
+
+    categories: the shop's known category names; categories are free text,
+                so only names the shop actually uses can be matched.
+
+    Returns None when the query has no structured constraint.
+    """
+    conditions: List[Dict] = []
+
+    upper: Optional[float] = None
+    lower: Optional[float] = None
+
+    match = _RANGE_RE.search(query)
+    if (
+        match
+        and _amount_at(query, match, 4) is not None
+        and (_is_priced(query, match, 1) or _is_priced(query, match, 4))
+    ):
+        a = parse_amount(match.group(2), match.group(3))
+        b = _amount_at(query, match, 4)
+        lower, upper = min(a, b), max(a, b)
+    else:
+        # The first bound that is a price ("below 4 stars under 800")
+        for match in _UPPER_RE.finditer(query):
+            if match.group(1).lower() not in _WEAK_UPPER or _is_priced(query, match, 2):
+                upper = _amount_at(query, match, 2)
+                if upper is not None:
+                    break
+        for match in _LOWER_RE.finditer(query):
+            lower = _amount_at(query, match, 2)
+            if lower is not None:
+                break
+
+    # An item fits the budget if something in it is within the bounds:
+    # its cheapest price is under the ceiling, its dearest above the floor
+    if upper is not None:
+        conditions.append({"min_price": {"$lte": upper}})
+    if lower is not None:
+        conditions.append({"max_price": {"$gte": lower}})
+
+    matched = sorted({c for c in categories if c and _category_pattern(c).search(query)})
+    if matched:
+        conditions.append({"category": {"$in": matched}})
+
+    if _AVAILABLE_RE.search(query) and (conditions or _LISTING_RE.search(query)):
+        conditions.append({"availability": {"$eq": True}})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
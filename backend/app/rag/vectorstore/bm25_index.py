@@ -0,0 +1,447 @@
+from typing import Dict, List
+from collections import Counter
+from contextlib import contextmanager
+import asyncio
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+from app.rag.vectorstore.numpy_store import Match, QueryResult, matches_filter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process file locks
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_ALNUM_SPLIT_RE = re.compile(r"[a-z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased alphanumeric tokens. Mixed tokens such as "128gb" or "a54"
+    also emit their letter/digit parts, so "128GB" matches "128 gb".
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = _ALNUM_SPLIT_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[tuple[str, float]]:
+    """
+    Merge ranked id lists: each id scores sum(1 / (k + rank)) over the lists
+    it appears in (rank starts at 1). Returns (id, score), best first.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, _id in enumerate(ranking, start=1):
+            scores[_id] = scores.get(_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class _ShopBM25:
+    def __init__(self):
+        self.texts: Dict[str, str] = {}
+        self.metadata: Dict[str, Dict] = {}
+        self.term_freqs: Dict[str, Counter] = {}
+        self.lengths: Dict[str, int] = {}
+        self.postings: Dict[str, set] = {}
+        self.total_length = 0
+
+    def add(self, _id: str, text: str, metadata: Dict) -> None:
+        self.remove(_id)
+        tf = Counter(tokenize(text))
+        self.texts[_id] = text
+        self.metadata[_id] = metadata
+        self.term_freqs[_id] = tf
+        self.lengths[_id] = sum(tf.values())
+        self.total_length += self.lengths[_id]
+        for term in tf:
+            self.postings.setdefault(term, set()).add(_id)
+
+    def remove(self, _id: str) -> None:
+        tf = self.term_freqs.pop(_id, None)
+        if tf is None:
+            return
+        self.texts.pop(_id)
+        self.metadata.pop(_id)
+        self.total_length -= self.lengths.pop(_id)
+        for term in tf:
+            docs = self.postings[term]
+            docs.discard(_id)
+            if not docs:
+                del self.postings[term]
+
+    def __len__(self) -> int:
+        return len(self.term_freqs)
+
+
+class BM25Index:
+    """
+    Per-shop sparse keyword index over the same chunks as a vector index.
+
+    Complements dense retrieval for exact tokens (SKUs, brands, model
+    numbers such as "iPhone 13 128GB"). Documents use the vector ids
+    (`<item_id>_<chunk_index>`), so results can be fused with the dense
+    matches. Also keeps the chunk text, which Pinecone metadata does not.
+
+    When `data_dir` is set, each shop is persisted as a JSON snapshot
+    (`shop_<id>.json`) plus an append-only `shop_<id>.log` of the chunks
+    added and removed since, so a write costs its own delta rather than
+    the whole shop; the snapshot is rewritten only once the log outgrew
+    it. Several processes may share the directory: writes hold a per-shop
+    file lock and first catch up with the other processes' appends, and
+    reads pick those up too. Chunk texts are also kept with the chunk
+    hashes in the database; `app.services.chunk_sync.rebuild_sparse_index`
+    rebuilds the index from there (e.g. after losing an ephemeral disk).
+
+    Writes do blocking file I/O; async callers use the `a*` variants,
+    which run them in a worker thread.
+    """
+
+    # Logs below this size never trigger a snapshot rewrite
+    compact_min_bytes = 1 << 20
+
+    def __init__(self, index_name: str, data_dir: str | None = None, k1: float = 1.5, b: float = 0.75):
+        self.index_name = index_name
+        self.k1 = k1
+        self.b = b
+        self.path = os.path.join(data_dir, index_name) if data_dir else None
+
+        self._shops: Dict[int, _ShopBM25] = {}
+        # Guards the in-memory postings; held only while applying changes
+        self._lock = threading.RLock()
+        # Serializes this process's writers (taken before the file lock)
+        self._write_lock = threading.Lock()
+        # Per shop, as last read or written here: (mtime_ns, size) of the
+        # snapshot, its generation and size, the log bytes applied, and
+        # whether the log belongs to the snapshot
+        self._disk_state: Dict[int, tuple | None] = {}
+        self._generations: Dict[int, int] = {}
+        self._snapshot_bytes: Dict[int, int] = {}
+        self._log_offsets: Dict[int, int] = {}
+        self._log_live: Dict[int, bool] = {}
+
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            self._load()
+
+    @property
+    def empty(self) -> bool:
+        with self._lock:
+            return not any(len(shop) for shop in self._shops.values())
+
+    def shop_ids(self) -> set:
+        with self._lock:
+            return {shop_id for shop_id, shop in self._shops.items() if len(shop)}
+
+    # Persistence
+
+    def _files(self, shop_id: int) -> tuple[str, str]:
+        base = os.path.join(self.path, f"shop_{shop_id}")
+        return base + ".json", base + ".log"
+
+    def _load(self) -> None:
+        shop_ids = {
+            int(name[len("shop_"):].rsplit(".", 1)[0])
+            for name in os.listdir(self.path)
+            if name.startswith("shop_") and name.endswith((".json", ".log"))
+        }
+        for shop_id in shop_ids:
+            self._read(shop_id)
+        logger.info(f"Loaded BM25 postings for {len(self.shop_ids())} shops in '{self.index_name}'")
+
+    def _read(self, shop_id: int) -> None:
+        """
+        Reload a shop from its snapshot and log. Called under _lock.
+        """
+        snapshot_file, _ = self._files(shop_id)
+        shop = _ShopBM25()
+        try:
+            with open(snapshot_file) as f:
+                stat = os.fstat(f.fileno())
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            state, snapshot = None, {"generation": 0, "docs": []}
+        else:
+            state = (stat.st_mtime_ns, stat.st_size)
+            if isinstance(snapshot, list):
+                # Written before the log existed
+                snapshot = {"generation": 0, "docs": snapshot}
+        for doc in snapshot["docs"]:
+            shop.add(doc["id"], doc["text"], doc["metadata"])
+
+        self._shops[shop_id] = shop
+        self._disk_state[shop_id] = state
+        self._generations[shop_id] = snapshot["generation"]
+        self._snapshot_bytes[shop_id] = state[1] if state else 0
+        self._log_offsets[shop_id] = 0
+        self._log_live[shop_id] = False
+        self._read_log(shop_id)
+
+    def _read_log(self, shop_id: int) -> None:
+        """
+        Apply the complete log records past the ones already applied.
+        Called under _lock.
+        """
+        _, log_file = self._files(shop_id)
+        offset = self._log_offsets.get(shop_id, 0)
+        try:
+            with open(log_file, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        shop = self._shops.setdefault(shop_id, _ShopBM25())
+        # The last piece is empty, or a record still being appended
+        for line in data.split(b"\n")[:-1]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"Ignoring a corrupt record in {log_file}")
+                break
+            offset += len(line) + 1
+            if "generation" in record:
+                # Header: a log left from before the current snapshot is
+                # already part of it
+                self._log_live[shop_id] = record["generation"] == self._generations.get(shop_id, 0)
+            elif not self._log_live.get(shop_id):
+                continue
+            elif record["op"] == "add":
+                for doc in record["docs"]:
+                    shop.add(doc["id"], doc["text"], doc["metadata"])
+            elif record["op"] == "remove":
+                for _id in record["ids"]:
+                    shop.remove(_id)
+        self._log_offsets[shop_id] = offset
+
+    def _refresh(self, shop_id: int) -> None:
+        """
+        Catch up with changes another process wrote since this one last
+        read or wrote the shop. Called under _lock.
+        """
+        if not self.path:
+            return
+        snapshot_file, log_file = self._files(shop_id)
+        try:
+            stat = os.stat(snapshot_file)
+            state = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            state = None
+        if state != self._disk_state.get(shop_id):
+            self._read(shop_id)
+            return
+        try:
+            log_size = os.path.getsize(log_file)
+        except FileNotFoundError:
+            log_size = 0
+        offset = self._log_offsets.get(shop_id, 0)
+        if log_size < offset:
+            self._read(shop_id)
+        elif log_size > offset:
+            self._read_log(shop_id)
+
+    @contextmanager
+    def _writing(self, shop_id: int):
+        """
+        Hold the shop's file lock and the in-process locks, with the shop
+        brought up to date with its files.
+        """
+        with self._write_lock:
+            if not self.path or fcntl is None:
+                with self._lock:
+                    self._refresh(shop_id)
+                    yield
+                return
+            with open(os.path.join(self.path, f"shop_{shop_id}.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    with self._lock:
+                        self._refresh(shop_id)
+                        yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _persist(self, shop_id: int, records: List[Dict]) -> None:
+        """
+        Append a write's records to the shop's log, or rewrite its snapshot
+        once the log outgrew it (or the shop emptied). Called in _writing.
+        """
+        if not self.path or not records:
+            return
+        shop = self._shops.get(shop_id)
+        log_bytes = self._log_offsets.get(shop_id, 0) if self._log_live.get(shop_id) else 0
+        if shop is None or not len(shop):
+            self._remove_files(shop_id)
+        elif log_bytes > max(self._snapshot_bytes.get(shop_id, 0), self.compact_min_bytes):
+            self._write_snapshot(shop_id, shop)
+        else:
+            self._append(shop_id, records)
+
+    def _append(self, shop_id: int, records: List[Dict]) -> None:
+        _, log_file = self._files(shop_id)
+        lines = [json.dumps(record) for record in records]
+        if self._log_live.get(shop_id):
+            # Drop a torn record left by a process that died mid-append
+            if os.path.getsize(log_file) > self._log_offsets[shop_id]:
+                os.truncate(log_file, self._log_offsets[shop_id])
+        else:
+            if os.path.exists(log_file):
+                os.remove(log_file)
+            lines.insert(0, json.dumps({"generation": self._generations.get(shop_id, 0)}))
+            self._log_offsets[shop_id] = 0
+            self._log_live[shop_id] = True
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with open(log_file, "ab") as f:
+            f.write(data)
+        self._log_offsets[shop_id] += len(data)
+
+    def _write_snapshot(self, shop_id: int, shop: _ShopBM25) -> None:
+        snapshot_file, log_file = self._files(shop_id)
+        generation = self._generations.get(shop_id, 0) + 1
+        # Write next to the target and rename, so a crash never leaves a
+        # half-written snapshot; the generation bump makes the old log stale
+        # even if the process dies before removing it
+        with open(snapshot_file + ".tmp", "w") as f:
+            json.dump({"generation": generation, "docs": [
+                {"id": _id, "text": shop.texts[_id], "metadata": shop.metadata[_id]}
+                for _id in shop.texts
+            ]}, f)
+        os.replace(snapshot_file + ".tmp", snapshot_file)
+        if os.path.exists(log_file):
+            os.remove(log_file)
+        stat = os.stat(snapshot_file)
+        self._disk_state[shop_id] = (stat.st_mtime_ns, stat.st_size)
+        self._generations[shop_id] = generation
+        self._snapshot_bytes[shop_id] = stat.st_size
+        self._log_offsets[shop_id] = 0
+        self._log_live[shop_id] = False
+
+    def _remove_files(self, shop_id: int) -> None:
+        snapshot_file, log_file = self._files(shop_id)
+        # An empty snapshot first, so a crash part way never brings back
+        # chunks from the old snapshot or log
+        self._write_snapshot(shop_id, _ShopBM25())
+        os.remove(snapshot_file)
+        self._disk_state[shop_id] = None
+        self._generations[shop_id] = 0
+        self._snapshot_bytes[shop_id] = 0
+
+    # Writes
+
+    def replace_items(self, shop_id: int, id_key: str, chunks_by_item: Dict[int, List[Dict]]) -> None:
+        """
+        Make the indexed chunks of each item exactly `chunks_by_item[item]`.
+        """
+        if not chunks_by_item:
+            return
+        with self._writing(shop_id):
+            shop = self._shops.setdefault(shop_id, _ShopBM25())
+            removed = [i for i, meta in shop.metadata.items() if meta.get(id_key) in chunks_by_item]
+            for _id in removed:
+                shop.remove(_id)
+            docs = []
+            for chunks in chunks_by_item.values():
+                for chunk in chunks:
+                    meta = chunk["metadata"]
+                    docs.append({"id": f"{meta[id_key]}_{meta['chunk_index']}", "text": chunk["text"], "metadata": meta})
+                    shop.add(docs[-1]["id"], chunk["text"], meta)
+            records = [{"op": "remove", "ids": removed}] if removed else []
+            if docs:
+                records.append({"op": "add", "docs": docs})
+            self._persist(shop_id, records)
+
+    def delete_by_items(self, shop_id: int, id_key: str, item_ids: List[int]) -> None:
+        with self._writing(shop_id):
+            shop = self._shops.get(shop_id)
+            if shop is None:
+                return
+            removed = [i for i, meta in shop.metadata.items() if meta.get(id_key) in item_ids]
+            for _id in removed:
+                shop.remove(_id)
+            if removed:
+                self._persist(shop_id, [{"op": "remove", "ids": removed}])
+
+    def delete_by_shop(self, shop_id: int) -> None:
+        with self._writing(shop_id):
+            shop = self._shops.pop(shop_id, None)
+            if shop is not None and len(shop):
+                self._persist(shop_id, [{"op": "remove", "ids": list(shop.texts)}])
+
+    async def areplace_items(self, shop_id: int, id_key: str, chunks_by_item: Dict[int, List[Dict]]) -> None:
+        await asyncio.to_thread(self.replace_items, shop_id, id_key, chunks_by_item)
+
+    async def adelete_by_items(self, shop_id: int, id_key: str, item_ids: List[int]) -> None:
+        await asyncio.to_thread(self.delete_by_items, shop_id, id_key, item_ids)
+
+    async def adelete_by_shop(self, shop_id: int) -> None:
+        await asyncio.to_thread(self.delete_by_shop, shop_id)
+
+    def texts(self, shop_id: int, ids: List[str]) -> Dict[str, str]:
+        """
+        Chunk text for the given vector ids, where known.
+        """
+        with self._lock:
+            self._refresh(shop_id)
+            shop = self._shops.get(shop_id)
+            if shop is None:
+                return {}
+            return {_id: shop.texts[_id] for _id in ids if _id in shop.texts}
+
+    def categories(self, shop_id: int) -> set:
+        """
+        Distinct category names indexed for a shop, used by the query
+        filter parser to recognise seller-defined categories.
+        """
+        with self._lock:
+            self._refresh(shop_id)
+            shop = self._shops.get(shop_id)
+            if shop is None:
+                return set()
+            return {meta["category"] for meta in shop.metadata.values() if meta.get("category")}
+
+    def query(self, query_text: str, shop_id: int, top_k: int = 5, filter: Dict | None = None) -> QueryResult:
+        """
+        Okapi BM25 top-k within one shop, optionally restricted by a
+        Pinecone-style metadata filter. Match metadata carries the chunk
+        text under "text".
+        """
+        with self._lock:
+            self._refresh(shop_id)
+            shop = self._shops.get(shop_id)
+            if shop is None or not len(shop):
+                return QueryResult()
+
+            n_docs = len(shop)
+            avg_length = shop.total_length / n_docs
+            scores: Dict[str, float] = {}
+
+            for term in set(tokenize(query_text)):
+                docs = shop.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for _id in docs:
+                    tf = shop.term_freqs[_id][term]
+                    norm = tf + self.k1 * (1 - self.b + self.b * shop.lengths[_id] / avg_length)
+                    scores[_id] = scores.get(_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            if filter:
+                scores = {i: s for i, s in scores.items() if matches_filter(shop.metadata[i], filter)}
+
+            top = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return QueryResult([
+                Match(id=_id, score=score, metadata={**shop.metadata[_id], "text": shop.texts[_id]})
+                for _id, score in top
+            ])
@@ -0,0 +1,530 @@
+from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, field
+import asyncio
+import base64
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Match:
+    id: str
+    score: float
+    metadata: Dict[str, Any]
+
+
+@dataclass
+class QueryResult:
+    """
+    Same shape the pipeline reads from Pinecone responses (`.matches`).
+    """
+    matches: List[Match] = field(default_factory=list)
+
+
+def matches_filter(metadata: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Pinecone-style metadata filter: plain equality, $eq, $ne,
+    $in, $nin, $gt, $gte, $lt, $lte, and $and / $or lists.
+    """
+    if not flt:
+        return True
+
+    for key, condition in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        for op, expected in condition.items():
+            if op == "$eq":
+                ok = value == expected
+            elif op == "$ne":
+                ok = value != expected
+            elif op == "$in":
+                ok = value in expected
+            elif op == "$nin":
+                ok = value not in expected
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None or isinstance(value, (str, bool)):
+                    return False
+                ok = {
+                    "$gt": value > expected,
+                    "$gte": value >= expected,
+                    "$lt": value < expected,
+                    "$lte": value <= expected,
+                }[op]
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            if not ok:
+                return False
+
+    return True
+
+
+class _ShopPartition:
+    """
+    Vectors of one shop: a contiguous float32 matrix (rows are unit length)
+    plus parallel id / metadata lists. Deletes move the last row into the
+    hole so the live rows stay contiguous.
+    """
+
+    def __init__(self, dimension: int, matrix: np.ndarray | None = None, ids: List[str] | None = None,
+                 metadata: List[Dict] | None = None):
+        self.dimension = dimension
+        self.matrix = matrix if matrix is not None else np.empty((0, dimension), dtype=np.float32)
+        self.ids: List[str] = ids or []
+        self.metadata: List[Dict] = metadata or []
+        self.rows: Dict[str, int] = {_id: i for i, _id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _reserve(self, extra: int) -> None:
+        # Loaded partitions are read-only memory maps; the first write copies
+        # them into a growable in-memory buffer.
+        needed = len(self) + extra
+        if self.matrix.flags.writeable and self.matrix.shape[0] >= needed:
+            return
+        capacity = max(needed, 2 * self.matrix.shape[0], 16)
+        grown = np.empty((capacity, self.dimension), dtype=np.float32)
+        grown[:len(self)] = self.matrix[:len(self)]
+        self.matrix = grown
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, metadata: List[Dict]) -> None:
+        self._reserve(len(ids))
+        for _id, vector, meta in zip(ids, vectors, metadata):
+            row = self.rows.get(_id)
+            if row is None:
+                row = len(self.ids)
+                self.rows[_id] = row
+                self.ids.append(_id)
+                self.metadata.append(meta)
+            else:
+                self.metadata[row] = meta
+            self.matrix[row] = vector
+
+    def update_metadata(self, _id: str, metadata: Dict) -> bool:
+        row = self.rows.get(_id)
+        if row is None:
+            return False
+        self.metadata[row] = metadata
+        return True
+
+    def delete_rows(self, rows: List[int]) -> List[str]:
+        if not rows:
+            return []
+        self._reserve(0)
+        deleted = []
+        for row in sorted(set(rows), reverse=True):
+            last = len(self.ids) - 1
+            deleted.append(self.ids[row])
+            del self.rows[self.ids[row]]
+            if row != last:
+                self.matrix[row] = self.matrix[last]
+                self.ids[row] = self.ids[last]
+                self.metadata[row] = self.metadata[last]
+                self.rows[self.ids[row]] = row
+            self.ids.pop()
+            self.metadata.pop()
+        return deleted
+
+    def delete_ids(self, ids: List[str]) -> List[str]:
+        return self.delete_rows([self.rows[_id] for _id in ids if _id in self.rows])
+
+    def snapshot(self) -> tuple[np.ndarray, List[str], List[Dict]]:
+        return np.array(self.matrix[:len(self)]), list(self.ids), list(self.metadata)
+
+    def rows_matching(self, flt: Optional[Dict]) -> List[int]:
+        return [i for i, meta in enumerate(self.metadata) if matches_filter(meta, flt)]
+
+    def search(self, vector: np.ndarray, top_k: int, flt: Optional[Dict]) -> List[Match]:
+        count = len(self)
+        if count == 0:
+            return []
+
+        scores = self.matrix[:count] @ vector
+        if flt:
+            mask = np.zeros(count, dtype=bool)
+            mask[self.rows_matching(flt)] = True
+            scores = np.where(mask, scores, -np.inf)
+            count = int(mask.sum())
+            if count == 0:
+                return []
+
+        k = min(top_k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [Match(id=self.ids[i], score=float(scores[i]), metadata=self.metadata[i]) for i in top]
+
+
+class NumpyVectorStore:
+    """
+    In-process vector store with the same surface as PineconeVectorStore.
+
+    Keeps one partition per shop and answers queries with a brute-force
+    cosine top-k (`argpartition`) over that shop's matrix, which stays
+    sub-millisecond for small catalogs and needs no network.
+
+    When `data_dir` is set, each shop is persisted as a snapshot
+    (`shop_<id>.npy` + `shop_<id>.json`, memory-mapped at startup) plus an
+    append-only `shop_<id>.log` of the upserts, metadata updates and
+    deletes since that snapshot, replayed on load. Every public write
+    appends its changes once, when it is done (from a worker thread on the
+    async paths); a shop's snapshot is rewritten only once its log has
+    grown past the snapshot size.
+    """
+
+    # Logs below this size never trigger a snapshot rewrite
+    compact_min_bytes = 1 << 20
+
+    def __init__(self, index_name: str, embedder, dimension: int | None = None, data_dir: str | None = None):
+        """
+        dimension: vector size; defaults to settings.EMBEDDING_DIMENSION
+        data_dir: directory to persist partitions in (one subdirectory per
+                  index); None keeps everything in memory
+        """
+        self.index_name = index_name
+        self.embedder = embedder
+        self.dimension = dimension or settings.EMBEDDING_DIMENSION
+        self.path = os.path.join(data_dir, index_name) if data_dir else None
+
+        self._partitions: Dict[int, _ShopPartition] = {}
+        self._shop_of: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+        # Changes not yet written, per shop; taken and written in order
+        # under _io_lock
+        self._pending: Dict[int, List[Dict]] = {}
+        self._io_lock = threading.Lock()
+        self._generations: Dict[int, int] = {}
+        self._log_bytes: Dict[int, int] = {}
+
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            self._load()
+
+    # Persistence
+
+    def _files(self, shop_id: int) -> tuple[str, str, str]:
+        base = os.path.join(self.path, f"shop_{shop_id}")
+        return base + ".npy", base + ".json", base + ".log"
+
+    def _load(self) -> None:
+        shop_ids = {
+            int(name[len("shop_"):].rsplit(".", 1)[0])
+            for name in os.listdir(self.path)
+            if name.startswith("shop_") and name.endswith((".json", ".log"))
+        }
+        for shop_id in shop_ids:
+            matrix_file, meta_file, log_file = self._files(shop_id)
+            partition = _ShopPartition(self.dimension)
+            if os.path.exists(meta_file):
+                with open(meta_file) as f:
+                    meta = json.load(f)
+                matrix = np.load(matrix_file, mmap_mode="r")
+                if matrix.shape[1] != self.dimension:
+                    raise ValueError(
+                        f"Stored vectors in {matrix_file} have dimension {matrix.shape[1]} but "
+                        f"EMBEDDING_DIMENSION is {self.dimension}"
+                    )
+                partition = _ShopPartition(self.dimension, matrix, meta["ids"], meta["metadata"])
+                self._generations[shop_id] = meta.get("generation", 0)
+            if os.path.exists(log_file):
+                self._replay(shop_id, partition, log_file)
+            if len(partition):
+                self._partitions[shop_id] = partition
+                self._shop_of.update({_id: shop_id for _id in partition.ids})
+        logger.info(f"Loaded {len(self._partitions)} shop partitions for '{self.index_name}'")
+
+    def _replay(self, shop_id: int, partition: _ShopPartition, log_file: str) -> None:
+        generation = self._generations.get(shop_id, 0)
+        with open(log_file, "rb") as f:
+            lines = f.readlines()
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, ValueError):
+            header = None
+        if header is None or header.get("generation") != generation:
+            # Written before the current snapshot, which already holds it
+            os.remove(log_file)
+            return
+
+        good_bytes = len(lines[0])
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn last append of a crashed process: drop it
+                logger.warning(f"Ignoring a partial record at the end of {log_file}")
+                break
+            self._apply(partition, record)
+            good_bytes += len(line)
+        if good_bytes < sum(len(line) for line in lines):
+            with open(log_file, "r+b") as f:
+                f.truncate(good_bytes)
+        self._log_bytes[shop_id] = good_bytes
+
+    def _apply(self, partition: _ShopPartition, record: Dict) -> None:
+        if record["op"] == "upsert":
+            vectors = np.frombuffer(base64.b64decode(record["vectors"]), dtype=np.float32)
+            partition.upsert(record["ids"], vectors.reshape(len(record["ids"]), self.dimension), record["metadata"])
+        elif record["op"] == "metadata":
+            for _id, metadata in zip(record["ids"], record["metadata"]):
+                partition.update_metadata(_id, metadata)
+        elif record["op"] == "delete":
+            partition.delete_ids(record["ids"])
+
+    def _record(self, shop_id: int, op: str, ids: List[str], **fields) -> None:
+        # Called under _lock, in the order the changes were applied
+        if self.path and ids:
+            self._pending.setdefault(shop_id, []).append({"op": op, "ids": ids, **fields})
+
+    def _persist(self) -> None:
+        """
+        Append the changes made since the last call to the shops' logs, or
+        rewrite a shop's snapshot when its log outgrew it (or it emptied).
+        Blocking file I/O: async callers run it in a thread.
+        """
+        if not self.path:
+            return
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                snapshots = {}
+                for shop_id in pending:
+                    partition = self._partitions.get(shop_id)
+                    if partition is None:
+                        snapshots[shop_id] = None
+                    elif self._log_bytes.get(shop_id, 0) > max(len(partition) * self.dimension * 4, self.compact_min_bytes):
+                        snapshots[shop_id] = partition.snapshot()
+
+            for shop_id, records in pending.items():
+                if shop_id in snapshots:
+                    self._write_snapshot(shop_id, snapshots[shop_id])
+                else:
+                    self._append(shop_id, records)
+
+    def _append(self, shop_id: int, records: List[Dict]) -> None:
+        log_file = self._files(shop_id)[2]
+        lines = []
+        if not os.path.exists(log_file):
+            lines.append(json.dumps({"generation": self._generations.get(shop_id, 0)}))
+            self._log_bytes[shop_id] = 0
+        for record in records:
+            if "vectors" in record:
+                record = {**record, "vectors": base64.b64encode(record["vectors"].tobytes()).decode("ascii")}
+            lines.append(json.dumps(record))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with open(log_file, "ab") as f:
+            f.write(data)
+        self._log_bytes[shop_id] = self._log_bytes.get(shop_id, 0) + len(data)
+
+    def _write_snapshot(self, shop_id: int, state: tuple[np.ndarray, List[str], List[Dict]] | None) -> None:
+        matrix_file, meta_file, log_file = self._files(shop_id)
+        matrix, ids, metadata = state or (np.empty((0, self.dimension), dtype=np.float32), [], [])
+        generation = self._generations.get(shop_id, 0) + 1
+
+        # Write next to the target and rename, so a crash never leaves a
+        # half-written partition behind. The generation bump makes the old
+        # log stale even if the process dies before removing it.
+        np.save(matrix_file + ".tmp.npy", np.ascontiguousarray(matrix))
+        os.replace(matrix_file + ".tmp.npy", matrix_file)
+        with open(meta_file + ".tmp", "w") as f:
+            json.dump({"generation": generation, "ids": ids, "metadata": metadata}, f)
+        os.replace(meta_file + ".tmp", meta_file)
+        if os.path.exists(log_file):
+            os.remove(log_file)
+        self._generations[shop_id] = generation
+        self._log_bytes[shop_id] = 0
+
+    # Writes
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _write_chunks(self, chunks: List[Dict], vectors, id_key: str) -> None:
+        matrix = self._normalize(vectors)
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-d vectors, got {matrix.shape[1]}")
+
+        by_shop: Dict[int, List[int]] = {}
+        for i, chunk in enumerate(chunks):
+            by_shop.setdefault(chunk["metadata"]["shop_id"], []).append(i)
+
+        with self._lock:
+            for shop_id, positions in by_shop.items():
+                partition = self._partitions.setdefault(shop_id, _ShopPartition(self.dimension))
+                ids = [
+                    f"{chunks[i]['metadata'][id_key]}_{chunks[i]['metadata']['chunk_index']}"
+                    for i in positions
+                ]
+                vectors, metadata = matrix[positions], [chunks[i]["metadata"] for i in positions]
+                partition.upsert(ids, vectors, metadata)
+                self._shop_of.update({_id: shop_id for _id in ids})
+                self._record(shop_id, "upsert", ids, metadata=metadata, vectors=vectors)
+
+    def _upsert_chunks(self, chunks: List[Dict], id_key: str) -> None:
+        if not chunks:
+            return
+        self._write_chunks(chunks, self.embedder.embed([c["text"] for c in chunks]), id_key)
+        self._persist()
+
+    def upsert_product_chunks(self, chunks: List[Dict]):
+        self._upsert_chunks(chunks, "product_id")
+
+    def upsert_service_chunks(self, chunks: List[Dict]):
+        self._upsert_chunks(chunks, "service_id")
+
+    async def aupsert_chunks(self, chunks: List[Dict], id_key: str) -> List[Optional[str]]:
+        """
+        Same contract as PineconeVectorStore.aupsert_chunks: embeds in
+        EMBED_BATCH_SIZE batches and returns one error or None per chunk.
+        Written to disk once, after the last batch.
+        """
+        errors: List[Optional[str]] = [None] * len(chunks)
+
+        for start in range(0, len(chunks), settings.EMBED_BATCH_SIZE):
+            batch = chunks[start:start + settings.EMBED_BATCH_SIZE]
+            try:
+                vectors = await self.embedder.aembed([c["text"] for c in batch])
+                self._write_chunks(batch, vectors, id_key)
+            except Exception as e:
+                logger.exception(f"Embedding batch at {start} failed: {e}")
+                errors[start:start + len(batch)] = [f"embedding failed: {e}"] * len(batch)
+
+        await asyncio.to_thread(self._persist)
+        return errors
+
+    async def aupdate_chunk_metadata(self, chunks: List[Dict], id_key: str) -> List[Optional[str]]:
+        errors: List[Optional[str]] = [None] * len(chunks)
+        with self._lock:
+            for i, chunk in enumerate(chunks):
+                _id = f"{chunk['metadata'][id_key]}_{chunk['metadata']['chunk_index']}"
+                shop_id = self._shop_of.get(_id)
+                if shop_id is None or not self._partitions[shop_id].update_metadata(_id, chunk["metadata"]):
+                    errors[i] = f"metadata update failed: vector {_id} not found"
+                    continue
+                self._record(shop_id, "metadata", [_id], metadata=[chunk["metadata"]])
+        await asyncio.to_thread(self._persist)
+        return errors
+
+    # Deletes
+
+    def _delete_rows(self, shop_id: int, rows: List[int]) -> None:
+        # Called under _lock
+        partition = self._partitions[shop_id]
+        deleted = partition.delete_rows(rows)
+        for _id in deleted:
+            self._shop_of.pop(_id, None)
+        if not len(partition):
+            del self._partitions[shop_id]
+        self._record(shop_id, "delete", deleted)
+
+    def _delete_where(self, shop_id: int, flt: Optional[Dict]) -> None:
+        with self._lock:
+            partition = self._partitions.get(shop_id)
+            if partition is None:
+                return
+            self._delete_rows(shop_id, partition.rows_matching(flt))
+
+    async def adelete_ids(self, ids: List[str], page_size: int = 1000):
+        with self._lock:
+            rows_by_shop: Dict[int, List[int]] = {}
+            for _id in ids:
+                shop_id = self._shop_of.get(_id)
+                if shop_id is not None:
+                    rows_by_shop.setdefault(shop_id, []).append(self._partitions[shop_id].rows[_id])
+            for shop_id, rows in rows_by_shop.items():
+                self._delete_rows(shop_id, rows)
+        await asyncio.to_thread(self._persist)
+
+    async def adelete_by_items(self, shop_id: int, id_key: str, item_ids: List[int]):
+        if item_ids:
+            self._delete_where(shop_id, {id_key: {"$in": item_ids}})
+            await asyncio.to_thread(self._persist)
+
+    def delete_by_product(self, shop_id: int, product_id: int):
+        self._delete_where(shop_id, {"product_id": product_id})
+        self._persist()
+
+    def delete_by_service(self, shop_id: int, service_id: int):
+        self._delete_where(shop_id, {"service_id": service_id})
+        self._persist()
+
+    def delete_by_shop(self, shop_id: int):
+        self._delete_where(shop_id, None)
+        self._persist()
+
+    # Queries
+
+    def _clean_query(self, query_text: str, top_k: int) -> str:
+        if not query_text or not query_text.strip():
+            raise ValueError("Query text cannot be empty.")
+
+        if top_k <= 0:
+            raise ValueError("top_k must be > 0")
+
+        return query_text.strip()
+
+    def query(self, query_text: str, shop_id: int, top_k: int = 5, filter: Dict | None = None):
+        query_text = self._clean_query(query_text, top_k)
+
+        try:
+            q_embed = self.embedder.embed([query_text])[0]
+        except Exception as e:
+            raise RuntimeError(f"Failed to embed query: {e}")
+
+        return self.query_by_vector(q_embed, shop_id=shop_id, top_k=top_k, filter=filter)
+
+    def query_by_vector(self, vector: List[float], shop_id: int, top_k: int = 5, filter: Dict | None = None):
+        """
+        Cosine top-k within one shop's partition, optionally restricted by a
+        Pinecone-style metadata filter.
+        """
+        if top_k <= 0:
+            raise ValueError("top_k must be > 0")
+
+        with self._lock:
+            partition = self._partitions.get(shop_id)
+            if partition is None:
+                return QueryResult()
+            return QueryResult(partition.search(self._normalize(vector)[0], top_k, filter))
+
+    async def aquery(self, query_text: str, shop_id: int, top_k: int = 5, filter: Dict | None = None):
+        query_text = self._clean_query(query_text, top_k)
+
+        try:
+            q_embed = (await self.embedder.aembed([query_text]))[0]
+        except Exception as e:
+            raise RuntimeError(f"Failed to embed query: {e}")
+
+        return self.query_by_vector(q_embed, shop_id=shop_id, top_k=top_k, filter=filter)
+
+    async def aquery_by_vector(self, vector: List[float], shop_id: int, top_k: int = 5, filter: Dict | None = None):
+        # In-process and sub-millisecond for typical shops: no thread hop
+        return self.query_by_vector(vector, shop_id=shop_id, top_k=top_k, filter=filter)
+
+    async def aclose(self):
+        pass
@@ -1,20 +1,56 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+import asyncio
+import logging
 from pinecone import Pinecone, ServerlessSpec
 from dotenv import load_dotenv
 import os
 
+from app.core.config import settings
+from app.core.resilience import CallPolicy, ResilientCaller, hedge_percentile
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class PineconeVectorStore:
-    def __init__(self, index_name: str, embedder, dimension: int = 1536):
-        self.pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    def __init__(
+        self,
+        index_name: str,
+        embedder,
+        dimension: int | None = None,
+        client: Pinecone | None = None,
+        existing_indexes: Dict[str, int] | None = None,
+        pool_threads: int | None = None,
+        connection_pool_maxsize: int | None = None
+    ):
+        """
+        dimension: vector size; defaults to settings.EMBEDDING_DIMENSION and
+                   must match the embedder's output
+        client: shared Pinecone client; a new one is created when omitted
+        existing_indexes: index name -> dimension already listed by the
+                          caller, which skips the list_indexes() round trip
+        pool_threads / connection_pool_maxsize: HTTP pool limits of the
+                          data-plane client for this index
+        """
+        self.pc = client or Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
         self.embedder = embedder
         self.index_name = index_name
 
-        if index_name not in self.pc.list_indexes().names():
+        self.dimension = dimension or settings.EMBEDDING_DIMENSION
+
+        if existing_indexes is None:
+            existing_indexes = {index.name: index.dimension for index in self.pc.list_indexes()}
+
+        if index_name in existing_indexes and existing_indexes[index_name] != self.dimension:
+            raise ValueError(
+                f"Index '{index_name}' has dimension {existing_indexes[index_name]} but "
+                f"EMBEDDING_DIMENSION is {self.dimension}; rebuild the index or change the setting"
+            )
+
+        if index_name not in existing_indexes:
             self.pc.create_index(
                 name=index_name,
-                dimension=dimension,
+                dimension=self.dimension,
                 metric="cosine",
                 spec=ServerlessSpec(
                     cloud="aws",
@@ -22,7 +58,38 @@ class PineconeVectorStore:
                 )
             )
 
-        self.index = self.pc.Index(index_name)
+        index_kwargs = {}
+        if pool_threads:
+            index_kwargs["pool_threads"] = pool_threads
+        if connection_pool_maxsize:
+            index_kwargs["connection_pool_maxsize"] = connection_pool_maxsize
+        self.index = self.pc.Index(index_name, **index_kwargs)
+        self._async_index = None
+        self._async_index_lock = asyncio.Lock()
+        # Queries are idempotent reads: deadline, retries and hedging, with
+        # one circuit breaker per index
+        self.query_resilience = ResilientCaller(f"pinecone:{index_name}", CallPolicy(
+            attempt_timeout=settings.PINECONE_QUERY_TIMEOUT_SECONDS,
+            deadline=settings.PINECONE_QUERY_DEADLINE_SECONDS,
+            hedge_percentile=hedge_percentile()
+        ))
+
+    async def _get_async_index(self):
+        """
+        Lazily open the aiohttp-backed index client. It has to be created
+        inside the running event loop, so it cannot be built in __init__.
+        """
+        if self._async_index is None:
+            async with self._async_index_lock:
+                if self._async_index is None:
+                    description = await asyncio.to_thread(self.pc.describe_index, self.index_name)
+                    self._async_index = self.pc.IndexAsyncio(host=description.host)
+        return self._async_index
+
+    async def aclose(self):
+        if self._async_index is not None:
+            await self._async_index.close()
+            self._async_index = None
 
     def upsert_product_chunks(self, chunks: List[Dict]):
         if not chunks:
@@ -42,6 +109,134 @@ class PineconeVectorStore:
 
         self.index.upsert(vectors=payload)
 
+    async def aupsert_chunks(self, chunks: List[Dict], id_key: str) -> List[Optional[str]]:
+        """
+        Bulk upsert for catalog ingestion.
+
+        Chunk texts are embedded in batches of EMBED_BATCH_SIZE (the
+        embedding API's maximum) and vectors are written in pages of
+        UPSERT_BATCH_SIZE, with up to INGEST_CONCURRENCY calls in flight.
+
+        id_key: metadata key of the owning item ("product_id" / "service_id")
+
+        Returns one entry per chunk: None on success, or the error message
+        of the embed/upsert call that covered it.
+        """
+        errors: List[Optional[str]] = [None] * len(chunks)
+        if not chunks:
+            return errors
+
+        semaphore = asyncio.Semaphore(settings.INGEST_CONCURRENCY)
+        vectors: List[Optional[List[float]]] = [None] * len(chunks)
+
+        async def embed_batch(start: int):
+            batch = chunks[start:start + settings.EMBED_BATCH_SIZE]
+            async with semaphore:
+                try:
+                    result = await self.embedder.aembed([c["text"] for c in batch])
+                    vectors[start:start + len(batch)] = result
+                except Exception as e:
+                    logger.exception(f"Embedding batch at {start} failed: {e}")
+                    errors[start:start + len(batch)] = [f"embedding failed: {e}"] * len(batch)
+
+        await asyncio.gather(*[
+            embed_batch(start) for start in range(0, len(chunks), settings.EMBED_BATCH_SIZE)
+        ])
+
+        ready = [
+            (i, {
+                "id": f"{chunk['metadata'][id_key]}_{chunk['metadata']['chunk_index']}",
+                "values": vectors[i],
+                "metadata": chunk["metadata"]
+            })
+            for i, chunk in enumerate(chunks)
+            if errors[i] is None
+        ]
+
+        async def upsert_page(page):
+            async with semaphore:
+                try:
+                    index = await self._get_async_index()
+                    await index.upsert(vectors=[vector for _, vector in page])
+                except Exception as e:
+                    logger.exception(f"Upsert of {len(page)} vectors failed: {e}")
+                    for i, _ in page:
+                        errors[i] = f"upsert failed: {e}"
+
+        await asyncio.gather(*[
+            upsert_page(ready[start:start + settings.UPSERT_BATCH_SIZE])
+            for start in range(0, len(ready), settings.UPSERT_BATCH_SIZE)
+        ])
+
+        return errors
+
+    async def aupdate_chunk_metadata(self, chunks: List[Dict], id_key: str, page_size: int = 100) -> List[Optional[str]]:
+        """
+        Replace the metadata of chunks whose text (and so vector) did not
+        change, without re-embedding them. Returns one error or None per chunk.
+
+        Pinecone's update(set_metadata=...) merges keys, so keys the new
+        metadata no longer has (e.g. price bounds of a service whose price
+        range stopped parsing) would linger. The stored vectors are fetched
+        instead and upserted again with the full new metadata.
+        """
+        errors: List[Optional[str]] = [None] * len(chunks)
+        if not chunks:
+            return errors
+
+        index = await self._get_async_index()
+        semaphore = asyncio.Semaphore(settings.INGEST_CONCURRENCY)
+        ids = [f"{chunk['metadata'][id_key]}_{chunk['metadata']['chunk_index']}" for chunk in chunks]
+
+        async def replace_page(positions: List[int]):
+            async with semaphore:
+                try:
+                    fetched = (await index.fetch(ids=[ids[i] for i in positions])).vectors
+                    vectors = []
+                    for i in positions:
+                        stored = fetched.get(ids[i])
+                        if stored is None:
+                            errors[i] = f"metadata update failed: vector {ids[i]} not found"
+                            continue
+                        vectors.append({"id": ids[i], "values": stored.values, "metadata": chunks[i]["metadata"]})
+                    if vectors:
+                        await index.upsert(vectors=vectors)
+                except Exception as e:
+                    logger.exception(f"Metadata update of {len(positions)} vectors failed: {e}")
+                    for i in positions:
+                        errors[i] = f"metadata update failed: {e}"
+
+        positions = list(range(len(chunks)))
+        await asyncio.gather(*[
+            replace_page(positions[start:start + page_size])
+            for start in range(0, len(positions), page_size)
+        ])
+        return errors
+
+    async def adelete_ids(self, ids: List[str], page_size: int = 1000):
+        """
+        Delete vectors by id, in pages of at most 1000 ids per call.
+        """
+        if not ids:
+            return
+        index = await self._get_async_index()
+        for start in range(0, len(ids), page_size):
+            await index.delete(ids=ids[start:start + page_size])
+
+    async def adelete_by_items(self, shop_id: int, id_key: str, item_ids: List[int]):
+        """
+        Delete every vector of several products/services in one call.
+        """
+        if not item_ids:
+            return
+        index = await self._get_async_index()
+        await index.delete(
+            filter={
+                "shop_id": shop_id,
+                id_key: {"$in": item_ids}
+            }
+        )
+
     def delete_by_product(self, shop_id: int, product_id: int):
         self.index.delete(
             filter={
@@ -81,7 +276,23 @@ class PineconeVectorStore:
             filter={"shop_id": shop_id}
         )
 
-    def query(self, query_text: str, shop_id: int, top_k: int = 5):
+    def _clean_query(self, query_text: str, top_k: int) -> str:
+        if not query_text or not query_text.strip():
+            raise ValueError("Query text cannot be empty.")
+
+        if top_k <= 0:
+            raise ValueError("top_k must be > 0")
+
+        return query_text.strip()
+
+    @staticmethod
+    def _tenant_filter(shop_id: int, filter: Dict | None) -> Dict:
+        # The shop_id clause is always enforced, whatever the caller passes
+        if not filter:
+            return {"shop_id": shop_id}
+        return {"$and": [{"shop_id": shop_id}, filter]}
+
+    def query(self, query_text: str, shop_id: int, top_k: int = 5, filter: Dict | None = None):
         """
         RAG Query:
         - Cleans input
@@ -91,13 +302,7 @@ class PineconeVectorStore:
         - Handles common failure cases safely
         """
 
-        if not query_text or not query_text.strip():
-            raise ValueError("Query text cannot be empty.")
-
-        if top_k <= 0:
-            raise ValueError("top_k must be > 0")
-
-        query_text = query_text.strip()
+        query_text = self._clean_query(query_text, top_k)
 
         try:
           
@@ -105,16 +310,69 @@ class PineconeVectorStore:
         except Exception as e:
             raise RuntimeError(f"Failed to embed query: {e}")
 
+        return self.query_by_vector(q_embed, shop_id=shop_id, top_k=top_k, filter=filter)
+
+    def query_by_vector(self, vector: List[float], shop_id: int, top_k: int = 5, filter: Dict | None = None):
+        """
+        Pinecone search with an already computed query embedding, so callers
+        fanning out to several indexes only embed the query once.
+
+        filter: extra Pinecone metadata filter, combined with the shop_id one
+        """
+
+        if top_k <= 0:
+            raise ValueError("top_k must be > 0")
+
         try:
 
-            results = self.index.query(
-                vector=q_embed,
+            results = self.query_resilience.call(lambda: self.index.query(
+                vector=vector,
                 top_k=top_k,
                 include_metadata=True,
-                filter={"shop_id": shop_id}
-            )
+                filter=self._tenant_filter(shop_id, filter)
+            ))
 
  
+            if not results or not getattr(results, "matches", []):
+                return {"matches": []}
+
+            return results
+
+        except Exception as e:
+            raise RuntimeError(f"Pinecone query failed: {e}")
+
+    async def aquery(self, query_text: str, shop_id: int, top_k: int = 5, filter: Dict | None = None):
+        """
+        Async RAG query. Same contract as `query`, but the embedding call and
+        the Pinecone search are awaited instead of blocking the event loop.
+        """
+
+        query_text = self._clean_query(query_text, top_k)
+
+        try:
+            q_embed = (await self.embedder.aembed([query_text]))[0]
+        except Exception as e:
+            raise RuntimeError(f"Failed to embed query: {e}")
+
+        return await self.aquery_by_vector(q_embed, shop_id=shop_id, top_k=top_k, filter=filter)
+
+    async def aquery_by_vector(self, vector: List[float], shop_id: int, top_k: int = 5, filter: Dict | None = None):
+        """
+        Async variant of `query_by_vector`.
+        """
+
+        if top_k <= 0:
+            raise ValueError("top_k must be > 0")
+
+        try:
+            index = await self._get_async_index()
+            results = await self.query_resilience.acall(lambda: index.query(
+                vector=vector,
+                top_k=top_k,
+                include_metadata=True,
+                filter=self._tenant_filter(shop_id, filter)
+            ))
+
             if not results or not getattr(results, "matches", []):
                 return {"matches": []}
 
@@ -0,0 +1,23 @@
+from typing import Any, Optional
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+
+
+class IngestJobStatus(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    shop_id: int
+    kind: str
+    operation: str
+    status: str
+    attempts: int
+    total: int
+    processed: int
+    succeeded: int
+    failed: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
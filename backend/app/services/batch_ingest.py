@@ -0,0 +1,238 @@
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Type
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.chunk_sync import sync_chunks
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def iter_batch_items(request: Request, schema: Type[BaseModel]) -> AsyncIterator[tuple[int, BaseModel | None, str | None]]:
+    """
+    Yield (position, item, error) for every entry of a batch body.
+
+    Accepts either a JSON array or an NDJSON stream (one object per line,
+    read incrementally). Entries that fail validation are yielded with an
+    error message instead of aborting the whole batch.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if any(t in content_type for t in NDJSON_CONTENT_TYPES):
+        position = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                yield (position, *_validate_json(schema, line))
+                position += 1
+        if buffer.strip():
+            yield (position, *_validate_json(schema, buffer))
+        return
+
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(body, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if len(body) > settings.INGEST_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {settings.INGEST_BATCH_MAX_ITEMS} items")
+
+    for position, raw in enumerate(body):
+        try:
+            yield position, schema.model_validate(raw), None
+        except ValidationError as e:
+            yield position, None, str(e)
+
+
+def _validate_json(schema: Type[BaseModel], line: bytes) -> tuple[BaseModel | None, str | None]:
+    try:
+        return schema.model_validate_json(line), None
+    except ValidationError as e:
+        return None, str(e)
+
+
+async def ingest_in_windows(
+    request: Request,
+    schema: Type[BaseModel],
+    ingest_batch: Callable[[List[BaseModel]], Awaitable[List[Dict]]]
+) -> List[Dict]:
+    """
+    Parse a batch body and hand valid items to `ingest_batch` in windows of
+    INGEST_BATCH_WINDOW, so NDJSON uploads are processed while they stream
+    in and memory stays bounded. Returns one result per entry, in order.
+    """
+    results: List[Dict] = []
+    window: List[BaseModel] = []
+    window_positions: List[int] = []
+
+    async def flush():
+        for position, result in zip(window_positions, await ingest_batch(window)):
+            results.append({"position": position, **result})
+        window.clear()
+        window_positions.clear()
+
+    async for position, item, error in iter_batch_items(request, schema):
+        if position >= settings.INGEST_BATCH_MAX_ITEMS:
+            results.append({
+                "position": position,
+                "status": "error",
+                "error": f"Batch exceeds {settings.INGEST_BATCH_MAX_ITEMS} items; remaining entries were not read"
+            })
+            break
+        if error is not None:
+            results.append({"position": position, "status": "error", "error": error})
+            continue
+
+        window.append(item)
+        window_positions.append(position)
+        if len(window) >= settings.INGEST_BATCH_WINDOW:
+            await flush()
+
+    if window:
+        await flush()
+
+    return sorted(results, key=lambda r: r["position"])
+
+
+async def collect_batch(request: Request, schema: Type[BaseModel]) -> tuple[List[Dict], List[Dict]]:
+    """
+    Read a whole batch body for a queued job: returns the valid entries as
+    {"position", "item"} (JSON-ready) and one error result per rejected
+    entry, with the same limits as `ingest_in_windows`.
+    """
+    entries: List[Dict] = []
+    errors: List[Dict] = []
+
+    async for position, item, error in iter_batch_items(request, schema):
+        if position >= settings.INGEST_BATCH_MAX_ITEMS:
+            errors.append({
+                "position": position,
+                "status": "error",
+                "error": f"Batch exceeds {settings.INGEST_BATCH_MAX_ITEMS} items; remaining entries were not read"
+            })
+            break
+        if error is not None:
+            errors.append({"position": position, "status": "error", "error": error})
+            continue
+        entries.append({"position": position, "item": item.model_dump(mode="json")})
+
+    return entries, errors
+
+
+def summarize(results: List[Dict]) -> Dict:
+    succeeded = sum(1 for r in results if r["status"] != "error")
+    if succeeded == len(results):
+        status = "success"
+    elif succeeded:
+        status = "partial"
+    else:
+        status = "failed"
+    return {"status": status, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+
+async def existing_ids_by_uid(db: AsyncSession, model, uids: List[str]) -> Dict[str, int]:
+    if not uids:
+        return {}
+    result = await db.execute(select(model.uid, model.id).where(model.uid.in_(uids)))
+    return {uid: _id for uid, _id in result.all()}
+
+
+async def bulk_upsert_minimal(db: AsyncSession, model, rows: List[Dict], page_size: int = 1000) -> Dict[str, int]:
+    """
+    Multi-row INSERT ... ON CONFLICT (uid) DO UPDATE for the *_minimal
+    tables. Returns uid -> id for every row.
+    """
+    if db.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+
+    ids: Dict[str, int] = {}
+    for start in range(0, len(rows), page_size):
+        stmt = insert(model).values(rows[start:start + page_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[model.uid],
+            set_={"name": stmt.excluded.name}
+        ).returning(model.id, model.uid)
+        result = await db.execute(stmt)
+        ids.update({uid: _id for _id, uid in result.all()})
+
+    await db.commit()
+    return ids
+
+
+async def run_batch_ingest(
+    db: AsyncSession,
+    store,
+    shop_id: int,
+    items: List[BaseModel],
+    model,
+    name_of: Callable[[BaseModel], str],
+    preprocess: Callable[[BaseModel, int], List[Dict]],
+    id_key: str,
+    sparse_index=None
+) -> List[Dict]:
+    """
+    Shared body of ProductIngestor/ServiceIngestor.ingest_batch.
+
+    Upserts the minimal rows in bulk, then syncs every item's chunks through
+    `sync_chunks`, so items that already existed only re-embed the chunks
+    whose content changed. Returns one result per input item, in order.
+    """
+    results: List[Dict | None] = [None] * len(items)
+    latest: Dict[str, int] = {}
+
+    for i, item in enumerate(items):
+        if not item.uid:
+            results[i] = {"uid": item.uid, "status": "error", "error": "uid is required for batch ingestion"}
+            continue
+        if item.uid in latest:
+            results[latest[item.uid]] = {"uid": item.uid, "status": "error", "error": "superseded by a later entry with the same uid"}
+        latest[item.uid] = i
+
+    if not latest:
+        return results
+
+    existing = await existing_ids_by_uid(db, model, list(latest))
+    ids = await bulk_upsert_minimal(db, model, [
+        {"name": name_of(items[i]), "uid": uid} for uid, i in latest.items()
+    ])
+
+    chunks_by_item: Dict[int, List[Dict]] = {}
+    for uid, i in latest.items():
+        items[i].id = ids[uid]
+        chunks_by_item[ids[uid]] = preprocess(items[i], shop_id)
+
+    synced = await sync_chunks(
+        db,
+        store,
+        shop_id,
+        id_key,
+        chunks_by_item,
+        untracked=[existing[uid] for uid in latest if uid in existing],
+        sparse_index=sparse_index
+    )
+
+    for uid, i in latest.items():
+        result = synced[ids[uid]]
+        if result["error"] is not None:
+            results[i] = {"uid": uid, "id": ids[uid], "status": "error", "error": result["error"]}
+        else:
+            results[i] = {
+                "uid": uid,
+                "id": ids[uid],
+                "status": "updated" if uid in existing else "ingested",
+                "chunks": result["chunks"],
+                "embedded": result["embedded"]
+            }
+
+    return results
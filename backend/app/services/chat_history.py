@@ -0,0 +1,82 @@
+import base64
+from datetime import datetime
+from typing import Dict, List
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chats import ChatMessage
+
+
+def encode_cursor(created_at: datetime, message_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{message_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, message_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def fetch_full_chat_history(db: AsyncSession, shop_id: int, user_id: str) -> List[ChatMessage]:
+    """
+    The whole conversation, oldest first: the unpaginated response of
+    clients that predate paging. Its cost grows with the conversation.
+    """
+    result = await db.execute(
+        select(ChatMessage)
+        .where(
+            ChatMessage.shop_id == shop_id,
+            ChatMessage.user_id == user_id
+        )
+        .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+    )
+    return list(result.scalars().all())
+
+
+async def fetch_chat_history(
+    db: AsyncSession,
+    shop_id: int,
+    user_id: str,
+    limit: int,
+    before: str | None = None
+) -> Dict:
+    """
+    One page of a user's chat with a shop, newest page first.
+
+    Keyset pagination on (created_at, id): each page is an index range scan
+    on ix_chat_messages_shop_user_created_id that stops after `limit` rows,
+    so the cost does not grow with the length of the conversation.
+    Messages within a page are returned oldest first; `next_cursor` fetches
+    the page of older messages (None when there are none).
+    """
+    stmt = (
+        select(ChatMessage.id, ChatMessage.role, ChatMessage.message, ChatMessage.created_at)
+        .where(
+            ChatMessage.shop_id == shop_id,
+            ChatMessage.user_id == user_id
+        )
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(limit + 1)
+    )
+    if before:
+        created_at, message_id = decode_cursor(before)
+        stmt = stmt.where(tuple_(ChatMessage.created_at, ChatMessage.id) < (created_at, message_id))
+
+    rows = (await db.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    messages: List[Dict] = [
+        {"id": r.id, "role": r.role, "message": r.message, "created_at": r.created_at}
+        for r in reversed(rows)
+    ]
+    return {
+        "messages": messages,
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    }
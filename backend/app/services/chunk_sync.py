@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import record_cache, stage
+from app.models.chunk_hash import ChunkHash
+
+logger = logging.getLogger(__name__)
+
+
+def hash_chunk(chunk: Dict) -> tuple[str, str]:
+    """
+    Returns (content_hash, metadata_hash). Only the text is embedded, so a
+    chunk whose content hash is unchanged keeps its vector.
+    """
+    content = hashlib.sha256(chunk["text"].encode("utf-8")).hexdigest()
+    metadata = hashlib.sha256(
+        json.dumps(chunk["metadata"], sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return content, metadata
+
+
+async def load_chunk_hashes(db: AsyncSession, id_key: str, item_ids: Iterable[int]) -> Dict[int, Dict[int, tuple[str, str]]]:
+    """
+    item_id -> chunk_index -> (content_hash, metadata_hash)
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return {}
+
+    result = await db.execute(
+        select(ChunkHash.item_id, ChunkHash.chunk_index, ChunkHash.content_hash, ChunkHash.metadata_hash)
+        .where(ChunkHash.id_key == id_key, ChunkHash.item_id.in_(item_ids))
+    )
+    stored: Dict[int, Dict[int, tuple[str, str]]] = {}
+    for item_id, chunk_index, content_hash, metadata_hash in result.all():
+        stored.setdefault(item_id, {})[chunk_index] = (content_hash, metadata_hash)
+    return stored
+
+
+async def delete_chunk_hashes(db: AsyncSession, id_key: str, item_ids: Iterable[int]) -> None:
+    """
+    Drop the stored hashes of items. Does not commit.
+    """
+    item_ids = list(item_ids)
+    if item_ids:
+        await db.execute(
+            delete(ChunkHash).where(ChunkHash.id_key == id_key, ChunkHash.item_id.in_(item_ids))
+        )
+
+
+async def sync_chunks(
+    db: AsyncSession,
+    store,
+    shop_id: int,
+    id_key: str,
+    chunks_by_item: Dict[int, List[Dict]],
+    untracked: Iterable[int] = (),
+    sparse_index=None
+) -> Dict[int, Dict]:
+    """
+    Bring the vectors of several products/services in line with freshly
+    preprocessed chunks, touching only what changed:
+
+    - chunks whose text changed (or is new) are embedded and upserted
+    - chunks with the same text but different metadata get a metadata update
+    - chunk indexes that no longer exist are deleted by id
+
+    untracked: items that may already have vectors but no stored hashes
+               (ingested before hashes were recorded); their vectors are
+               cleared and every chunk is re-embedded.
+    sparse_index: optional BM25Index kept in step with the vectors; items
+                  that synced cleanly have their keyword postings replaced.
+
+    Returns item_id -> {"chunks", "embedded", "error"}.
+    """
+    stored = await load_chunk_hashes(db, id_key, chunks_by_item)
+
+    legacy = [item_id for item_id in untracked if item_id in chunks_by_item and item_id not in stored]
+    await store.adelete_by_items(shop_id, id_key, legacy)
+
+    to_embed: List[Dict] = []
+    to_update: List[Dict] = []
+    stale_ids: List[str] = []
+    hashes: Dict[int, Dict[int, tuple[str, str]]] = {}
+    by_index: Dict[int, Dict[int, Dict]] = {}
+
+    for item_id, chunks in chunks_by_item.items():
+        previous = stored.get(item_id, {})
+        hashes[item_id] = {}
+        by_index[item_id] = {}
+        for chunk in chunks:
+            chunk_index = chunk["metadata"]["chunk_index"]
+            content_hash, metadata_hash = hash_chunk(chunk)
+            hashes[item_id][chunk_index] = (content_hash, metadata_hash)
+            by_index[item_id][chunk_index] = chunk
+
+            old = previous.get(chunk_index)
+            if old is None or old[0] != content_hash:
+                to_embed.append(chunk)
+            elif old[1] != metadata_hash:
+                to_update.append(chunk)
+
+        stale_ids.extend(
+            f"{item_id}_{chunk_index}" for chunk_index in previous if chunk_index not in hashes[item_id]
+        )
+
+    unchanged = sum(len(chunks) for chunks in chunks_by_item.values()) - len(to_embed)
+    record_cache("chunk_hash", True, unchanged)
+    record_cache("chunk_hash", False, len(to_embed))
+
+    with stage("vector_write", getattr(store, "index_name", "unknown")) as writing:
+        embed_errors, update_errors, _ = await asyncio.gather(
+            store.aupsert_chunks(to_embed, id_key),
+            store.aupdate_chunk_metadata(to_update, id_key),
+            store.adelete_ids(stale_ids)
+        )
+        if any(embed_errors) or any(update_errors):
+            writing.outcome = "error"
+
+    results: Dict[int, Dict] = {
+        item_id: {"chunks": len(chunks), "embedded": 0, "error": None}
+        for item_id, chunks in chunks_by_item.items()
+    }
+    for chunk, error in zip(to_embed, embed_errors):
+        result = results[chunk["metadata"][id_key]]
+        if error is None:
+            result["embedded"] += 1
+        elif result["error"] is None:
+            result["error"] = error
+    for chunk, error in zip(to_update, update_errors):
+        result = results[chunk["metadata"][id_key]]
+        if error is not None and result["error"] is None:
+            result["error"] = error
+
+    # Failed items are left half-synced: drop their vectors and postings,
+    # so no chunk of the old version outlives them, and their hashes, so
+    # the next sync embeds them in full
+    failed = [item_id for item_id, result in results.items() if result["error"] is not None]
+    if failed:
+        try:
+            await store.adelete_by_items(shop_id, id_key, failed)
+            if sparse_index is not None:
+                await sparse_index.adelete_by_items(shop_id, id_key, failed)
+        except Exception as e:
+            logger.exception(f"Clearing the vectors of failed items {failed} failed: {e}")
+    await delete_chunk_hashes(db, id_key, chunks_by_item)
+    rows = [
+        {
+            "id_key": id_key,
+            "item_id": item_id,
+            "chunk_index": chunk_index,
+            "content_hash": content_hash,
+            "metadata_hash": metadata_hash,
+            "text": by_index[item_id][chunk_index]["text"],
+            "chunk_metadata": by_index[item_id][chunk_index]["metadata"]
+        }
+        for item_id, item_hashes in hashes.items()
+        if results[item_id]["error"] is None
+        for chunk_index, (content_hash, metadata_hash) in item_hashes.items()
+    ]
+    if rows:
+        await db.execute(insert(ChunkHash), rows)
+    await db.commit()
+
+    if sparse_index is not None:
+        await sparse_index.areplace_items(shop_id, id_key, {
+            item_id: chunks for item_id, chunks in chunks_by_item.items()
+            if results[item_id]["error"] is None
+        })
+
+    return results
+
+
+async def rebuild_sparse_index(db: AsyncSession, sparse_index, id_key: str) -> Dict[str, int]:
+    """
+    Rebuild a BM25 index from the chunk texts stored with the hashes,
+    replacing every shop it has rows for. Chunks synced before texts were
+    stored are skipped (counted as "missing_text"); updating those items
+    stores them.
+    """
+    result = await db.execute(
+        select(ChunkHash.item_id, ChunkHash.text, ChunkHash.chunk_metadata)
+        .where(ChunkHash.id_key == id_key)
+        .order_by(ChunkHash.item_id, ChunkHash.chunk_index)
+    )
+    by_shop: Dict[int, Dict[int, List[Dict]]] = {}
+    missing_text = 0
+    for item_id, text, metadata in result.all():
+        if text is None or metadata is None:
+            missing_text += 1
+            continue
+        by_shop.setdefault(metadata["shop_id"], {}).setdefault(item_id, []).append(
+            {"text": text, "metadata": metadata}
+        )
+
+    for shop_id in sparse_index.shop_ids() - by_shop.keys():
+        await sparse_index.adelete_by_shop(shop_id)
+    for shop_id, chunks_by_item in by_shop.items():
+        await sparse_index.adelete_by_shop(shop_id)
+        await sparse_index.areplace_items(shop_id, id_key, chunks_by_item)
+
+    return {
+        "shops": len(by_shop),
+        "chunks": sum(len(chunks) for items in by_shop.values() for chunks in items.values()),
+        "missing_text": missing_text
+    }
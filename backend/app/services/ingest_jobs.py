@@ -0,0 +1,380 @@
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Type
+
+from pydantic import BaseModel
+from sqlalchemy import and_, exists, func, or_, select, update
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import observe
+from app.core.resilience import is_retryable
+from app.core.registry import registry, PRODUCTS_INDEX, SERVICES_INDEX
+from app.models.ingest_job import IngestJob
+from app.schemas.product import ProductRequest
+from app.schemas.service import Service
+from app.services.batch_ingest import summarize
+from app.services.product_ingestor import ProductIngestor
+from app.services.services_ingestor import ServiceIngestor
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "partial", "failed")
+BATCH_STATUS = {"success": "succeeded", "partial": "partial", "failed": "failed"}
+
+
+@dataclass(frozen=True)
+class JobKind:
+    ingestor: type
+    schema: Type[BaseModel]
+    index: str
+    update: str
+    delete: str
+
+
+JOB_KINDS: Dict[str, JobKind] = {
+    "product": JobKind(ProductIngestor, ProductRequest, PRODUCTS_INDEX, "update_product_embedding", "delete_product_embedding"),
+    "service": JobKind(ServiceIngestor, Service, SERVICES_INDEX, "update_service_embedding", "delete_service_embedding"),
+}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class IngestJobQueue:
+    """
+    Durable ingest queue on the ingest_jobs table.
+
+    Routes `enqueue` a job and answer 202 right away; `workers` background
+    tasks claim queued jobs oldest first and run the ProductIngestor /
+    ServiceIngestor logic, recording progress, per-item results and errors
+    on the row. Claims use SELECT ... FOR UPDATE SKIP LOCKED plus a
+    status-guarded UPDATE, so several app processes can share the table.
+    Enqueues in this process wake the workers at once; jobs from other
+    processes are picked up within `poll_seconds`.
+
+    Jobs touching the same item run in enqueue order: a job is not claimed
+    while an older unfinished job of the same shop and kind covers the
+    same uid (batches cover every uid), so a create followed by an update
+    or delete never runs out of order.
+
+    A running job refreshes `updated_at` as a heartbeat. Jobs whose
+    heartbeat is older than `lease_seconds` (their worker died) are claimed
+    again, and jobs failing with a transient error (`is_retryable`) are
+    queued again after `retry_seconds`, doubling per attempt; both up to
+    `max_attempts` runs in total. Other errors fail the job.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        workers: int | None = None,
+        poll_seconds: float | None = None,
+        lease_seconds: float | None = None,
+        max_attempts: int | None = None,
+        retry_seconds: float | None = None
+    ):
+        self.session_factory = session_factory
+        self.workers = settings.INGEST_JOB_WORKERS if workers is None else workers
+        self.poll_seconds = poll_seconds or settings.INGEST_JOB_POLL_SECONDS
+        self.lease_seconds = lease_seconds or settings.INGEST_JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or settings.INGEST_JOB_MAX_ATTEMPTS
+        self.retry_seconds = settings.INGEST_JOB_RETRY_SECONDS if retry_seconds is None else retry_seconds
+
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"ingest-worker-{n}") for n in range(self.workers)
+        ]
+
+    async def stop(self, grace_seconds: float = 30.0) -> None:
+        """
+        Let running jobs finish (up to `grace_seconds`), then stop the
+        workers. Jobs cut off here are claimed again after their lease.
+        """
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=grace_seconds)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @staticmethod
+    def _item_key(job_id: str, operation: str, payload: Dict) -> str | None:
+        if operation == "ingest_batch":
+            return None
+        uid = payload["uid"] if operation == "delete" else payload["item"].get("uid")
+        return uid or job_id
+
+    async def enqueue(self, shop_id: int, kind: str, operation: str, payload: Dict, total: int = 1) -> IngestJob:
+        now = _now()
+        job_id = uuid.uuid4().hex
+        job = IngestJob(
+            id=job_id,
+            shop_id=shop_id,
+            kind=kind,
+            operation=operation,
+            payload=payload,
+            item_key=self._item_key(job_id, operation, payload),
+            status="queued",
+            attempts=0,
+            total=total,
+            processed=0,
+            succeeded=0,
+            failed=0,
+            created_at=now,
+            updated_at=now
+        )
+        async with self.session_factory() as session:
+            session.add(job)
+            await session.commit()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> IngestJob | None:
+        async with self.session_factory() as session:
+            return await session.get(IngestJob, job_id)
+
+    async def pending(self) -> int:
+        """
+        Jobs not finished yet (queued or running), across all processes.
+        """
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(func.count()).select_from(IngestJob).where(IngestJob.status.notin_(TERMINAL_STATUSES))
+            )
+            return result.scalar_one()
+
+    def stats(self) -> dict:
+        return {"workers": len(self._tasks), "completed": self.completed, "failed": self.failed}
+
+    # Workers
+
+    def _runnable(self, now: datetime):
+        stale = now - timedelta(seconds=self.lease_seconds)
+        older = aliased(IngestJob)
+        return and_(
+            or_(
+                and_(
+                    IngestJob.status == "queued",
+                    or_(IngestJob.not_before.is_(None), IngestJob.not_before <= now)
+                ),
+                and_(IngestJob.status == "running", IngestJob.updated_at < stale)
+            ),
+            # No older unfinished job touching the same item
+            ~exists().where(
+                older.shop_id == IngestJob.shop_id,
+                older.kind == IngestJob.kind,
+                older.status.notin_(TERMINAL_STATUSES),
+                or_(
+                    older.created_at < IngestJob.created_at,
+                    and_(older.created_at == IngestJob.created_at, older.id < IngestJob.id)
+                ),
+                or_(older.item_key.is_(None), IngestJob.item_key.is_(None), older.item_key == IngestJob.item_key)
+            )
+        )
+
+    async def _claim(self) -> IngestJob | None:
+        now = _now()
+        async with self.session_factory() as session:
+            candidates = (await session.execute(
+                select(IngestJob.id)
+                .where(self._runnable(now))
+                .order_by(IngestJob.created_at)
+                .limit(max(self.workers, 1))
+                .with_for_update(skip_locked=True)
+            )).scalars().all()
+
+            for job_id in candidates:
+                # Another worker may have taken it since the SELECT (no row
+                # locks on SQLite); the status guard makes the claim atomic
+                claimed = await session.execute(
+                    update(IngestJob)
+                    .where(IngestJob.id == job_id, self._runnable(now))
+                    .values(status="running", attempts=IngestJob.attempts + 1, started_at=now, updated_at=now)
+                )
+                if claimed.rowcount == 1:
+                    await session.commit()
+                    return await session.get(IngestJob, job_id)
+
+            await session.commit()
+            return None
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            # Cleared before claiming so an enqueue racing with an empty
+            # claim still wakes this worker
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.exception(f"Claiming an ingest job failed: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _update(self, job_id: str, **values) -> None:
+        async with self.session_factory() as session:
+            await session.execute(update(IngestJob).where(IngestJob.id == job_id).values(updated_at=_now(), **values))
+            await session.commit()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self._update(job_id)
+            except Exception as e:
+                logger.warning(f"Heartbeat of ingest job {job_id} failed: {e}")
+
+    async def _run(self, job: IngestJob) -> None:
+        if job.attempts > self.max_attempts:
+            await self._finish(job, {
+                "status": "failed",
+                "error": f"Gave up after {job.attempts - 1} interrupted attempts",
+                "failed": job.total
+            })
+            return
+
+        if job.created_at is not None:
+            created_at = job.created_at if job.created_at.tzinfo else job.created_at.replace(tzinfo=timezone.utc)
+            observe("ingest_job_wait", (_now() - created_at).total_seconds(), JOB_KINDS[job.kind].index)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            outcome = await self._execute(job)
+        except Exception as e:
+            if is_retryable(e) and job.attempts < self.max_attempts:
+                await self._retry_later(job, e)
+                return
+            logger.exception(f"Ingest job {job.id} ({job.kind} {job.operation}) failed: {e}")
+            outcome = {"status": "failed", "error": str(e), "failed": job.total}
+        finally:
+            heartbeat.cancel()
+
+        await self._finish(job, outcome)
+
+    async def _retry_later(self, job: IngestJob, error: Exception) -> None:
+        delay = self.retry_seconds * 2 ** (job.attempts - 1)
+        logger.warning(
+            f"Ingest job {job.id} ({job.kind} {job.operation}) failed with a transient error, "
+            f"retrying in {delay:.0f}s (attempt {job.attempts}/{self.max_attempts}): {error}"
+        )
+        try:
+            await self._update(
+                job.id, status="queued", error=str(error), not_before=_now() + timedelta(seconds=delay)
+            )
+        except Exception as e:
+            logger.exception(f"Requeueing ingest job {job.id} failed: {e}")
+
+    async def _finish(self, job: IngestJob, outcome: Dict) -> None:
+        if outcome["status"] == "failed":
+            self.failed += 1
+        else:
+            self.completed += 1
+        values = {"processed": job.total, "finished_at": _now(), "error": None, **outcome}
+        try:
+            await self._update(job.id, **values)
+        except Exception as e:
+            logger.exception(f"Recording the outcome of ingest job {job.id} failed: {e}")
+
+    async def _execute(self, job: IngestJob) -> Dict:
+        kind = JOB_KINDS[job.kind]
+        async with self.session_factory() as session:
+            ingestor = kind.ingestor(
+                job.shop_id,
+                db=session,
+                vectorstore=registry.store(kind.index),
+                sparse_index=registry.sparse_index(kind.index)
+            )
+
+            if job.operation == "ingest_batch":
+                return await self._execute_batch(job, kind, ingestor)
+
+            if job.operation == "ingest":
+                await self._ingest_item(job, ingestor, kind.schema.model_validate(job.payload["item"]))
+            elif job.operation == "update":
+                await getattr(ingestor, kind.update)(kind.schema.model_validate(job.payload["item"]))
+            elif job.operation == "delete":
+                await getattr(ingestor, kind.delete)(job.payload["uid"])
+            else:
+                raise ValueError(f"Unknown ingest operation: {job.operation}")
+            return {"status": "succeeded", "succeeded": 1}
+
+    @staticmethod
+    async def _ingest_item(job: IngestJob, ingestor, item: BaseModel) -> None:
+        """
+        A reclaimed job may have inserted the item's row before its worker
+        died, so a retry upserts on uid (ingest_batch) instead of inserting
+        again and failing on the unique uid.
+        """
+        if job.attempts <= 1 or not item.uid:
+            await ingestor.preprocess_to_store_embedding(item)
+            return
+        [result] = await ingestor.ingest_batch([item])
+        if result["status"] == "error":
+            raise RuntimeError(result["error"])
+
+    async def _execute_batch(self, job: IngestJob, kind: JobKind, ingestor) -> Dict:
+        """
+        Ingest the batch in windows of INGEST_BATCH_WINDOW, recording
+        progress after each one. Entries rejected at enqueue time are
+        reported with the rest.
+        """
+        results: List[Dict] = list(job.payload.get("errors", []))
+        entries = job.payload.get("items", [])
+        succeeded = 0
+
+        for start in range(0, len(entries), settings.INGEST_BATCH_WINDOW):
+            window = entries[start:start + settings.INGEST_BATCH_WINDOW]
+            items = [kind.schema.model_validate(entry["item"]) for entry in window]
+            for entry, result in zip(window, await ingestor.ingest_batch(items)):
+                results.append({"position": entry["position"], **result})
+                succeeded += result["status"] != "error"
+            await self._update(
+                job.id,
+                processed=len(job.payload.get("errors", [])) + start + len(window),
+                succeeded=succeeded,
+                failed=len(results) - succeeded
+            )
+
+        results.sort(key=lambda r: r["position"])
+        summary = summarize(results)
+        return {
+            "status": BATCH_STATUS[summary["status"]] if results else "succeeded",
+            "succeeded": summary["succeeded"],
+            "failed": summary["failed"],
+            "result": {"results": results}
+        }
+
+
+ingest_job_queue = IngestJobQueue()
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models.chats import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ChatMessageSink:
+    """
+    Write-behind persistence for chat messages.
+
+    Messages go into a bounded in-memory queue; one background task drains
+    it and writes up to `batch_size` rows per multi-row INSERT and commit,
+    so chat turns no longer pay for their own transactions. Batches form
+    naturally: whatever queued up during the previous write goes into the
+    next one. A full queue makes `add` wait (backpressure) rather than
+    drop messages.
+
+    Durability: with `durable=True` (per call) or CHAT_PERSISTENCE_MODE=sync,
+    or before `start()` / after `stop()`, rows are written before `add`
+    returns. Otherwise a crash can lose what is still queued.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        max_queue: int | None = None,
+        batch_size: int | None = None,
+        durable: bool | None = None
+    ):
+        self.session_factory = session_factory
+        self.max_queue = max_queue or settings.CHAT_SINK_MAX_QUEUE
+        self.batch_size = batch_size or settings.CHAT_SINK_BATCH_SIZE
+        self.durable = settings.CHAT_PERSISTENCE_MODE == "sync" if durable is None else durable
+
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name="chat-message-sink")
+
+    async def stop(self) -> None:
+        """
+        Flush everything still queued, then stop the background task.
+        """
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def add(self, rows: List[Dict], durable: bool = False) -> None:
+        """
+        rows: ChatMessage column values (user_id, shop_id, role, message).
+        created_at is stamped now, so ordering reflects when the message
+        happened rather than when the batch was written.
+        """
+        now = datetime.now(timezone.utc)
+        rows = [{"created_at": now, **row} for row in rows]
+
+        if durable or self.durable or not self.running:
+            await self._write(rows)
+            return
+
+        for row in rows:
+            await self._queue.put(row)
+
+    async def _write(self, rows: List[Dict]) -> None:
+        async with self.session_factory() as session:
+            await session.execute(insert(ChatMessage), rows)
+            await session.commit()
+        self.written += len(rows)
+
+    async def _next_batch(self) -> List[Dict]:
+        batch = [await self._queue.get()]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                for attempt in range(2):
+                    try:
+                        await self._write(batch)
+                        break
+                    except Exception as e:
+                        if attempt:
+                            raise
+                        logger.warning(f"Chat message batch write failed, retrying: {e}")
+                        await asyncio.sleep(0.5)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.exception(f"Dropped {len(batch)} chat messages after a failed write: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "failed": self.failed
+        }
+
+
+chat_message_sink = ChatMessageSink()
@@ -1,24 +1,33 @@
+import logging
 from typing import List, Dict
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.product import Product, ProductRequest
 from app.models.product import ProductMinimal
-from app.rag.embeddings.embedding import GeminiEmbedder
 from app.rag.vectorstore.vectore_store import PineconeVectorStore
+from app.rag.vectorstore.bm25_index import BM25Index
+from app.core.metrics import timed
+from app.core.registry import registry, PRODUCTS_INDEX
+from app.rag.cache.semantic_cache import semantic_answer_cache
 from app.utils.preprocess_product_json import preprocess_product
+from app.services.batch_ingest import run_batch_ingest
+from app.services.chunk_sync import sync_chunks, delete_chunk_hashes
+
+logger = logging.getLogger(__name__)
 
 
 class ProductIngestor:
 
-    def __init__(self, shop_id: int, db: AsyncSession):
+    def __init__(self, shop_id: int, db: AsyncSession, vectorstore: PineconeVectorStore | None = None, sparse_index: BM25Index | None = None):
         self.shop_id = shop_id
         self.db = db
-        self.pinecone = PineconeVectorStore(
-            "products-index",
-            dimension=3072,
-            embedder=GeminiEmbedder()
-        )
+        # Long-lived store from the process-wide registry
+        self.pinecone = vectorstore or registry.store(PRODUCTS_INDEX)
+        # Keyword index kept in step with the vectors (None when hybrid
+        # retrieval is off or a custom store is injected without one)
+        self.sparse_index = sparse_index if vectorstore is not None else registry.sparse_index(PRODUCTS_INDEX)
 
+    @timed("ingest", PRODUCTS_INDEX)
     async def preprocess_to_store_embedding(self, product: ProductRequest) -> List[Dict]:
 
         db_product = ProductMinimal(name=product.name, uid = product.uid)
@@ -31,20 +40,61 @@ class ProductIngestor:
 
        
         preprocessed_chunks = preprocess_product(product, self.shop_id)
-        print("Preprocessed chunks:", preprocessed_chunks)
+        logger.debug(f"Preprocessed chunks: {preprocessed_chunks}")
 
        
-        self.pinecone.upsert_product_chunks(preprocessed_chunks)
+        await self._sync_chunks(product.id, preprocessed_chunks)
+        await semantic_answer_cache.ainvalidate_shop(self.shop_id)
 
         return preprocessed_chunks
 
+    async def _sync_chunks(self, product_id: int, chunks: List[Dict], untracked: bool = False) -> Dict:
+        """
+        Embed/upsert only the chunks whose content hash changed and drop the
+        ones that no longer exist.
+        """
+        result = (await sync_chunks(
+            self.db,
+            self.pinecone,
+            self.shop_id,
+            "product_id",
+            {product_id: chunks},
+            untracked=[product_id] if untracked else (),
+            sparse_index=self.sparse_index
+        ))[product_id]
+        if result["error"]:
+            await semantic_answer_cache.ainvalidate_shop(self.shop_id)
+            raise Exception(result["error"])
+        return result
+
+    @timed("ingest_batch", PRODUCTS_INDEX)
+    async def ingest_batch(self, products: List[ProductRequest]) -> List[Dict]:
+        """
+        Ingest many products at once: bulk upsert on uid, batched embedding
+        and paged vector upserts. Returns one result per product, in order.
+        """
+        results = await run_batch_ingest(
+            self.db,
+            self.pinecone,
+            self.shop_id,
+            products,
+            model=ProductMinimal,
+            name_of=lambda p: p.name,
+            preprocess=preprocess_product,
+            id_key="product_id",
+            sparse_index=self.sparse_index
+        )
+        await semantic_answer_cache.ainvalidate_shop(self.shop_id)
+        return results
+
+    @timed("update", PRODUCTS_INDEX)
     async def update_product_embedding(self, product: ProductRequest) -> None:
         """
         Update the Pinecone embeddings for a product using its UID.
         
         Subject to change
         """
-        print("Updating product embeddings for UID:", product.uid)
+        logger.info(f"Updating product embeddings for UID: {product.uid}")
 
         result = await self.db.execute(
             select(ProductMinimal).where(ProductMinimal.uid == product.uid)
@@ -54,18 +104,19 @@ class ProductIngestor:
         if not db_product:
             raise Exception("Product not found")
 
-        self.pinecone.delete_by_product(self.shop_id, db_product.id)
         product.id = db_product.id
 
         preprocessed_chunks = preprocess_product(product, self.shop_id)
-        self.pinecone.upsert_product_chunks(preprocessed_chunks)
+        result = await self._sync_chunks(product.id, preprocessed_chunks, untracked=True)
+        await semantic_answer_cache.ainvalidate_shop(self.shop_id)
         
-        print("Updated product embeddings for UID:", product.uid)
+        logger.info(f"Updated product embeddings for UID: {product.uid} ({result['embedded']}/{result['chunks']} chunks re-embedded)")
         
         
+    @timed("delete", PRODUCTS_INDEX)
     async def delete_product_embedding(self, product_uid: str) -> None:
 
-        print("Deleting product embeddings for UID:", product_uid)
+        logger.info(f"Deleting product embeddings for UID: {product_uid}")
 
         result = await self.db.execute(
             select(ProductMinimal).where(ProductMinimal.uid == product_uid)
@@ -75,9 +126,13 @@ class ProductIngestor:
         if not db_product:
             raise Exception("Product not found")
 
-        self.pinecone.delete_by_product(self.shop_id, db_product.id)
+        await self.pinecone.adelete_by_items(self.shop_id, "product_id", [db_product.id])
+        if self.sparse_index is not None:
+            await self.sparse_index.adelete_by_items(self.shop_id, "product_id", [db_product.id])
+        await semantic_answer_cache.ainvalidate_shop(self.shop_id)
         
+        await delete_chunk_hashes(self.db, "product_id", [db_product.id])
         await self.db.delete(db_product)
         await self.db.commit()
         
-        print("Deleted product embeddings for UID:", product_uid)
+        logger.info(f"Deleted product embeddings for UID: {product_uid}")
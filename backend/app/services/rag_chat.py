@@ -1,37 +1,78 @@
+import asyncio
+from typing import AsyncIterator
+from app.rag.agents.response_generation_agent import GENERATION_ERROR_MESSAGE
 from app.rag.pipeline import AgenticRAGPipeline
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.metrics import stage, track_request
 from app.models.chats import ChatMessage  
+from app.services.message_sink import ChatMessageSink
 
 class RAGService:
-    def __init__(self, pipeline: AgenticRAGPipeline, db: AsyncSession):
+    def __init__(self, pipeline: AgenticRAGPipeline, db: AsyncSession, sink: ChatMessageSink | None = None):
+        """
+        sink: write-behind message sink; messages are committed on `db`
+              inline when omitted
+        """
         self.pipeline = pipeline
         self.db = db
+        self.sink = sink
+
+    async def _save(self, shop_id: int, user_id: str, role: str, message: str) -> None:
+        with stage("save_message"):
+            if self.sink is not None:
+                await self.sink.add([{"user_id": user_id, "shop_id": shop_id, "role": role, "message": message}])
+                return
+
+            self.db.add(ChatMessage(
+                user_id=user_id,
+                shop_id=shop_id,
+                role=role,
+                message=message
+            ))
+            await self.db.commit()
+
+    async def _save_answer(self, shop_id: int, user_id: str, answer: str) -> None:
+        """
+        Failed generations (the apology, possibly after a truncated answer)
+        are not kept as assistant messages.
+        """
+        if not answer or answer.endswith(GENERATION_ERROR_MESSAGE):
+            return
+        await self._save(shop_id, user_id, "assistant", answer)
         
     async def chat(self, shop_id: int, query: str, user_id: str):
+        """
+        result["timings"] covers the message saves as well as the pipeline.
+        """
+        with track_request() as timings, stage("chat"):
 
-        user_msg = ChatMessage(
-            user_id=user_id,
-            shop_id=shop_id,
-            role="user",
-            message=query
-        )
-        self.db.add(user_msg)
-        await self.db.commit()
+            await self._save(shop_id, user_id, "user", query)
 
      
-        result = self.pipeline.run(shop_id=shop_id, query=query)
-        ai_answer = result.get("answer", "")
+            result = await self.pipeline.arun(shop_id=shop_id, query=query)
+            ai_answer = result.get("answer", "")
 
  
-        ai_msg = ChatMessage(
-            user_id=user_id,
-            shop_id=shop_id,
-            role="assistant",
-            message=ai_answer
-        )
-        self.db.add(ai_msg)
-        await self.db.commit()
-
-       
-        return result
+            await self._save_answer(shop_id, user_id, ai_answer)
+
+        return {**result, "timings": timings.as_dict()}
+
+    async def stream_chat(self, shop_id: int, query: str, user_id: str) -> AsyncIterator[str]:
+        """
+        Same as `chat`, but yields answer tokens as they are generated.
+        The assistant message is saved from the accumulated text once the
+        stream ends, including when the client disconnects part-way (what
+        was sent is saved).
+        """
+        with stage("chat_stream"):
+            await self._save(shop_id, user_id, "user", query)
+
+            tokens = []
+            try:
+                async for token in self.pipeline.astream(shop_id=shop_id, query=query):
+                    tokens.append(token)
+                    yield token
+            finally:
+                # Shielded: a disconnect cancels this task, the save must still finish
+                await asyncio.shield(self._save_answer(shop_id, user_id, "".join(tokens)))
@@ -1,19 +1,32 @@
+import logging
 from sqlalchemy import select
 from typing import List, Dict
 from app.schemas.service import Service
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.rag.embeddings.embedding import GeminiEmbedder
 from app.rag.vectorstore.vectore_store import PineconeVectorStore
+from app.rag.vectorstore.bm25_index import BM25Index
+from app.core.metrics import timed
+from app.core.registry import registry, SERVICES_INDEX
+from app.rag.cache.semantic_cache import semantic_answer_cache
 from app.utils.preprocess_services_json import  preprocess_service
 from app.models.service import ServiceMinimal
+from app.services.batch_ingest import run_batch_ingest
+from app.services.chunk_sync import sync_chunks, delete_chunk_hashes
+
+logger = logging.getLogger(__name__)
 
 class ServiceIngestor():
 
-    def __init__(self, shop_id: int,db: AsyncSession):
+    def __init__(self, shop_id: int,db: AsyncSession, vectorstore: PineconeVectorStore | None = None, sparse_index: BM25Index | None = None):
         self.shop_id = shop_id
         self.db = db
-        self.pinecone = PineconeVectorStore("services-index", embedder=GeminiEmbedder(),dimension=3072)
+        # Long-lived store from the process-wide registry
+        self.pinecone = vectorstore or registry.store(SERVICES_INDEX)
+        # Keyword index kept in step with the vectors (None when hybrid
+        # retrieval is off or a custom store is injected without one)
+        self.sparse_index = sparse_index if vectorstore is not None else registry.sparse_index(SERVICES_INDEX)
 
+    @timed("ingest", SERVICES_INDEX)
     async def preprocess_to_store_embedding(self, service: Service) -> List[Dict]:
         
         db_service = ServiceMinimal(name=service.serviceName, uid = service.uid)
@@ -24,16 +37,56 @@ class ServiceIngestor():
        
         service.id = db_service.id
         preproccessed_chunks = preprocess_service(service, self.shop_id)
-        self.pinecone.upsert_service_chunks(preproccessed_chunks)
-        
+        await self._sync_chunks(service.id, preproccessed_chunks)
+        await semantic_answer_cache.ainvalidate_shop(self.shop_id)
+
+    async def _sync_chunks(self, service_id: int, chunks: List[Dict], untracked: bool = False) -> Dict:
+        """
+        Embed/upsert only the chunks whose content hash changed and drop the
+        ones that no longer exist.
+        """
+        result = (await sync_chunks(
+            self.db,
+            self.pinecone,
+            self.shop_id,
+            "service_id",
+            {service_id: chunks},
+            untracked=[service_id] if untracked else (),
+            sparse_index=self.sparse_index
+        ))[service_id]
+        if result["error"]:
+            await semantic_answer_cache.ainvalidate_shop(self.shop_id)
+            raise Exception(result["error"])
+        return result
         
+    @timed("ingest_batch", SERVICES_INDEX)
+    async def ingest_batch(self, services: List[Service]) -> List[Dict]:
+        """
+        Ingest many services at once: bulk upsert on uid, batched embedding
+        and paged vector upserts. Returns one result per service, in order.
+        """
+        results = await run_batch_ingest(
+            self.db,
+            self.pinecone,
+            self.shop_id,
+            services,
+            model=ServiceMinimal,
+            name_of=lambda s: s.serviceName,
+            preprocess=preprocess_service,
+            id_key="service_id",
+            sparse_index=self.sparse_index
+        )
+        await semantic_answer_cache.ainvalidate_shop(self.shop_id)
+        return results
+
+    @timed("update", SERVICES_INDEX)
     async def update_service_embedding(self, service: Service) -> None:
         """
         Update the Pinecone embeddings for a service using its UID.
         
         Subject to change
         """
-        print("Updating service embeddings for UID:", service.uid)
+        logger.info(f"Updating service embeddings for UID: {service.uid}")
 
         query = select(ServiceMinimal).where(ServiceMinimal.uid == service.uid)
         result = await self.db.execute(query)
@@ -43,17 +96,18 @@ class ServiceIngestor():
         if not db_service:
             raise Exception("Service not found")
 
-        self.pinecone.delete_by_service(self.shop_id, db_service.id)
         service.id = db_service.id
         preprocessed_chunks = preprocess_service(service, self.shop_id)
-        self.pinecone.upsert_service_chunks(preprocessed_chunks)
+        result = await self._sync_chunks(service.id, preprocessed_chunks, untracked=True)
+        await semantic_answer_cache.ainvalidate_shop(self.shop_id)
         
-        print("Updated service embeddings for UID:", service.uid)
+        logger.info(f"Updated service embeddings for UID: {service.uid} ({result['embedded']}/{result['chunks']} chunks re-embedded)")
         
         
+    @timed("delete", SERVICES_INDEX)
     async def delete_service_embedding(self, service_uid: str) -> None:
 
-        print("Deleting service embeddings for UID:", service_uid)
+        logger.info(f"Deleting service embeddings for UID: {service_uid}")
 
         result = await self.db.execute(
             select(ServiceMinimal).where(ServiceMinimal.uid == service_uid)
@@ -63,12 +117,16 @@ class ServiceIngestor():
         if not db_service:
             raise Exception("Service not found")
 
-        self.pinecone.delete_by_service(self.shop_id, db_service.id)
+        await self.pinecone.adelete_by_items(self.shop_id, "service_id", [db_service.id])
+        if self.sparse_index is not None:
+            await self.sparse_index.adelete_by_items(self.shop_id, "service_id", [db_service.id])
+        await semantic_answer_cache.ainvalidate_shop(self.shop_id)
         
+        await delete_chunk_hashes(self.db, "service_id", [db_service.id])
         await self.db.delete(db_service)
         await self.db.commit()
         
-        print("Deleted service embeddings for UID:", service_uid)
+        logger.info(f"Deleted service embeddings for UID: {service_uid}")
 
         
     
@@ -1,6 +1,7 @@
 from typing import List, Dict
 from app.schemas.product import Product  
 from app.rag.chunking.chunking import recursive_character_base_chunking
+from app.utils.price import is_available
 
 def preprocess_product(
     product: Product,
@@ -34,6 +35,9 @@ def preprocess_product(
                         "product_name": str,
                         "category": str,
                         "base_price": float,
+                        "min_price": float,
+                        "max_price": float,
+                        "availability": bool,
                         "has_variants": bool,
                         "variant_summary": str | None
                     }
@@ -48,6 +52,11 @@ def preprocess_product(
     base_price = product.price
     has_variants = product.hasVariants
 
+    # Cheapest/most expensive purchasable price, so price filters also
+    # match products whose variants are priced differently
+    prices = [base_price] + [v.price for v in (product.variants or []) if has_variants]
+    available = is_available(product.availability)
+
     variant_summary = ""
     if has_variants and product.variants:
         summary_lines = []
@@ -75,8 +84,6 @@ def preprocess_product(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
-    
-    print("chunked_data:", chunked_data)
 
     chunks = []
     for chunk_data in chunked_data:
@@ -91,6 +98,9 @@ def preprocess_product(
                 "product_name": name,
                 "category": category,
                 "base_price": base_price,
+                "min_price": min(prices),
+                "max_price": max(prices),
+                "availability": available,
                 "has_variants": has_variants,
                 "variant_summary": variant_summary 
             }
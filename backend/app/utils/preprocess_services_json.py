@@ -1,6 +1,7 @@
 from typing import List, Dict
 from app.schemas.service import Service  
 from app.rag.chunking.chunking import recursive_character_base_chunking
+from app.utils.price import parse_price_range
 
 def preprocess_service(
     service: Service,
@@ -35,6 +36,8 @@ def preprocess_service(
                         "business_name": str,
                         "category": str,
                         "price_range": str | None,
+                        "min_price": float,     # only when price_range parses
+                        "max_price": float,
                         "address": str | None,
                         "availability": bool,
                         "contact_number": str | None,
@@ -72,6 +75,8 @@ def preprocess_service(
         chunk_overlap=chunk_overlap
     )
 
+    price_bounds = parse_price_range(price_range)
+
     chunks = []
     for chunk_data in chunked_data:
         chunks.append({
@@ -88,10 +93,10 @@ def preprocess_service(
                 "address": address,
                 "availability": availability,
                 "contact_number": contact_number,
-                "banner_image": banner_image
+                "banner_image": banner_image,
+                # Pinecone rejects null metadata, so bounds are only set when known
+                **({"min_price": price_bounds[0], "max_price": price_bounds[1]} if price_bounds else {})
             }
         })
-        
-        print("Created chunk:", chunks)
 
     return chunks
@@ -0,0 +1,40 @@
+import re
+from typing import Optional, Tuple, Union
+
+# "1,200", "1200.50", "1.5k", "₱500", "php 500". The "k" must end the
+# word, so "500 kids" is 500, not 500,000
+AMOUNT_PATTERN = r"(?:₱|php\s*|p\s*)?(\d+(?:,\d{3})*(?:\.\d+)?)\s*(k\b)?"
+_AMOUNT_RE = re.compile(AMOUNT_PATTERN, re.IGNORECASE)
+
+
+def parse_amount(number: str, thousands: Optional[str] = None) -> float:
+    value = float(number.replace(",", ""))
+    return value * 1000 if thousands else value
+
+
+def parse_price_range(text: Optional[str]) -> Optional[Tuple[float, float]]:
+    """
+    Parse a free-text price or range ("500", "500-1,200", "₱500 to ₱1.2k")
+    into (min, max). Returns None when no amount is found.
+    """
+    if not text:
+        return None
+    amounts = [parse_amount(n, k) for n, k in _AMOUNT_RE.findall(text)]
+    if not amounts:
+        return None
+    return min(amounts), max(amounts)
+
+
+def is_available(value: Union[str, bool, None]) -> bool:
+    """
+    Normalize the availability field, which sellers send as a bool or as
+    free text ("available", "in stock", "out of stock", ...).
+    """
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    text = str(value).strip().lower().replace("_", " ")
+    if text.startswith(("out", "un", "not", "no", "sold")) or text in ("false", "0", "wala"):
+        return False
+    return True
@@ -0,0 +1,292 @@
+"""
+Compare retrieval quality and query latency of Gemini embeddings at reduced
+output dimensionality (768 / 1536 / 3072) on catalog-shaped data.
+
+A synthetic catalog is built with the real preprocess_product /
+preprocess_service chunkers, and every item gets shopper-style queries whose
+relevant answer is that item. For each dimension the script reports:
+
+- recall@k: share of queries whose source item is among the top-k items
+- overlap@k: agreement of the top-k chunks with the 3072-d result
+- local search latency (brute-force cosine over the whole catalog)
+- query payload size sent to Pinecone
+- optionally, Pinecone query latency against temporary indexes (--pinecone)
+
+Full-size vectors are fetched once; smaller sizes are derived by truncating
+and renormalizing, which is what output_dimensionality does server side.
+Pass --api-dims to request every size from the API instead.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_dimensions --products 300 --services 100
+    python -m benchmarks.embedding_dimensions --cache /tmp/emb.npz --pinecone
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from app.rag.embeddings.embedding import FULL_DIMENSION, GeminiEmbedder, normalize_embeddings
+from app.schemas.product import ProductRequest
+from app.schemas.service import Service
+from app.utils.preprocess_product_json import preprocess_product
+from app.utils.preprocess_services_json import preprocess_service
+
+DIMENSIONS = [768, 1536, 3072]
+EMBED_BATCH = 100
+
+PRODUCT_TYPES = {
+    "Electronics": ["Smartphone", "Bluetooth Speaker", "Power Bank", "Wireless Earbuds", "Smartwatch"],
+    "Footwear": ["Running Shoes", "Leather Sandals", "Basketball Sneakers", "Slip-on Loafers"],
+    "Apparel": ["Cotton T-Shirt", "Denim Jacket", "Hoodie", "Linen Polo", "Maxi Dress"],
+    "Home": ["Rice Cooker", "Electric Fan", "Non-stick Pan", "Bed Sheet Set", "Desk Lamp"],
+    "Beauty": ["Sunscreen SPF50", "Facial Cleanser", "Lip Tint", "Hair Serum"],
+}
+BRANDS = ["Acme", "Nova", "Luzon", "Bayani", "Tala", "Kidlat", "Mabuhay", "Alon"]
+COLORS = ["Black", "White", "Red", "Blue", "Beige"]
+SIZES = ["S", "M", "L", "XL", "8", "9", "10"]
+
+SERVICE_TYPES = {
+    "Home Services": ["Aircon Cleaning", "Plumbing Repair", "House Cleaning", "Pest Control"],
+    "Repairs": ["Phone Screen Repair", "Laptop Repair", "Appliance Repair"],
+    "Beauty": ["Haircut", "Nail Spa", "Hair Rebond", "Home Service Massage"],
+    "Events": ["Event Photography", "Catering", "Lights and Sounds Rental"],
+}
+
+PRODUCT_QUERIES = [
+    "magkano ang {name}",
+    "do you have {name} in {color}",
+    "is the {name} available in size {size}",
+    "how much is the {brand} {kind}",
+    "meron pa bang stock ng {name}",
+]
+SERVICE_QUERIES = [
+    "do you offer {kind}",
+    "how much is {kind} at {business}",
+    "pwede po ba magpa-book ng {kind}",
+    "is {business} available this weekend for {kind}",
+]
+
+
+def build_items(n_products: int, n_services: int, seed: int):
+    """
+    Returns (products, services, queries): ProductRequest / Service models
+    and shopper queries as (text, item) where item is "p12" / "s3".
+    """
+    rng = random.Random(seed)
+    products, services, queries = [], [], []
+
+    for i in range(n_products):
+        category = rng.choice(list(PRODUCT_TYPES))
+        kind = rng.choice(PRODUCT_TYPES[category])
+        brand = rng.choice(BRANDS)
+        name = f"{brand} {kind} {rng.randint(1, 99)}"
+        colors = rng.sample(COLORS, 2)
+        sizes = rng.sample(SIZES, 2)
+        variants = [
+            {"combination": [c, s], "id": f"v{i}-{c}-{s}", "image": None,
+             "price": rng.randint(199, 9999), "stock": rng.randint(0, 30)}
+            for c in colors for s in sizes
+        ]
+        products.append(ProductRequest(
+            id=i, name=name, category=category, price=variants[0]["price"], quantity=10,
+            description=f"{name} by {brand}. " + " ".join(
+                rng.choice([f"Durable {kind.lower()} for everyday use.", "Free shipping within Metro Manila.",
+                            "Comes with a 7-day replacement warranty.", f"Available in {', '.join(colors)}.",
+                            "Best seller this season.", "Authentic and brand new."])
+                for _ in range(rng.randint(2, 8))
+            ),
+            availability=True, hasVariants=True, variants=variants, sellerId=1, uid=f"p{i}"
+        ))
+        template = rng.choice(PRODUCT_QUERIES)
+        queries.append((template.format(name=name, brand=brand, kind=kind.lower(),
+                                        color=colors[0].lower(), size=sizes[0]), f"p{i}"))
+
+    for i in range(n_services):
+        category = rng.choice(list(SERVICE_TYPES))
+        kind = rng.choice(SERVICE_TYPES[category])
+        business = f"{rng.choice(BRANDS)} {rng.choice(['Hub', 'Experts', 'PH', 'Co.'])}"
+        services.append(Service(
+            id=i, serviceName=kind, businessName=business, category=category,
+            serviceDescription=f"{business} offers professional {kind.lower()}. " + " ".join(
+                rng.choice(["Home service available.", "Book at least a day ahead.", "Licensed technicians.",
+                            "Open Monday to Saturday.", "Serving Quezon City and nearby areas."])
+                for _ in range(rng.randint(2, 6))
+            ),
+            priceRange=f"{rng.randint(3, 10) * 100}-{rng.randint(11, 40) * 100}", availability=True,
+            address="Quezon City", ownerName=None, contactNumber=None, userId="bench", uid=f"s{i}"
+        ))
+        template = rng.choice(SERVICE_QUERIES)
+        queries.append((template.format(kind=kind.lower(), business=business), f"s{i}"))
+
+    return products, services, queries
+
+
+def build_catalog(n_products: int, n_services: int, seed: int):
+    """
+    Returns (chunks, queries). Each chunk has an "item" key ("p12" / "s3");
+    each query is (text, item).
+    """
+    products, services, queries = build_items(n_products, n_services, seed)
+    chunks = []
+    for i, product in enumerate(products):
+        for chunk in preprocess_product(product, shop_id=1):
+            chunks.append({"text": chunk["text"], "item": f"p{i}"})
+    for i, service in enumerate(services):
+        for chunk in preprocess_service(service, shop_id=1):
+            chunks.append({"text": chunk["text"], "item": f"s{i}"})
+    return chunks, queries
+
+
+def embed_all(embedder: GeminiEmbedder, texts: list[str]) -> np.ndarray:
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH):
+        vectors.extend(embedder.embed(texts[start:start + EMBED_BATCH]))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def load_vectors(args, chunks, queries) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+    """
+    dimension -> (chunk matrix, query matrix), all rows unit length.
+    """
+    doc_texts = [c["text"] for c in chunks]
+    query_texts = [q for q, _ in queries]
+
+    if args.api_dims:
+        by_dim = {}
+        for dim in args.dims:
+            embedder = GeminiEmbedder(output_dimensionality=dim)
+            by_dim[dim] = (embed_all(embedder, doc_texts), embed_all(embedder, query_texts))
+        return by_dim
+
+    if args.cache and os.path.exists(args.cache):
+        cached = np.load(args.cache)
+        docs, qs = cached["docs"], cached["queries"]
+    else:
+        embedder = GeminiEmbedder(output_dimensionality=FULL_DIMENSION)
+        docs, qs = embed_all(embedder, doc_texts), embed_all(embedder, query_texts)
+        if args.cache:
+            np.savez(args.cache, docs=docs, queries=qs)
+
+    return {
+        dim: (np.asarray(normalize_embeddings(docs, dim), dtype=np.float32),
+              np.asarray(normalize_embeddings(qs, dim), dtype=np.float32))
+        for dim in args.dims
+    }
+
+
+def top_k_items(scores: np.ndarray, chunk_items: list[str], k: int) -> list[str]:
+    """
+    Distinct items of the best-scoring chunks, in rank order.
+    """
+    items = []
+    for idx in np.argsort(-scores):
+        if chunk_items[idx] not in items:
+            items.append(chunk_items[idx])
+            if len(items) == k:
+                break
+    return items
+
+
+def percentile(values: list[float], p: float) -> float:
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def pinecone_latencies(dim: int, docs: np.ndarray, qs: np.ndarray, k: int) -> list[float]:
+    """
+    Upsert into a throwaway index, time every query, then delete the index.
+    """
+    from pinecone import Pinecone, ServerlessSpec
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    name = f"bench-dim-{dim}-{int(time.time())}"
+    pc.create_index(name=name, dimension=dim, metric="cosine",
+                    spec=ServerlessSpec(cloud="aws", region="us-east-1"))
+    try:
+        index = pc.Index(name)
+        for start in range(0, len(docs), 100):
+            index.upsert(vectors=[
+                {"id": str(i), "values": docs[i].tolist(), "metadata": {"shop_id": 1}}
+                for i in range(start, min(start + 100, len(docs)))
+            ])
+        while index.describe_index_stats().total_vector_count < len(docs):
+            time.sleep(1)
+
+        latencies = []
+        for q in qs:
+            started = time.perf_counter()
+            index.query(vector=q.tolist(), top_k=k, include_metadata=True, filter={"shop_id": 1})
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+    finally:
+        pc.delete_index(name)
+
+
+def run(args) -> list[dict]:
+    chunks, queries = build_catalog(args.products, args.services, args.seed)
+    chunk_items = [c["item"] for c in chunks]
+    by_dim = load_vectors(args, chunks, queries)
+
+    reference_dim = max(args.dims)
+    ref_docs, ref_qs = by_dim[reference_dim]
+    reference = [set(np.argsort(-(ref_docs @ q))[:args.k]) for q in ref_qs]
+
+    report = []
+    for dim in args.dims:
+        docs, qs = by_dim[dim]
+        hits, overlap, latencies = 0, 0.0, []
+
+        for qi, (q, (_, item)) in enumerate(zip(qs, queries)):
+            started = time.perf_counter()
+            scores = docs @ q
+            latencies.append((time.perf_counter() - started) * 1000)
+
+            hits += int(item in top_k_items(scores, chunk_items, args.k))
+            overlap += len(set(np.argsort(-scores)[:args.k]) & reference[qi]) / args.k
+
+        row = {
+            "dimension": dim,
+            "chunks": len(chunks),
+            "queries": len(queries),
+            f"recall@{args.k}": round(hits / len(queries), 4),
+            f"overlap@{args.k}_vs_{reference_dim}": round(overlap / len(queries), 4),
+            "local_search_p50_ms": round(percentile(latencies, 50), 4),
+            "local_search_p95_ms": round(percentile(latencies, 95), 4),
+            "query_payload_bytes": len(json.dumps(qs[0].tolist())),
+            "index_bytes_float32": int(docs.shape[0] * dim * 4),
+        }
+        if args.pinecone:
+            remote = pinecone_latencies(dim, docs, qs, args.k)
+            row["pinecone_p50_ms"] = round(percentile(remote, 50), 2)
+            row["pinecone_p95_ms"] = round(percentile(remote, 95), 2)
+        report.append(row)
+
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--services", type=int, default=100)
+    parser.add_argument("--dims", type=int, nargs="+", default=DIMENSIONS)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--cache", help="npz file to reuse full-size embeddings between runs")
+    parser.add_argument("--api-dims", action="store_true", help="request each dimension from the API")
+    parser.add_argument("--pinecone", action="store_true", help="also measure Pinecone query latency")
+    parser.add_argument("--out", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+In-process stand-ins for Gemini and the vector store, with configurable
+latency, for load tests that must not call external services.
+
+Latency specs (milliseconds):
+    "0" / "none"          no delay
+    "40" / "fixed:40"     constant
+    "uniform:20:80"       uniform between the bounds
+    "lognormal:40:0.5"    log-normal with median 40 and sigma 0.5 (long tail)
+"""
+import asyncio
+import math
+import random
+import time
+import zlib
+from typing import AsyncIterator, Dict, List
+
+import numpy as np
+
+from app.rag.embeddings.base.base_embedder import BaseEmbedder
+from app.rag.generation.stub_llm import StubLLMClient
+from app.rag.vectorstore.bm25_index import tokenize
+from app.rag.vectorstore.numpy_store import NumpyVectorStore
+
+
+class Latency:
+    """
+    Samples delays from a latency spec (see module docstring).
+    """
+
+    def __init__(self, spec: str = "0", seed: int | None = None):
+        self.spec = spec
+        self.rng = random.Random(seed)
+        kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        values = [float(v) for v in params.split(":")] if params and params != "none" else [0.0]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self.kind = kind
+        self.values = values
+
+    def sample(self) -> float:
+        """
+        Delay in seconds.
+        """
+        if self.kind == "uniform":
+            ms = self.rng.uniform(self.values[0], self.values[1])
+        elif self.kind == "lognormal":
+            ms = self.rng.lognormvariate(math.log(max(self.values[0], 1e-6)), self.values[1])
+        else:
+            ms = self.values[0]
+        return max(ms, 0.0) / 1000
+
+    def block(self) -> None:
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+
+    async def wait(self) -> None:
+        delay = self.sample()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class FakeEmbedder(BaseEmbedder):
+    """
+    Deterministic hashed bag-of-words vectors: texts sharing words are
+    similar, so retrieval still returns relevant chunks.
+    """
+
+    def __init__(self, dimension: int = 256, latency: Latency | None = None):
+        self.model_name = "fake-embedder"
+        self.dimension = dimension
+        self.latency = latency or Latency()
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in tokenize(text):
+            h = zlib.crc32(token.encode())
+            vector[h % self.dimension] += 1.0 if h & 1 << 31 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.latency.block()
+        return [self._vector(t) for t in texts]
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await self.latency.wait()
+        return [self._vector(t) for t in texts]
+
+
+class FakeLLMClient(StubLLMClient):
+    """
+    StubLLMClient with latency: `latency` before the first token, then
+    `token_latency` between streamed tokens. Answers are `answer_tokens`
+    words long.
+    """
+
+    def __init__(self, latency: Latency | None = None, token_latency: Latency | None = None, answer_tokens: int = 40):
+        super().__init__(responder=self._respond)
+        self.latency = latency or Latency()
+        self.token_latency = token_latency or Latency()
+        self.answer_tokens = answer_tokens
+
+    def _respond(self, prompt: str, system: str | None) -> str:
+        if "JSON array" in (system or prompt):
+            return '["products-index", "services-index"]'
+        words = prompt.split() or ["ok"]
+        return " ".join(words[i % len(words)] for i in range(self.answer_tokens))
+
+    def generate(self, prompt: str, system: str | None = None, **kwargs) -> str:
+        self.latency.block()
+        return super().generate(prompt, system=system, **kwargs)
+
+    async def agenerate(self, prompt: str, system: str | None = None, **kwargs) -> str:
+        await self.latency.wait()
+        return super().generate(prompt, system=system, **kwargs)
+
+    async def astream(self, prompt: str, system: str | None = None, **kwargs) -> AsyncIterator[str]:
+        await self.latency.wait()
+        words = super().generate(prompt, system=system, **kwargs).split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await self.token_latency.wait()
+            yield word if i == 0 else " " + word
+
+
+class FakeReranker:
+    """
+    Token-overlap scoring in place of the cross-encoder.
+    """
+
+    def __init__(self, latency: Latency | None = None):
+        self.latency = latency or Latency()
+
+    @staticmethod
+    def _ranked(query: str, candidates: list[str]) -> list[tuple[str, float]]:
+        terms = set(tokenize(query))
+        scored = [(c, float(len(terms & set(tokenize(c))))) for c in candidates]
+        return sorted(scored, key=lambda x: x[1], reverse=True)
+
+    def rerank(self, query: str, candidates: list[str]) -> list[tuple[str, float]]:
+        self.latency.block()
+        return self._ranked(query, candidates)
+
+    async def arerank(self, query: str, candidates: list[str]) -> list[tuple[str, float]]:
+        await self.latency.wait()
+        return self._ranked(query, candidates)
+
+
+class FakeVectorStore(NumpyVectorStore):
+    """
+    In-memory NumpyVectorStore that adds a network-like delay to every
+    query, upsert and delete, standing in for Pinecone.
+    """
+
+    def __init__(self, index_name: str, embedder, latency: Latency | None = None):
+        super().__init__(index_name, embedder=embedder, dimension=embedder.dimension, data_dir=None)
+        self.latency = latency or Latency()
+
+    def query_by_vector(self, vector: List[float], shop_id: int, top_k: int = 5, filter: Dict | None = None):
+        self.latency.block()
+        return super().query_by_vector(vector, shop_id, top_k=top_k, filter=filter)
+
+    async def aquery_by_vector(self, vector: List[float], shop_id: int, top_k: int = 5, filter: Dict | None = None):
+        await self.latency.wait()
+        return super().query_by_vector(vector, shop_id, top_k=top_k, filter=filter)
+
+    async def aupsert_chunks(self, chunks: List[Dict], id_key: str):
+        await self.latency.wait()
+        return await super().aupsert_chunks(chunks, id_key)
+
+    async def aupdate_chunk_metadata(self, chunks: List[Dict], id_key: str):
+        await self.latency.wait()
+        return await super().aupdate_chunk_metadata(chunks, id_key)
+
+    async def adelete_ids(self, ids: List[str], page_size: int = 1000):
+        await self.latency.wait()
+        return await super().adelete_ids(ids, page_size=page_size)
+
+    async def adelete_by_items(self, shop_id: int, id_key: str, item_ids: List[int]):
+        await self.latency.wait()
+        return await super().adelete_by_items(shop_id, id_key, item_ids)
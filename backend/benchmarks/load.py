@@ -0,0 +1,297 @@
+"""
+End-to-end load benchmark of the FastAPI app with Gemini, Pinecone and the
+reranker replaced by in-process fakes (benchmarks.fakes).
+
+The real app is driven in-process through httpx's ASGITransport, with its
+real lifespan, routes, ingestors, pipeline and database layer. The
+database is a throwaway SQLite file unless --database-url is given. The
+fakes are injected into the process-wide ClientRegistry before startup.
+
+Phases:
+1. ingest: POST every synthetic product / service to the ingest routes
+   (with INGEST_MODE=queued, the phase also waits for the ingest jobs to
+   finish and reports that drain time)
+2. chat:   POST shopper queries to /agentic-chat and read the SSE stream
+
+Per phase: throughput, latency and time-to-first-byte percentiles (TTFB is
+taken when the app sends its first body bytes, since ASGITransport buffers
+responses), plus error counts. Results are written as JSON so runs can be
+compared.
+
+Usage (from backend/):
+    python -m benchmarks.load --chat-requests 500 --concurrency 32
+    python -m benchmarks.load --llm-latency lognormal:800:0.6 --out /tmp/run.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class FirstByteTimer:
+    """
+    ASGI wrapper recording when the first non-empty body chunk of each
+    request (tagged with an x-bench-id header) leaves the app.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.first_byte: dict[bytes, float] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        bench_id = dict(scope["headers"]).get(b"x-bench-id")
+
+        async def timed_send(message):
+            if (
+                bench_id is not None
+                and message["type"] == "http.response.body"
+                and message.get("body")
+                and bench_id not in self.first_byte
+            ):
+                self.first_byte[bench_id] = time.perf_counter()
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    ms = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "mean": round(float(ms.mean()), 2),
+        "max": round(float(ms.max()), 2)
+    }
+
+
+async def drive(client, timer: FirstByteTimer, requests: list[tuple[str, str, dict]], concurrency: int) -> dict:
+    """
+    Send `requests` (method, url, json body) with at most `concurrency` in
+    flight and summarize them.
+    """
+    from app.rag.agents.response_generation_agent import GENERATION_ERROR_MESSAGE
+
+    latencies, ttfbs, errors, answer_errors = [], [], 0, 0
+    queue = list(reversed(list(enumerate(requests))))
+
+    async def worker():
+        nonlocal errors, answer_errors
+        while queue:
+            n, (method, url, body) = queue.pop()
+            bench_id = str(n).encode()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body, headers={"x-bench-id": bench_id.decode()})
+                content = response.text
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Request {method} {url} failed: {e}")
+                errors += 1
+                timer.first_byte.pop(bench_id, None)
+                continue
+            end = time.perf_counter()
+            latencies.append(end - start)
+            ttfbs.append(timer.first_byte.pop(bench_id, end) - start)
+            if response.status_code >= 400:
+                errors += 1
+            elif GENERATION_ERROR_MESSAGE in content:
+                answer_errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+    duration = time.perf_counter() - started
+
+    return {
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "errors": errors,
+        "answer_errors": answer_errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency_ms": percentiles(latencies),
+        "ttfb_ms": percentiles(ttfbs)
+    }
+
+
+def install_fakes(registry, args) -> None:
+    """
+    Fill the registry with fakes so the app's lifespan finds it ready and
+    skips creating real Gemini / Pinecone clients.
+    """
+    from app.core.config import settings
+    from app.rag.cache.semantic_cache import semantic_answer_cache
+    from app.rag.embeddings.cached_embedder import CachingEmbedder
+    from app.rag.embeddings.scheduler import EmbeddingScheduler
+    from app.rag.generation.batching_reranker import BatchingReranker
+    from app.rag.generation.reranker import create_reranker
+    from app.rag.pipeline import AgenticRAGPipeline
+    from app.rag.vectorstore.bm25_index import BM25Index
+    from benchmarks.fakes import FakeEmbedder, FakeLLMClient, FakeReranker, FakeVectorStore, Latency
+
+    seed = args.seed
+    registry.embedder = FakeEmbedder(dimension=args.dimension, latency=Latency(args.embed_latency, seed))
+    query_embedder = registry.embedder
+    if settings.EMBED_SCHEDULER_ENABLED:
+        registry.embed_scheduler = EmbeddingScheduler(registry.embedder)
+        registry.embedder = registry.embed_scheduler.background
+        query_embedder = registry.embed_scheduler.interactive
+    registry.llm = FakeLLMClient(
+        latency=Latency(args.llm_latency, seed + 1),
+        token_latency=Latency(args.token_latency, seed + 2),
+        answer_tokens=args.answer_tokens
+    )
+    registry.vectorstores = {
+        name: FakeVectorStore(name, registry.embedder, latency=Latency(args.vector_latency, seed + 3 + i))
+        for i, name in enumerate(["products-index", "services-index"])
+    }
+    if settings.HYBRID_RETRIEVAL_ENABLED:
+        registry.sparse_indexes = {name: BM25Index(name) for name in registry.vectorstores}
+    registry.query_embedder = CachingEmbedder(
+        query_embedder,
+        max_size=settings.EMBED_CACHE_MAX_SIZE,
+        ttl_seconds=settings.EMBED_CACHE_TTL_SECONDS
+    )
+
+    if args.real_reranker:
+        reranker = create_reranker()
+        if settings.RERANK_BATCHING_ENABLED:
+            reranker = BatchingReranker(reranker)
+    else:
+        reranker = FakeReranker(latency=Latency(args.rerank_latency, seed + 9))
+
+    # The fake vector stores are read-your-writes consistent
+    semantic_answer_cache.settle_seconds = 0
+    registry.pipeline = AgenticRAGPipeline(
+        registry.vectorstores,
+        registry.llm,
+        embedder=registry.query_embedder,
+        answer_cache=semantic_answer_cache if args.semantic_cache else None,
+        reranker=reranker,
+        sparse_indexes=registry.sparse_indexes
+    )
+
+
+async def run_phases(args) -> dict:
+    import httpx
+
+    from app.core.db import engine
+    from app.core.registry import registry
+    from app.main import app
+    from app.services.ingest_jobs import ingest_job_queue
+    from benchmarks.embedding_dimensions import build_items
+
+    install_fakes(registry, args)
+    products, services, queries = build_items(args.products, args.services, args.seed)
+
+    shop = f"/api/v1/shops/{args.shop_id}"
+    ingest_requests = (
+        [("POST", f"{shop}/products", p.model_dump(mode="json")) for p in products]
+        + [("POST", f"{shop}/service", s.model_dump(mode="json")) for s in services]
+    )
+    chat_requests = [
+        ("POST", f"/api/v1/chat/shops/{args.shop_id}/agentic-chat", {"user_id": f"bench-{n % args.users}", "query": queries[n % len(queries)][0]})
+        for n in range(args.chat_requests)
+    ] if queries else []
+
+    timer = FirstByteTimer(app)
+    transport = httpx.ASGITransport(app=timer)
+    phases = {}
+    # ASGITransport does not send lifespan events; run the app's lifespan here
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            if not args.skip_ingest:
+                phases["ingest"] = await drive(client, timer, ingest_requests, args.ingest_concurrency)
+                drain_started = time.perf_counter()
+                while await ingest_job_queue.pending():
+                    await asyncio.sleep(0.05)
+                phases["ingest"]["drain_s"] = round(time.perf_counter() - drain_started, 3)
+                phases["ingest"]["jobs"] = ingest_job_queue.stats()
+            phases["chat"] = await drive(client, timer, chat_requests, args.concurrency)
+
+        pipeline = registry.pipeline
+        phases["pipeline"] = {
+            "routing": pipeline.routing_agent.routing_stats(),
+            "embed_cache": registry.query_embedder.stats(),
+            "embed_scheduler": registry.embed_scheduler.stats() if registry.embed_scheduler else None,
+            "llm": registry.llm.stats()
+        }
+    # Pooled aiosqlite connections keep worker threads alive otherwise
+    await engine.dispose()
+    return phases
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--services", type=int, default=50)
+    parser.add_argument("--chat-requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=32, help="chat requests in flight")
+    parser.add_argument("--ingest-concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=50, help="distinct chat user ids")
+    parser.add_argument("--shop-id", type=int, default=1)
+    parser.add_argument("--skip-ingest", action="store_true", help="only run the chat phase (empty catalog)")
+    parser.add_argument("--embed-latency", default="lognormal:60:0.4")
+    parser.add_argument("--llm-latency", default="lognormal:450:0.5", help="time to first token")
+    parser.add_argument("--token-latency", default="fixed:10", help="delay between streamed tokens")
+    parser.add_argument("--vector-latency", default="lognormal:35:0.4")
+    parser.add_argument("--rerank-latency", default="fixed:15")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--dimension", type=int, default=256, help="fake embedding size")
+    parser.add_argument("--real-reranker", action="store_true", help="use the configured cross-encoder")
+    parser.add_argument("--semantic-cache", action="store_true", help="enable the semantic answer cache")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite database")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="JSON report path (default: benchmarks/results/load-<time>.json)")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="load-bench-")
+    # Settings and the engine are created at import: configure them first
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{tmpdir}/bench.db"
+    os.environ.setdefault("GEMINI_API_KEY", "load-benchmark")
+
+    started_at = datetime.now(timezone.utc)
+    # Per-item ingest logs would drown the report
+    logging.disable(logging.INFO)
+    phases = asyncio.run(run_phases(args))
+
+    report = {
+        "started_at": started_at.isoformat(),
+        "revision": git_revision(),
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        **phases
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"load-{started_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"Report written to {out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
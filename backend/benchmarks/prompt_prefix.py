@@ -0,0 +1,73 @@
+"""
+Measure how many prompt bytes the routing and answer calls send when their
+static instructions are a registered prefix instead of part of every prompt.
+
+Shopper queries and contexts come from the synthetic catalog of
+benchmarks.embedding_dimensions. Both agents run against StubLLMClient, so
+no API calls are made:
+
+- inline: the static prefix is sent with every call (previous behaviour)
+- cached: the static prefix is sent once per process (cached content)
+
+Usage (from backend/):
+    python -m benchmarks.prompt_prefix --queries 500
+"""
+import argparse
+import asyncio
+import json
+import sys
+from collections import defaultdict
+
+from app.rag.agents.index_routing_agent import IndexRoutingAgent
+from app.rag.agents.response_generation_agent import ResponseGenerationAgent
+from app.rag.generation.stub_llm import StubLLMClient
+from benchmarks.embedding_dimensions import build_catalog
+
+
+async def measure(queries: list[tuple[str, str]], contexts: dict[str, str], cache_prefixes: bool) -> dict:
+    llm = StubLLMClient(cache_prefixes=cache_prefixes)
+    # No local router and no decision cache: every query reaches the LLM router
+    router = IndexRoutingAgent(llm, cache_size=0)
+    responder = ResponseGenerationAgent(llm)
+    for query, item in queries:
+        await router.adecide_index(query)
+        await responder.agenerate(query, contexts[item])
+    return llm.stats()
+
+
+def run(args) -> dict:
+    n_products = args.queries * 3 // 4
+    chunks, queries = build_catalog(n_products, args.queries - n_products, args.seed)
+    by_item = defaultdict(list)
+    for chunk in chunks:
+        by_item[chunk["item"]].append(chunk["text"])
+    contexts = {item: "\n\n".join(texts) for item, texts in by_item.items()}
+
+    inline = asyncio.run(measure(queries, contexts, cache_prefixes=False))
+    cached = asyncio.run(measure(queries, contexts, cache_prefixes=True))
+    return {
+        "queries": len(queries),
+        "inline": inline,
+        "cached": cached,
+        "bytes_saved_per_call": inline["bytes_per_call"] - cached["bytes_per_call"],
+        "reduction": 1 - cached["total_bytes"] / inline["total_bytes"] if inline["total_bytes"] else 0.0
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
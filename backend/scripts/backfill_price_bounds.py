@@ -0,0 +1,77 @@
+"""
+Add min_price / max_price metadata to Pinecone vectors ingested before
+price filters existed. Filtered queries ("under 500") only match vectors
+that carry the bounds, so older products and services silently drop out
+of filtered results until they are backfilled or re-ingested.
+
+Bounds come from metadata the vectors already have: base_price plus the
+variant prices in variant_summary for products, price_range for services.
+
+Usage (from backend/):
+    python -m scripts.backfill_price_bounds --dry-run
+    python -m scripts.backfill_price_bounds --index services-index
+"""
+import argparse
+import logging
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+from pinecone import Pinecone
+
+from app.core.registry import INDEX_NAMES
+from app.utils.price import parse_price_range
+
+logger = logging.getLogger(__name__)
+
+FETCH_PAGE_SIZE = 100
+_VARIANT_PRICE_RE = re.compile(r"Price: (\d+(?:\.\d+)?)")
+
+
+def price_bounds(metadata: Dict) -> Optional[Tuple[float, float]]:
+    """
+    (min, max) for a chunk's metadata, or None when it has no price.
+    """
+    if "base_price" in metadata:
+        prices = [float(metadata["base_price"])]
+        if metadata.get("has_variants"):
+            prices += [float(p) for p in _VARIANT_PRICE_RE.findall(metadata.get("variant_summary") or "")]
+        return min(prices), max(prices)
+    return parse_price_range(metadata.get("price_range"))
+
+
+def backfill(index, dry_run: bool = False) -> Dict[str, int]:
+    counts = {"scanned": 0, "updated": 0, "unpriced": 0}
+    for ids in index.list():
+        for start in range(0, len(ids), FETCH_PAGE_SIZE):
+            page = ids[start:start + FETCH_PAGE_SIZE]
+            for _id, vector in index.fetch(ids=page).vectors.items():
+                counts["scanned"] += 1
+                metadata = vector.metadata or {}
+                if "min_price" in metadata and "max_price" in metadata:
+                    continue
+                bounds = price_bounds(metadata)
+                if bounds is None:
+                    counts["unpriced"] += 1
+                    continue
+                if not dry_run:
+                    index.update(id=_id, set_metadata={"min_price": bounds[0], "max_price": bounds[1]})
+                counts["updated"] += 1
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", choices=INDEX_NAMES, action="append", help="index to backfill (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="count the vectors to update without writing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    for name in args.index or INDEX_NAMES:
+        counts = backfill(pc.Index(name), dry_run=args.dry_run)
+        logger.info(f"{name}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Export the cross-encoder reranker to int8-quantized ONNX and verify that it
+scores like the PyTorch model.
+
+Usage (from backend/):
+    python -m scripts.export_onnx_reranker --out models/reranker-onnx
+    python -m scripts.export_onnx_reranker --out models/reranker-onnx --parity-only
+"""
+import argparse
+import json
+import os
+import sys
+
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from sentence_transformers import CrossEncoder
+
+from app.rag.generation.onnx_reranker import ONNX_CONFIG_FILE, ONNX_MODEL_FILE, OnnxReranker, check_parity
+from app.rag.generation.reranker import Reranker
+
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Shapes taken from our chunk format: short shopper questions against
+# "Product: ... Category: ... Base Price: ..." and "Service: ..." chunks.
+PARITY_SAMPLES = [
+    ("magkano ang iphone 13 128gb", [
+        "Product: iPhone 13\nCategory: Electronics\nBase Price: 32990.0\nHas Variants: True",
+        "Product: Samsung Galaxy A54\nCategory: Electronics\nBase Price: 21990.0",
+        "Variant: 128GB, Midnight | Price: 32990.0 | Stock: 4\nVariant: 256GB, Blue | Price: 38990.0 | Stock: 0",
+        "Service: Phone Screen Repair\nBusiness: FixIt Hub\nCategory: Repairs\nPrice Range: 800-2500",
+    ]),
+    ("do you offer aircon cleaning this weekend", [
+        "Service: Aircon Cleaning\nBusiness: CoolAir PH\nCategory: Home Services\nPrice Range: 500-1200\nAvailability: True",
+        "Product: Window Type Aircon 1HP\nCategory: Appliances\nBase Price: 15999.0",
+        "Service: Plumbing Repair\nBusiness: CoolAir PH\nCategory: Home Services\nAvailability: False",
+    ]),
+    ("cheap running shoes size 9", [
+        "Product: Nike Revolution 6\nCategory: Footwear\nBase Price: 2895.0\nHas Variants: True",
+        "Variant: 9, Black | Price: 2895.0 | Stock: 12\nVariant: 10, Black | Price: 2895.0 | Stock: 3",
+        "Product: Leather Belt\nCategory: Accessories\nBase Price: 499.0",
+    ]),
+]
+
+
+def detect_activation(model: CrossEncoder) -> str:
+    activation = getattr(model, "activation_fn", None) or getattr(model, "default_activation_function", None)
+    return "sigmoid" if type(activation).__name__ == "Sigmoid" else "identity"
+
+
+def export(model_name: str, out_dir: str, max_length: int) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    cross_encoder = CrossEncoder(model_name, device="cpu")
+    hf_model = cross_encoder.model.eval()
+    tokenizer = cross_encoder.tokenizer
+
+    dummy = tokenizer(["query"], ["candidate text"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    torch.onnx.export(
+        hf_model,
+        tuple(dummy[name] for name in input_names),
+        fp32_path,
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=17,
+        dynamo=False
+    )
+
+    quantize_dynamic(fp32_path, os.path.join(out_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(out_dir)
+
+    with open(os.path.join(out_dir, ONNX_CONFIG_FILE), "w") as f:
+        json.dump({
+            "source_model": model_name,
+            "activation": detect_activation(cross_encoder),
+            "max_length": max_length
+        }, f, indent=2)
+
+    print(f"Exported {model_name} to {out_dir}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--out", default="models/reranker-onnx")
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--atol", type=float, default=0.1, help="max allowed absolute score difference")
+    parser.add_argument("--parity-only", action="store_true")
+    args = parser.parse_args()
+
+    if not args.parity_only:
+        export(args.model, args.out, args.max_length)
+
+    report = check_parity(
+        Reranker(args.model),
+        OnnxReranker(args.out, max_length=args.max_length),
+        PARITY_SAMPLES,
+        atol=args.atol
+    )
+    print(json.dumps(report, indent=2))
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Rebuild the BM25 keyword indexes under BM25_DIR from the chunk texts
+stored with the chunk hashes in the database.
+
+The app already does this at startup for indexes that come up empty;
+run this after restoring the database, or to drop postings that drifted
+from it. Chunks synced before texts were stored are reported as
+"missing_text" until their items are updated again.
+
+Usage (from backend/):
+    python -m scripts.rebuild_bm25
+    python -m scripts.rebuild_bm25 --index products-index
+"""
+import argparse
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, engine, ensure_columns
+from app.core.registry import INDEX_ID_KEYS, INDEX_NAMES
+from app.rag.vectorstore.bm25_index import BM25Index
+from app.services.chunk_sync import rebuild_sparse_index
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild(index_names) -> None:
+    async with engine.begin() as conn:
+        await ensure_columns(conn)
+    for name in index_names:
+        sparse_index = BM25Index(name, data_dir=settings.BM25_DIR or None)
+        async with AsyncSessionLocal() as db:
+            counts = await rebuild_sparse_index(db, sparse_index, INDEX_ID_KEYS[name])
+        logger.info(f"{name}: {counts}")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", choices=INDEX_NAMES, action="append", help="index to rebuild (default: all)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if not settings.BM25_DIR:
+        parser.error("BM25_DIR is empty: the keyword index lives in memory only")
+    asyncio.run(rebuild(args.index or INDEX_NAMES))
+
+
+if __name__ == "__main__":
+    main()
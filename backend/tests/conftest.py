@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Settings and the database engine are created at import time: point them at
+# a throwaway SQLite database before anything under app/ is imported
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='tests-')}/test.db")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.db import Base
+from app.models.product import ProductMinimal
+from app.rag.vectorstore.numpy_store import NumpyVectorStore
+from app.schemas.product import ProductRequest
+from app.services.batch_ingest import iter_batch_items, run_batch_ingest, summarize
+from app.utils.preprocess_product_json import preprocess_product
+
+
+def product(uid, name="Lamp", **fields):
+    return {
+        "name": name, "description": "Desk lamp", "category": "Home", "price": 450.0, "quantity": 3,
+        "availability": True, "hasVariants": False, "sellerId": 1, "uid": uid, **fields
+    }
+
+
+def request(*chunks: bytes, content_type="application/json") -> Request:
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {"type": "http", "method": "POST", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+
+def parse(req: Request):
+    async def run():
+        return [entry async for entry in iter_batch_items(req, ProductRequest)]
+    return asyncio.run(run())
+
+
+def test_ndjson_is_read_across_chunks_with_per_line_errors():
+    entries = parse(request(
+        b'{"name": "Lamp", "description": "d", "category": "c", "price": 1, "quantity": 1, ',
+        b'"availability": true, "hasVariants": false, "sellerId": 1, "uid": "a"}\n\n{not json}\n',
+        b'{"name": "Missing fields"}\n{"name": "Fan", "description": "d", "category": "c", "price": 2, '
+        b'"quantity": 1, "availability": true, "hasVariants": false, "sellerId": 1, "uid": "b"}',
+        content_type="application/x-ndjson"
+    ))
+
+    assert [position for position, _, _ in entries] == [0, 1, 2, 3]
+    assert [item.uid if item else None for _, item, _ in entries] == ["a", None, None, "b"]
+    assert "json" in entries[1][2].lower()
+    assert "description" in entries[2][2]
+
+
+def test_json_array_entries_are_validated_one_by_one():
+    entries = parse(request(b'[{"name": "Missing fields"}, ' + ProductRequest(**product("a")).model_dump_json().encode() + b"]"))
+
+    assert entries[0][1] is None and entries[0][2]
+    assert entries[1][1].uid == "a" and entries[1][2] is None
+
+
+@pytest.mark.parametrize("body, status", [
+    (b"{not json", 400),
+    (b'{"name": "Lamp"}', 400),
+    (b"[{}, {}, {}]", 413),
+])
+def test_bad_array_bodies_are_rejected(monkeypatch, body, status):
+    monkeypatch.setattr(settings, "INGEST_BATCH_MAX_ITEMS", 2)
+    with pytest.raises(HTTPException) as error:
+        parse(request(body))
+    assert error.value.status_code == status
+
+
+class Embedder:
+    async def aembed(self, texts):
+        if any("Broken" in text for text in texts):
+            raise RuntimeError("embedding quota exceeded")
+        return [[1.0, float(len(text)), 0.0] for text in texts]
+
+
+def test_batch_reports_partial_success_per_item(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBED_BATCH_SIZE", 1)
+    items = [
+        ProductRequest(**product("a")),
+        ProductRequest(**product("")),
+        ProductRequest(**product("b", name="Broken lamp")),
+        ProductRequest(**product("a", name="Lamp v2")),
+    ]
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/batch.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as db:
+                return await run_batch_ingest(
+                    db, NumpyVectorStore("products-index", Embedder(), dimension=3), 1, items,
+                    model=ProductMinimal, name_of=lambda p: p.name, preprocess=preprocess_product, id_key="product_id"
+                )
+        finally:
+            await engine.dispose()
+
+    results = asyncio.run(run())
+
+    assert [r["status"] for r in results] == ["error", "error", "error", "ingested"]
+    assert "superseded" in results[0]["error"]
+    assert "uid is required" in results[1]["error"]
+    assert "embedding quota exceeded" in results[2]["error"]
+    assert summarize(results) == {"status": "partial", "succeeded": 1, "failed": 3}
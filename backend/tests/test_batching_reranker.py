@@ -0,0 +1,71 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.rag.generation.batching_reranker import BatchingReranker
+
+
+class Reranker:
+    """
+    Scores a pair by the number in its candidate text; fails any predict
+    call that contains a candidate starting with "bad".
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.calls = []
+
+    def predict(self, pairs):
+        self.calls.append(len(pairs))
+        if any(candidate.startswith("bad") for _, candidate in pairs):
+            raise RuntimeError("model failed")
+        return [float(candidate.split()[-1]) for _, candidate in pairs]
+
+
+def rerank_concurrently(reranker, requests, max_batch_size, max_wait_ms=20):
+    batching = BatchingReranker(reranker, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    async def run():
+        return await asyncio.gather(
+            *[batching.arerank(query, candidates) for query, candidates in requests], return_exceptions=True
+        )
+
+    return asyncio.run(run())
+
+
+def test_scores_fan_back_to_each_caller_in_order():
+    reranker = Reranker()
+    requests = [(f"q{n}", [f"item {n}{i}" for i in (3, 1, 2)]) for n in range(1, 4)]
+
+    results = rerank_concurrently(reranker, requests, max_batch_size=100)
+
+    assert reranker.calls == [9]
+    for n, result in enumerate(results, start=1):
+        assert result == [(f"item {n}3", float(f"{n}3")), (f"item {n}2", float(f"{n}2")), (f"item {n}1", float(f"{n}1"))]
+
+
+def test_predict_calls_never_exceed_max_batch_size():
+    reranker = Reranker()
+    requests = [("q1", [f"item {i}" for i in range(7)]), ("q2", ["item 20", "item 10"]), ("q3", ["item 5"])]
+
+    results = rerank_concurrently(reranker, requests, max_batch_size=4)
+
+    assert sum(reranker.calls) == 10
+    assert max(reranker.calls) <= 4
+    assert results[0] == [(f"item {i}", float(i)) for i in reversed(range(7))]
+    assert results[1] == [("item 20", 20.0), ("item 10", 10.0)]
+    assert results[2] == [("item 5", 5.0)]
+
+
+def test_failed_chunk_only_fails_its_callers():
+    reranker = Reranker()
+    # One flush, scored as [q1 item 1, q2 item 2] and [q2 bad 3, q2 item 4]
+    requests = [("q1", ["item 1"]), ("q2", ["item 2", "bad 3", "item 4"])]
+
+    ok, failed = rerank_concurrently(reranker, requests, max_batch_size=2, max_wait_ms=1000)
+
+    assert reranker.calls == [2, 2]
+    assert ok == [("item 1", 1.0)]
+    with pytest.raises(RuntimeError):
+        raise failed
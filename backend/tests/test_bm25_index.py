@@ -0,0 +1,92 @@
+import asyncio
+
+from app.rag.vectorstore.bm25_index import BM25Index, tokenize
+
+
+def chunks(product_id, text, shop_id=1, **metadata):
+    return {product_id: [{
+        "text": text,
+        "metadata": {"shop_id": shop_id, "product_id": product_id, "chunk_index": 0, **metadata}
+    }]}
+
+
+def ids(result):
+    return [match.id for match in result.matches]
+
+
+def test_tokenize_splits_mixed_tokens():
+    assert tokenize("iPhone 13 128GB") == ["iphone", "13", "128gb", "128", "gb"]
+
+
+def test_exact_tokens_rank_first_within_shop():
+    index = BM25Index("products-index")
+    index.replace_items(1, "product_id", {
+        **chunks(1, "Samsung Galaxy A54 phone"),
+        **chunks(2, "iPhone 13 128GB phone", category="Phones")
+    })
+    index.replace_items(2, "product_id", chunks(3, "iPhone 13 case", shop_id=2))
+
+    assert ids(index.query("iphone 128gb", shop_id=1)) == ["2_0"]
+    assert ids(index.query("phone", shop_id=1, filter={"category": "Phones"})) == ["2_0"]
+    assert index.categories(1) == {"Phones"}
+
+
+def test_processes_sharing_a_directory_do_not_lose_writes(tmp_path):
+    first = BM25Index("products-index", data_dir=str(tmp_path))
+    second = BM25Index("products-index", data_dir=str(tmp_path))
+
+    first.replace_items(1, "product_id", chunks(1, "red shirt"))
+    second.replace_items(1, "product_id", chunks(2, "blue shirt"))
+    first.delete_by_items(1, "product_id", [1])
+    first.replace_items(1, "product_id", chunks(3, "green shirt"))
+
+    assert sorted(ids(second.query("shirt", shop_id=1))) == ["2_0", "3_0"]
+    reloaded = BM25Index("products-index", data_dir=str(tmp_path))
+    assert sorted(ids(reloaded.query("shirt", shop_id=1))) == ["2_0", "3_0"]
+
+
+def test_writes_append_deltas_until_the_log_outgrows_the_snapshot(tmp_path):
+    index = BM25Index("products-index", data_dir=str(tmp_path))
+    index.compact_min_bytes = 0
+    shop_dir = tmp_path / "products-index"
+
+    asyncio.run(index.areplace_items(1, "product_id", chunks(1, "red shirt")))
+    assert not (shop_dir / "shop_1.json").exists()
+    assert (shop_dir / "shop_1.log").exists()
+
+    # The next write outgrows the (missing) snapshot: compacted, log dropped
+    asyncio.run(index.areplace_items(1, "product_id", chunks(2, "blue shirt")))
+    assert (shop_dir / "shop_1.json").exists()
+    assert not (shop_dir / "shop_1.log").exists()
+
+    index.compact_min_bytes = 1 << 20
+    index.delete_by_items(1, "product_id", [1])
+    assert (shop_dir / "shop_1.log").exists()
+
+    reloaded = BM25Index("products-index", data_dir=str(tmp_path))
+    assert ids(reloaded.query("shirt", shop_id=1)) == ["2_0"]
+
+
+def test_torn_log_record_is_ignored_and_dropped(tmp_path):
+    index = BM25Index("products-index", data_dir=str(tmp_path))
+    index.replace_items(1, "product_id", chunks(1, "red shirt"))
+    log_file = tmp_path / "products-index" / "shop_1.log"
+    with open(log_file, "a") as f:
+        f.write('{"op": "add", "docs": [{"id": "9_0"')
+
+    reloaded = BM25Index("products-index", data_dir=str(tmp_path))
+    assert ids(reloaded.query("shirt", shop_id=1)) == ["1_0"]
+    reloaded.replace_items(1, "product_id", chunks(2, "blue shirt"))
+
+    again = BM25Index("products-index", data_dir=str(tmp_path))
+    assert sorted(ids(again.query("shirt", shop_id=1))) == ["1_0", "2_0"]
+
+
+def test_emptied_shop_leaves_no_files(tmp_path):
+    index = BM25Index("products-index", data_dir=str(tmp_path))
+    index.replace_items(1, "product_id", chunks(1, "red shirt"))
+    asyncio.run(index.adelete_by_shop(1))
+
+    assert not (tmp_path / "products-index" / "shop_1.json").exists()
+    assert not (tmp_path / "products-index" / "shop_1.log").exists()
+    assert BM25Index("products-index", data_dir=str(tmp_path)).empty
@@ -0,0 +1,58 @@
+import asyncio
+
+from app.rag.embeddings import cached_embedder
+from app.rag.embeddings.cached_embedder import CachingEmbedder
+
+
+class Embedder:
+    model_name = "test-model"
+    dimension = 1
+
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    async def aembed(self, texts):
+        return self.embed(texts)
+
+
+def test_repeated_and_normalized_texts_hit_the_cache():
+    inner = Embedder()
+    embedder = CachingEmbedder(inner)
+
+    first = embedder.embed(["Red  Shirt", "red shirt", "blue"])
+    second = asyncio.run(embedder.aembed([" RED shirt "]))
+
+    assert inner.calls == [["Red  Shirt", "blue"]]
+    assert first[0] == first[1] == second[0]
+    assert embedder.stats() == {"hits": 1, "backend_hits": 0, "misses": 2, "size": 2}
+
+
+def test_least_recently_used_entry_is_evicted():
+    inner = Embedder()
+    embedder = CachingEmbedder(inner, max_size=2)
+
+    embedder.embed(["a", "bb"])
+    embedder.embed(["a"])        # "bb" is now least recently used
+    embedder.embed(["ccc"])
+    embedder.embed(["a", "bb"])
+
+    assert inner.calls == [["a", "bb"], ["ccc"], ["bb"]]
+
+
+def test_expired_entries_are_embedded_again(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cached_embedder.time, "monotonic", lambda: now[0])
+    inner = Embedder()
+    embedder = CachingEmbedder(inner, ttl_seconds=60)
+
+    embedder.embed(["a"])
+    now[0] += 59
+    embedder.embed(["a"])
+    now[0] += 2
+    embedder.embed(["a"])
+
+    assert inner.calls == [["a"], ["a"]]
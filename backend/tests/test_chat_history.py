@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.routes import chat
+from app.core.db import Base, get_db
+from app.models.chats import ChatMessage
+from app.services.chat_history import fetch_chat_history
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def with_history(tmp_path, work):
+    """
+    Run `work(sessions)` against a database holding 5 messages of user u1
+    in shop 1, the middle three sharing one created_at.
+    """
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/chat.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with sessions() as db:
+            db.add_all([
+                ChatMessage(shop_id=1, user_id="u1", role="user", message=f"m{n}", created_at=T0 + timedelta(seconds=minute))
+                for n, minute in enumerate([0, 1, 1, 1, 2])
+            ] + [ChatMessage(shop_id=1, user_id="u2", role="user", message="other", created_at=T0)])
+            await db.commit()
+        try:
+            return await work(sessions)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_pages_walk_ties_on_created_at_without_gaps(tmp_path):
+    async def work(sessions):
+        pages, cursor = [], None
+        async with sessions() as db:
+            while True:
+                page = await fetch_chat_history(db, 1, "u1", limit=2, before=cursor)
+                pages.append([m["message"] for m in page["messages"]])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    return pages
+
+    assert with_history(tmp_path, work) == [["m3", "m4"], ["m1", "m2"], ["m0"]]
+
+
+# Not base64; base64 of "nopipe" (no id part)
+@pytest.mark.parametrize("cursor", ["not-a-cursor!", "bm9waXBl"])
+def test_bad_cursor_is_a_client_error(tmp_path, cursor):
+    async def work(sessions):
+        async with sessions() as db:
+            return await fetch_chat_history(db, 1, "u1", limit=2, before=cursor)
+
+    with pytest.raises(HTTPException) as error:
+        with_history(tmp_path, work)
+    assert error.value.status_code == 400
+
+
+def test_route_keeps_the_bare_list_without_paging_params(tmp_path):
+    async def work(sessions):
+        app = FastAPI()
+        app.include_router(chat.router, prefix="/api/v1/chat")
+
+        async def db():
+            async with sessions() as session:
+                yield session
+        app.dependency_overrides[get_db] = db
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            legacy = (await client.get("/api/v1/chat/shops/1/chat-history/u1")).json()
+            page = (await client.get("/api/v1/chat/shops/1/chat-history/u1", params={"limit": 3})).json()
+        return legacy, page
+
+    legacy, page = with_history(tmp_path, work)
+    assert [m["message"] for m in legacy] == ["m0", "m1", "m2", "m3", "m4"]
+    assert {"shop_id", "user_id", "role", "message", "created_at"} <= set(legacy[0])
+    assert [m["message"] for m in page["messages"]] == ["m2", "m3", "m4"]
+    assert page["next_cursor"]
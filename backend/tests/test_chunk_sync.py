@@ -0,0 +1,122 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base
+from app.models.chunk_hash import ChunkHash  # noqa: F401 (registers the table)
+from app.rag.vectorstore.numpy_store import NumpyVectorStore
+from app.rag.vectorstore.bm25_index import BM25Index
+from app.services.chunk_sync import rebuild_sparse_index, sync_chunks
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.texts = []
+
+    async def aembed(self, texts):
+        self.texts.extend(texts)
+        return [[1.0, float(len(text)), 0.0] for text in texts]
+
+
+def chunks(*texts, **metadata):
+    return [
+        {"text": text, "metadata": {"shop_id": 1, "product_id": 5, "chunk_index": i, **metadata}}
+        for i, text in enumerate(texts)
+    ]
+
+
+def run_syncs(tmp_path, *versions, rebuild_into=None):
+    """
+    Sync product 5 through each version of its chunks; returns the results,
+    the texts embedded per sync and the final store. `rebuild_into` is a
+    BM25 index rebuilt from the database afterwards.
+    """
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/sync.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        embedder = CountingEmbedder()
+        store = NumpyVectorStore("products-index", embedder, dimension=3)
+
+        results, embedded = [], []
+        for version in versions:
+            before = len(embedder.texts)
+            async with sessions() as db:
+                results.append((await sync_chunks(db, store, 1, "product_id", {5: version}))[5])
+            embedded.append(embedder.texts[before:])
+        if rebuild_into is not None:
+            async with sessions() as db:
+                await rebuild_sparse_index(db, rebuild_into, "product_id")
+        await engine.dispose()
+        return results, embedded, store
+
+    return asyncio.run(run())
+
+
+def test_only_changed_chunks_are_embedded(tmp_path):
+    results, embedded, store = run_syncs(
+        tmp_path,
+        chunks("first part", "second part", price=10),
+        chunks("first part", "second part", price=10),
+        chunks("first part", "second part", price=12),
+        chunks("first part, edited", price=12)
+    )
+
+    assert embedded == [["first part", "second part"], [], [], ["first part, edited"]]
+    assert [r["error"] for r in results] == [None] * 4
+    partition = store._partitions[1]
+    assert partition.ids == ["5_0"]
+    assert partition.metadata[0]["price"] == 12
+
+
+def test_sparse_index_rebuilds_from_stored_texts(tmp_path):
+    sparse = BM25Index("products-index")
+    sparse.replace_items(9, "product_id", {1: [{"text": "gone", "metadata": {"shop_id": 9, "product_id": 1, "chunk_index": 0}}]})
+
+    run_syncs(tmp_path, chunks("leather boots", "size 9 to 11", category="Shoes"), rebuild_into=sparse)
+
+    assert [m.id for m in sparse.query("boots", shop_id=1).matches] == ["5_0"]
+    assert sparse.categories(1) == {"Shoes"}
+    assert sparse.shop_ids() == {1}
+
+
+def vector_ids(store):
+    partition = store._partitions.get(1)
+    return sorted(partition.ids) if partition else []
+
+
+class FailingEmbedder(CountingEmbedder):
+    async def aembed(self, texts):
+        if any("broken" in text for text in texts):
+            raise RuntimeError("embedding quota exceeded")
+        return await super().aembed(texts)
+
+
+def test_failed_item_leaves_no_vectors_of_its_old_version(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/sync.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        store = NumpyVectorStore("products-index", FailingEmbedder(), dimension=3)
+        sparse = BM25Index("products-index")
+        try:
+            async with sessions() as db:
+                await sync_chunks(db, store, 1, "product_id", {5: chunks("a", "b", "c")}, sparse_index=sparse)
+            async with sessions() as db:
+                failed = await sync_chunks(db, store, 1, "product_id", {5: chunks("a", "broken b")}, sparse_index=sparse)
+            after_failure = vector_ids(store), sparse.empty
+            async with sessions() as db:
+                retried = await sync_chunks(db, store, 1, "product_id", {5: chunks("a")}, sparse_index=sparse)
+            return failed[5], after_failure, retried[5], vector_ids(store), sparse.shop_ids()
+        finally:
+            await engine.dispose()
+
+    failed, after_failure, retried, ids, sparse_shops = asyncio.run(run())
+    assert failed["error"]
+    assert after_failure == ([], True)
+    assert retried == {"chunks": 1, "embedded": 1, "error": None}
+    assert ids == ["5_0"]
+    assert sparse_shops == {1}
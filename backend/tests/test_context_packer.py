@@ -0,0 +1,53 @@
+from app.rag.context_packer import ContextPacker, merge_overlap
+
+
+def hit(product_id, chunk_index, text, name="Lamp"):
+    return {
+        "id": f"{product_id}_{chunk_index}",
+        "text": text,
+        "metadata": {"product_id": product_id, "chunk_index": chunk_index, "product_name": name}
+    }
+
+
+def words(n):
+    return " ".join(f"w{i}" for i in range(n))
+
+
+def test_merge_overlap_drops_the_shared_text_once():
+    assert merge_overlap("red cotton shirt, size M", "shirt, size M and L") == "red cotton shirt, size M and L"
+    # Shorter than min_overlap: treated as unrelated text
+    assert merge_overlap("red shirt", "shirt sale") == "red shirt shirt sale"
+    assert merge_overlap("abc", "xyz") == "abc xyz"
+
+
+def test_chunks_group_by_item_in_best_rank_order():
+    packer = ContextPacker(token_budget=1000)
+    context = packer.pack([
+        hit(2, 0, "Product: Fan\nQuiet desk fan", name="Fan"),
+        hit(1, 2, "dimmable warm light"),
+        hit(2, 1, "desk fan with 3 speeds", name="Fan"),
+        hit(1, 4, "ships in 2 days"),
+    ])
+
+    fan, lamp = context.split("\n\n")
+    assert fan == "Product: Fan\nQuiet desk fan with 3 speeds"
+    # Non-consecutive chunks are separated; later chunks get the item name
+    assert lamp == "Product: Lamp\n…\ndimmable warm light\n…\nships in 2 days"
+
+
+def test_items_that_do_not_fit_are_skipped_not_cut():
+    packer = ContextPacker(token_budget=40, count_tokens=lambda text: len(text.split()))
+    context = packer.pack([
+        hit(1, 0, words(30)),
+        hit(2, 0, words(20)),
+        hit(3, 0, words(5)),
+    ])
+
+    assert context.split("\n\n") == [words(30), words(5)]
+
+
+def test_oversized_best_item_is_truncated_to_the_budget():
+    packer = ContextPacker(token_budget=10)
+    context = packer.pack([hit(1, 0, "x" * 400), hit(2, 0, "short")])
+
+    assert context == "x" * 40
@@ -0,0 +1,26 @@
+import asyncio
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.db import Base, ensure_columns
+from app.models.chunk_hash import ChunkHash  # noqa: F401 (registers the table)
+
+
+def test_missing_nullable_columns_are_added(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/old.db")
+        async with engine.begin() as conn:
+            # chunk_hashes as created before texts were stored
+            await conn.execute(text(
+                "CREATE TABLE chunk_hashes (id INTEGER PRIMARY KEY, id_key VARCHAR NOT NULL, "
+                "item_id INTEGER NOT NULL, chunk_index INTEGER NOT NULL, "
+                "content_hash VARCHAR(64) NOT NULL, metadata_hash VARCHAR(64) NOT NULL)"
+            ))
+            await conn.run_sync(Base.metadata.create_all)
+            await ensure_columns(conn)
+            columns = await conn.run_sync(lambda c: {col["name"] for col in inspect(c).get_columns("chunk_hashes")})
+        await engine.dispose()
+        return columns
+
+    assert {"text", "chunk_metadata"} <= asyncio.run(run())
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from app.rag.embeddings.scheduler import EmbeddingQuota, EmbeddingScheduler
+
+
+class RecordingEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    async def aembed(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def scheduler(embedder, quota=None, **kwargs):
+    return EmbeddingScheduler(
+        embedder,
+        max_batch_size=kwargs.pop("max_batch_size", 10),
+        max_wait_ms=kwargs.pop("max_wait_ms", 20),
+        max_in_flight=4,
+        quota=quota or EmbeddingQuota(0, 0, 1)
+    )
+
+
+def test_quota_reports_wait_without_taking():
+    quota = EmbeddingQuota(rpm=60, tpm=0, burst_seconds=1)
+
+    assert quota.reserve(10) == 0
+    wait = quota.reserve(10)
+    assert 0.9 < wait <= 1.0
+    assert quota.reserve(10) > 0
+
+
+def test_concurrent_background_texts_share_a_batch():
+    embedder = RecordingEmbedder()
+    embeddings = scheduler(embedder)
+
+    async def run():
+        return await asyncio.gather(
+            embeddings.background.aembed(["a", "bb"]),
+            embeddings.background.aembed(["ccc"])
+        )
+
+    assert asyncio.run(run()) == [[[1.0], [2.0]], [[3.0]]]
+    assert embedder.batches == [["a", "bb", "ccc"]]
+
+
+def test_interactive_texts_are_not_packed_with_background():
+    embedder = RecordingEmbedder()
+    embeddings = scheduler(embedder, max_wait_ms=50)
+
+    async def run():
+        await asyncio.gather(
+            embeddings.background.aembed(["doc one", "doc two"]),
+            embeddings.interactive.aembed(["query"])
+        )
+
+    asyncio.run(run())
+    assert embedder.batches == [["query"], ["doc one", "doc two"]]
+
+
+def test_query_does_not_wait_for_throttled_background_batch():
+    embedder = RecordingEmbedder()
+    # 10 tokens a second, at most 20 banked; each document is 10 tokens
+    quota = EmbeddingQuota(rpm=0, tpm=600, burst_seconds=2)
+    embeddings = scheduler(embedder, quota=quota, max_batch_size=2, max_wait_ms=0)
+
+    async def run():
+        documents = asyncio.create_task(embeddings.background.aembed(["x" * 40] * 4))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        await embeddings.interactive.aembed(["query"])
+        elapsed = time.monotonic() - started
+        documents.cancel()
+        await embeddings.aclose()
+        return elapsed
+
+    # The second document batch needs ~2s of refill; the query only ~0.2s
+    assert asyncio.run(run()) < 0.6
+    assert embedder.batches[:2] == [["x" * 40] * 2, ["query"]]
@@ -0,0 +1,42 @@
+import pytest
+from google.genai import types
+
+from app.core.gemini import GeminiLLMClient
+
+PREFIX = "You are the shop assistant."
+
+
+def config_of(kwargs, system=PREFIX, cached_name=None):
+    return GeminiLLMClient._with_prefix(kwargs, system, cached_name)["config"]
+
+
+def test_prefix_becomes_system_instruction_or_cached_content():
+    assert config_of({}).system_instruction == PREFIX
+    cached = config_of({}, cached_name="cachedContents/abc")
+    assert cached.cached_content == "cachedContents/abc"
+    assert cached.system_instruction is None
+
+
+def test_caller_config_keeps_its_settings():
+    config = config_of({"config": types.GenerateContentConfig(temperature=0.1, response_mime_type="application/json")})
+    assert (config.temperature, config.response_mime_type) == (0.1, "application/json")
+    assert config.system_instruction == PREFIX
+
+    config = config_of({"config": {"max_output_tokens": 64}}, cached_name="cachedContents/abc")
+    assert (config.max_output_tokens, config.cached_content) == (64, "cachedContents/abc")
+
+
+def test_caller_system_instruction_follows_prefix_uncached():
+    config = config_of({"config": {"system_instruction": "Answer in Tagalog."}}, cached_name="cachedContents/abc")
+    assert config.system_instruction == [PREFIX, "Answer in Tagalog."]
+    assert config.cached_content is None
+
+
+def test_no_prefix_leaves_kwargs_alone():
+    kwargs = {"config": {"temperature": 0}}
+    assert GeminiLLMClient._with_prefix(kwargs, None, None) is kwargs
+
+
+def test_caller_cached_content_conflicts_with_prefix():
+    with pytest.raises(ValueError):
+        config_of({"config": {"cached_content": "cachedContents/theirs"}})
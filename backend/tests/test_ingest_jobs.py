@@ -0,0 +1,153 @@
+import asyncio
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base
+from app.models.product import ProductMinimal as ProductMinimalModel
+from app.rag.vectorstore.numpy_store import NumpyVectorStore
+from app.schemas.product import ProductRequest
+from app.services.ingest_jobs import IngestJobQueue
+from app.services.product_ingestor import ProductIngestor
+
+
+def queue(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/jobs.db")
+    return engine, IngestJobQueue(sessionmaker(engine, class_=AsyncSession, expire_on_commit=False), workers=1)
+
+
+def test_jobs_for_the_same_item_run_in_order(tmp_path):
+    async def run():
+        engine, jobs = queue(tmp_path)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        create = await jobs.enqueue(1, "product", "ingest", {"item": {"uid": "a"}})
+        delete = await jobs.enqueue(1, "product", "delete", {"uid": "a"})
+        other = await jobs.enqueue(1, "product", "update", {"item": {"uid": "b"}})
+
+        claimed = [(await jobs._claim()).id, (await jobs._claim()).id]
+        # The delete waits while the create is running
+        blocked = await jobs._claim()
+        await jobs._update(create.id, status="succeeded")
+        after = await jobs._claim()
+        await engine.dispose()
+        return claimed, blocked, after, (create.id, delete.id, other.id)
+
+    claimed, blocked, after, (create, delete, other) = asyncio.run(run())
+    assert claimed == [create, other]
+    assert blocked is None
+    assert after.id == delete
+
+
+def test_batch_blocks_later_jobs_of_its_shop_and_kind(tmp_path):
+    async def run():
+        engine, jobs = queue(tmp_path)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        batch = await jobs.enqueue(1, "product", "ingest_batch", {"items": [], "errors": []}, total=0)
+        await jobs.enqueue(1, "product", "update", {"item": {"uid": "a"}})
+        service = await jobs.enqueue(1, "service", "update", {"item": {"uid": "a"}})
+        other_shop = await jobs.enqueue(2, "product", "update", {"item": {"uid": "a"}})
+
+        claimed = [(await jobs._claim()).id for _ in range(3)]
+        blocked = await jobs._claim()
+        await engine.dispose()
+        return claimed, blocked, (batch.id, service.id, other_shop.id)
+
+    claimed, blocked, expected = asyncio.run(run())
+    assert claimed == list(expected)
+    assert blocked is None
+
+
+class Embedder:
+    async def aembed(self, texts):
+        return [[1.0, float(len(text)), 0.0] for text in texts]
+
+
+def test_reclaimed_ingest_upserts_instead_of_inserting_again(tmp_path):
+    item = {
+        "name": "Lamp", "description": "Desk lamp", "category": "Home", "price": 450.0,
+        "quantity": 3, "availability": True, "hasVariants": False, "sellerId": 1, "uid": "lamp-1"
+    }
+
+    async def run():
+        engine, jobs = queue(tmp_path)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        store = NumpyVectorStore("products-index", Embedder(), dimension=3)
+
+        job = await jobs.enqueue(1, "product", "ingest", {"item": item})
+        # First run inserted the row and vectors, then its worker died
+        async with jobs.session_factory() as db:
+            await ProductIngestor(1, db=db, vectorstore=store).preprocess_to_store_embedding(ProductRequest(**item))
+        job.attempts = 2
+        try:
+            async with jobs.session_factory() as db:
+                await jobs._ingest_item(job, ProductIngestor(1, db=db, vectorstore=store), ProductRequest(**item))
+                return (await db.execute(select(func.count()).select_from(ProductMinimalModel))).scalar_one()
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(run()) == 1
+
+
+def test_transient_failure_is_retried_after_a_backoff(tmp_path):
+    class Throttled(Exception):
+        status_code = 429
+
+    async def run():
+        engine, jobs = queue(tmp_path)
+        jobs.retry_seconds = 0.2
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        runs = []
+
+        async def execute(job):
+            runs.append(job.attempts)
+            if len(runs) == 1:
+                raise Throttled("quota exceeded")
+            return {"status": "succeeded", "succeeded": 1}
+
+        jobs._execute = execute
+        try:
+            job = await jobs.enqueue(1, "product", "delete", {"uid": "a"})
+            await jobs._run(await jobs._claim())
+            requeued = await jobs.get(job.id)
+            too_early = await jobs._claim()
+            await asyncio.sleep(0.25)
+            await jobs._run(await jobs._claim())
+            return requeued, too_early, await jobs.get(job.id), runs
+        finally:
+            await engine.dispose()
+
+    requeued, too_early, done, runs = asyncio.run(run())
+    assert (requeued.status, requeued.error) == ("queued", "quota exceeded")
+    assert too_early is None
+    assert (done.status, done.error, done.attempts) == ("succeeded", None, 2)
+    assert runs == [1, 2]
+
+
+def test_non_retryable_failure_is_final(tmp_path):
+    async def run():
+        engine, jobs = queue(tmp_path)
+        jobs.retry_seconds = 0
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        async def execute(job):
+            raise ValueError("bad payload")
+
+        jobs._execute = execute
+        try:
+            job = await jobs.enqueue(1, "product", "delete", {"uid": "a"})
+            await jobs._run(await jobs._claim())
+            return await jobs.get(job.id), await jobs._claim()
+        finally:
+            await engine.dispose()
+
+    failed, again = asyncio.run(run())
+    assert (failed.status, failed.error) == ("failed", "bad payload")
+    assert again is None
@@ -0,0 +1,46 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base
+from app.rag.vectorstore.numpy_store import NumpyVectorStore
+from app.schemas.product import ProductRequest
+from app.services.product_ingestor import ProductIngestor
+
+
+class Embedder:
+    async def aembed(self, texts):
+        return [[1.0, float(len(text)), 0.0] for text in texts]
+
+
+class AsyncOnlyStore(NumpyVectorStore):
+    def delete_by_product(self, shop_id, product_id):
+        raise AssertionError("blocking delete called from async code")
+
+
+def test_delete_removes_vectors_without_blocking_calls(tmp_path):
+    item = {
+        "name": "Lamp", "description": "Desk lamp", "category": "Home", "price": 450.0,
+        "quantity": 3, "availability": True, "hasVariants": False, "sellerId": 1, "uid": "lamp-1"
+    }
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/ingest.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        store = AsyncOnlyStore("products-index", Embedder(), dimension=3)
+        try:
+            async with sessions() as db:
+                ingestor = ProductIngestor(1, db=db, vectorstore=store)
+                await ingestor.preprocess_to_store_embedding(ProductRequest(**item))
+                indexed = len(store.query_by_vector([1.0, 0.0, 0.0], shop_id=1, top_k=10).matches)
+                await ingestor.delete_product_embedding("lamp-1")
+            return indexed, len(store.query_by_vector([1.0, 0.0, 0.0], shop_id=1, top_k=10).matches)
+        finally:
+            await engine.dispose()
+
+    indexed, remaining = asyncio.run(run())
+    assert indexed > 0
+    assert remaining == 0
@@ -0,0 +1,92 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base
+from app.models.chats import ChatMessage
+from app.services.message_sink import ChatMessageSink
+
+
+def message(n):
+    return {"user_id": "u1", "shop_id": 1, "role": "user", "message": f"m{n}"}
+
+
+async def stored(sessions):
+    async with sessions() as db:
+        return (await db.execute(select(ChatMessage.message).order_by(ChatMessage.id))).scalars().all()
+
+
+def run_with_db(tmp_path, work, create_tables=True):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/sink.db")
+        if create_tables:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        try:
+            return await work(engine, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_stop_flushes_queued_messages_in_batches(tmp_path):
+    async def work(engine, sessions):
+        sink = ChatMessageSink(sessions, max_queue=100, batch_size=3, durable=False)
+        batches = []
+        write = sink._write
+
+        async def recording_write(rows):
+            batches.append(len(rows))
+            await write(rows)
+        sink._write = recording_write
+
+        await sink.start()
+        for n in range(7):
+            await sink.add([message(n)])
+        queued = sink.stats()["queued"]
+        await sink.stop()
+        return queued, batches, await stored(sessions), sink.stats()
+
+    queued, batches, messages, stats = run_with_db(tmp_path, work)
+    assert queued > 0
+    assert max(batches) <= 3 and sum(batches) == 7
+    assert messages == [f"m{n}" for n in range(7)]
+    assert stats == {"queued": 0, "written": 7, "failed": 0}
+
+
+def test_writes_are_synchronous_when_not_running_or_durable(tmp_path):
+    async def work(engine, sessions):
+        sink = ChatMessageSink(sessions, durable=False)
+        await sink.add([message(0)])
+        before_start = await stored(sessions)
+        await sink.start()
+        await sink.add([message(1)], durable=True)
+        durable = await stored(sessions)
+        await sink.stop()
+        return before_start, durable
+
+    assert run_with_db(tmp_path, work) == (["m0"], ["m0", "m1"])
+
+
+def test_failed_batch_is_dropped_and_the_sink_keeps_going(tmp_path):
+    async def work(engine, sessions):
+        # No tables yet: every write fails
+        sink = ChatMessageSink(sessions, batch_size=10, durable=False)
+        await sink.start()
+        await sink.add([message(0), message(1)])
+        await sink._queue.join()
+        failed = sink.stats()["failed"]
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await sink.add([message(2)])
+        await sink.stop()
+        return failed, await stored(sessions), sink.stats()
+
+    failed, messages, stats = run_with_db(tmp_path, work, create_tables=False)
+    assert failed == 2
+    assert messages == ["m2"]
+    assert stats == {"queued": 0, "written": 1, "failed": 2}
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.metrics import stage, track_request
+from app.rag.embeddings.cached_embedder import CachingEmbedder, EmbeddingCacheBackend
+
+
+def stage_count(name, index="all", outcome="ok"):
+    labels = {"stage": name, "index": index, "outcome": outcome}
+    return REGISTRY.get_sample_value("rag_stage_seconds_count", labels) or 0.0
+
+
+def cache_events(cache, result):
+    return REGISTRY.get_sample_value("rag_cache_events_total", {"cache": cache, "result": result}) or 0.0
+
+
+def test_stage_records_outcome_labels():
+    before = [stage_count("t_stage"), stage_count("t_stage", "products-index", "error"), stage_count("t_stage", outcome="timeout")]
+
+    with stage("t_stage"):
+        pass
+    with pytest.raises(ValueError):
+        with stage("t_stage", "products-index"):
+            raise ValueError
+    with stage("t_stage") as running:
+        running.outcome = "timeout"
+
+    after = [stage_count("t_stage"), stage_count("t_stage", "products-index", "error"), stage_count("t_stage", outcome="timeout")]
+    assert [a - b for a, b in zip(after, before)] == [1, 1, 1]
+
+
+def test_cancelled_stage_is_labelled_cancelled():
+    before = stage_count("t_cancel", outcome="cancelled")
+
+    async def run():
+        async def slow():
+            with stage("t_cancel"):
+                await asyncio.sleep(10)
+        task = asyncio.create_task(slow())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert stage_count("t_cancel", outcome="cancelled") - before == 1
+
+
+def test_track_request_collects_nested_and_spawned_stages():
+    async def run():
+        with track_request() as timings:
+            with track_request() as nested:
+                with stage("t_route"):
+                    pass
+
+            async def query():
+                with stage("t_query", "products-index"):
+                    pass
+            await asyncio.create_task(query())
+        return timings, nested
+
+    timings, nested = asyncio.run(run())
+    assert nested is timings
+    assert set(timings.as_dict()) == {"t_route", "t_query:products-index"}
+
+
+def test_embedding_cache_hits_and_misses_are_exported():
+    class Embedder:
+        async def aembed(self, texts):
+            return [[float(len(text))] for text in texts]
+
+    class Backend(EmbeddingCacheBackend):
+        async def aget_many(self, keys):
+            return [[9.0] if "shared" in key else None for key in keys]
+
+        async def aset_many(self, items, ttl_seconds):
+            pass
+
+    embedder = CachingEmbedder(Embedder(), backend=Backend())
+    hits, misses = cache_events("embedding", "hit"), cache_events("embedding", "miss")
+
+    # miss + backend hit, then two local hits
+    asyncio.run(embedder.aembed(["red shirt", "shared query"]))
+    asyncio.run(embedder.aembed(["red shirt", "shared query"]))
+
+    assert cache_events("embedding", "miss") - misses == 1
+    assert cache_events("embedding", "hit") - hits == 3
@@ -0,0 +1,114 @@
+import asyncio
+import os
+
+from app.rag.vectorstore.numpy_store import NumpyVectorStore, matches_filter
+
+DIMENSION = 4
+AXES = {"red": [1, 0, 0, 0], "blue": [0, 1, 0, 0], "green": [0, 0, 1, 0], "gray": [0, 0, 0, 1]}
+
+
+class AxisEmbedder:
+    """
+    Embeds a text as the axis of its first word.
+    """
+
+    def embed(self, texts):
+        return [AXES[text.split()[0]] for text in texts]
+
+    async def aembed(self, texts):
+        return self.embed(texts)
+
+
+def chunk(product_id, text, shop_id=1, chunk_index=0, **metadata):
+    return {
+        "text": text,
+        "metadata": {"shop_id": shop_id, "product_id": product_id, "chunk_index": chunk_index, **metadata}
+    }
+
+
+def store(data_dir=None):
+    return NumpyVectorStore("products-index", AxisEmbedder(), dimension=DIMENSION, data_dir=data_dir)
+
+
+def ids(result):
+    return [match.id for match in result.matches]
+
+
+def seed(vectors):
+    errors = asyncio.run(vectors.aupsert_chunks([
+        chunk(1, "red shirt", min_price=300),
+        chunk(2, "blue shirt", min_price=900),
+        chunk(3, "green mug", shop_id=2, min_price=150)
+    ], "product_id"))
+    assert errors == [None, None, None]
+
+
+def test_query_is_scoped_to_shop_and_filter():
+    vectors = store()
+    seed(vectors)
+
+    assert ids(vectors.query_by_vector(AXES["red"], shop_id=1, top_k=2)) == ["1_0", "2_0"]
+    assert "3_0" not in ids(vectors.query_by_vector(AXES["green"], shop_id=1, top_k=5))
+    assert ids(vectors.query_by_vector(AXES["red"], shop_id=1, filter={"min_price": {"$gte": 500}})) == ["2_0"]
+    assert ids(vectors.query_by_vector(AXES["red"], shop_id=3)) == []
+
+
+def test_filter_operators():
+    metadata = {"category": "shoes", "min_price": 400, "availability": True}
+
+    assert matches_filter(metadata, {"category": {"$in": ["shoes", "bags"]}, "min_price": {"$lte": 500}})
+    assert not matches_filter(metadata, {"$or": [{"category": "bags"}, {"min_price": {"$gt": 400}}]})
+    assert not matches_filter({"category": "shoes"}, {"min_price": {"$lte": 500}})
+
+
+def test_upsert_replaces_and_delete_removes():
+    vectors = store()
+    seed(vectors)
+
+    asyncio.run(vectors.aupsert_chunks([chunk(1, "gray shirt", min_price=300)], "product_id"))
+    assert ids(vectors.query_by_vector(AXES["gray"], shop_id=1, top_k=1)) == ["1_0"]
+
+    asyncio.run(vectors.adelete_by_items(1, "product_id", [1]))
+    assert ids(vectors.query_by_vector(AXES["gray"], shop_id=1, top_k=5)) == ["2_0"]
+
+
+def test_reload_replays_the_log(tmp_path):
+    vectors = store(str(tmp_path))
+    seed(vectors)
+    asyncio.run(vectors.aupdate_chunk_metadata([chunk(2, "blue shirt", min_price=100)], "product_id"))
+    asyncio.run(vectors.adelete_ids(["3_0"]))
+
+    reloaded = store(str(tmp_path))
+
+    assert ids(reloaded.query_by_vector(AXES["blue"], shop_id=1, filter={"min_price": {"$lte": 200}})) == ["2_0"]
+    assert ids(reloaded.query_by_vector(AXES["green"], shop_id=2)) == []
+    # Only appended so far: no snapshot was written
+    assert not os.path.exists(tmp_path / "products-index" / "shop_1.npy")
+
+
+def test_compaction_writes_snapshot_and_drops_log(tmp_path):
+    vectors = store(str(tmp_path))
+    vectors.compact_min_bytes = 0
+    seed(vectors)
+    asyncio.run(vectors.aupsert_chunks([chunk(1, "gray shirt")], "product_id"))
+
+    files = os.listdir(tmp_path / "products-index")
+    assert "shop_1.npy" in files and "shop_1.log" not in files
+
+    asyncio.run(vectors.aupsert_chunks([chunk(4, "red hat")], "product_id"))
+    reloaded = store(str(tmp_path))
+    assert sorted(ids(reloaded.query_by_vector(AXES["red"], shop_id=1, top_k=5))) == ["1_0", "2_0", "4_0"]
+    assert ids(reloaded.query_by_vector(AXES["gray"], shop_id=1, top_k=1)) == ["1_0"]
+
+
+def test_torn_log_record_is_dropped(tmp_path):
+    vectors = store(str(tmp_path))
+    seed(vectors)
+    with open(tmp_path / "products-index" / "shop_1.log", "a") as f:
+        f.write('{"op": "delete", "ids": ["1_')
+
+    reloaded = store(str(tmp_path))
+
+    assert sorted(ids(reloaded.query_by_vector(AXES["red"], shop_id=1, top_k=5))) == ["1_0", "2_0"]
+    asyncio.run(reloaded.adelete_ids(["2_0"]))
+    assert ids(store(str(tmp_path)).query_by_vector(AXES["red"], shop_id=1, top_k=5)) == ["1_0"]
@@ -0,0 +1,70 @@
+import pytest
+
+from app.rag.query_filters import parse_query_filters
+from app.utils.price import parse_price_range
+
+
+def upper(value):
+    return {"min_price": {"$lte": value}}
+
+
+def lower(value):
+    return {"max_price": {"$gte": value}}
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("shoes under 500", upper(500)),
+    ("under 500 kids shoes", upper(500)),
+    ("shoes under 500 kasi wala akong pera", upper(500)),
+    ("under 1.5k", upper(1500)),
+    ("below ₱2,500", upper(2500)),
+    ("less than 1 k", upper(1000)),
+    ("over 800", lower(800)),
+    ("between 1k and 2,500", {"$and": [upper(2500), lower(1000)]}),
+    ("from ₱300 to 150", {"$and": [upper(300), lower(150)]}),
+    ("price from 300 to 500", {"$and": [upper(500), lower(300)]}),
+    ("phones from 2020 to 2023", None),
+    ("between 4 and 5", None),
+    ("up to 1500 pesos", upper(1500)),
+    ("up to ₱800", upper(800)),
+    ("budget up to 2000", upper(2000)),
+    ("within 3k", upper(3000)),
+    ("within 2 days", None),
+    ("up to 3 pcs", None),
+    ("can you deliver within 5", None),
+    ("bukas kayo hanggang 5pm", None),
+    ("phones up to 128gb", None),
+    ("from 2 to 5 days", None),
+    ("under 5 kg", None),
+    ("below 5 stars", None),
+    ("rated below 4.5 stars under 800", upper(800)),
+    ("less than 50%", None),
+    ("do you have iphone 13", None),
+])
+def test_price_constraints(query, expected):
+    assert parse_query_filters(query) == expected
+
+
+@pytest.mark.parametrize("query, categories, expected", [
+    ("any shoes available", ["Shoes", "Bags"], {"$and": [
+        {"category": {"$in": ["Shoes"]}}, {"availability": {"$eq": True}}
+    ]}),
+    ("electronics below 1000", ["Electronics"], {"$and": [
+        upper(1000), {"category": {"$in": ["Electronics"]}}
+    ]}),
+    ("is the iphone available?", [], None),
+])
+def test_category_and_availability(query, categories, expected):
+    assert parse_query_filters(query, categories) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("500", (500, 500)),
+    ("500-1,200", (500, 1200)),
+    ("₱500 to ₱1.2k", (500, 1200)),
+    ("500 kada oras", (500, 500)),
+    ("ask for a quote", None),
+    (None, None),
+])
+def test_price_range(text, expected):
+    assert parse_price_range(text) == expected
@@ -0,0 +1,60 @@
+import asyncio
+
+from app.rag.agents.response_generation_agent import GENERATION_ERROR_MESSAGE
+from app.services.rag_chat import RAGService
+
+
+class RecordingSink:
+    def __init__(self):
+        self.rows = []
+
+    async def add(self, rows, durable=False):
+        self.rows.extend(rows)
+
+
+class ScriptedPipeline:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    async def astream(self, shop_id, query):
+        for token in self.tokens:
+            yield token
+
+    async def arun(self, shop_id, query):
+        return {"answer": "".join(self.tokens)}
+
+
+def saved(tokens, consume=None):
+    sink = RecordingSink()
+    service = RAGService(pipeline=ScriptedPipeline(tokens), db=None, sink=sink)
+
+    async def run():
+        stream = service.stream_chat(shop_id=1, query="q", user_id="u")
+        if consume is None:
+            return [token async for token in stream]
+        received = [await stream.__anext__() for _ in range(consume)]
+        await stream.aclose()
+        return received
+
+    asyncio.run(run())
+    return [(row["role"], row["message"]) for row in sink.rows]
+
+
+def test_stream_saves_full_answer():
+    assert saved(["Hello", " there"]) == [("user", "q"), ("assistant", "Hello there")]
+
+
+def test_stream_skips_failed_generation():
+    assert saved(["Partial", "\n\n" + GENERATION_ERROR_MESSAGE]) == [("user", "q")]
+    assert saved([GENERATION_ERROR_MESSAGE]) == [("user", "q")]
+
+
+def test_stream_saves_what_was_sent_when_client_disconnects():
+    assert saved(["One", " two", " three"], consume=2) == [("user", "q"), ("assistant", "One two")]
+
+
+def test_chat_skips_failed_generation():
+    sink = RecordingSink()
+    service = RAGService(pipeline=ScriptedPipeline([GENERATION_ERROR_MESSAGE]), db=None, sink=sink)
+    asyncio.run(service.chat(shop_id=1, query="q", user_id="u"))
+    assert [row["role"] for row in sink.rows] == ["user"]
@@ -0,0 +1,16 @@
+import pytest
+
+from app.core.registry import ClientRegistry, RegistryNotReadyError, PRODUCTS_INDEX
+
+
+def test_uninitialized_registry_fails_fast():
+    registry = ClientRegistry()
+
+    with pytest.raises(RegistryNotReadyError):
+        registry.store(PRODUCTS_INDEX)
+    with pytest.raises(RegistryNotReadyError):
+        registry.sparse_index(PRODUCTS_INDEX)
+    with pytest.raises(RegistryNotReadyError):
+        registry.get_pipeline()
+    # Nothing was built behind the caller's back
+    assert registry.genai_client is None
@@ -0,0 +1,221 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.resilience import CallPolicy, CircuitBreaker, CircuitOpenError, ResilientCaller
+
+
+def caller(name, breaker=None, **policy):
+    defaults = dict(attempt_timeout=1.0, deadline=2.0, retries=2, backoff_base=0.001, backoff_max=0.001)
+    return ResilientCaller(name, CallPolicy(**{**defaults, **policy}), breaker=breaker)
+
+
+async def hang():
+    await asyncio.sleep(10)
+
+
+def test_retries_transient_errors():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert asyncio.run(caller("retry").acall(flaky)) == "ok"
+    assert len(calls) == 3
+
+
+def test_caller_errors_are_not_retried_and_do_not_trip():
+    breaker = CircuitBreaker("caller-errors", failure_threshold=1, reset_seconds=60)
+    calls = []
+
+    async def bad():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(caller("caller-errors", breaker).acall(bad))
+    assert len(calls) == 1
+    assert breaker.state == "closed"
+
+
+def test_breaker_opens_then_half_open_trial_closes_it():
+    breaker = CircuitBreaker("open-close", failure_threshold=2, reset_seconds=0.05)
+    resilient = caller("open-close", breaker, attempt_timeout=0.01, deadline=0.02, retries=0)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                await resilient.acall(hang)
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await resilient.acall(hang)
+        await asyncio.sleep(0.06)
+
+        async def ok():
+            return 1
+
+        assert await resilient.acall(ok) == 1
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_trial_releases_half_open_breaker():
+    breaker = CircuitBreaker("cancelled-trial", failure_threshold=1, reset_seconds=0.05)
+    resilient = caller("cancelled-trial", breaker, attempt_timeout=0.01, deadline=0.02, retries=0)
+
+    async def scenario():
+        with pytest.raises(TimeoutError):
+            await resilient.acall(hang)
+        await asyncio.sleep(0.06)
+        assert breaker.state == "half_open"
+
+        trial = asyncio.create_task(caller("cancelled-trial", breaker).acall(hang))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        async def ok():
+            return "recovered"
+
+        # A new trial is admitted instead of short-circuiting forever
+        assert await resilient.acall(ok) == "recovered"
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_stream_trial_releases_half_open_breaker():
+    breaker = CircuitBreaker("cancelled-stream", failure_threshold=1, reset_seconds=0.05)
+    resilient = caller("cancelled-stream", breaker, attempt_timeout=0.01, deadline=0.02, retries=0)
+
+    async def open_hanging():
+        await hang()
+
+    async def consume():
+        return [item async for item in caller("cancelled-stream", breaker).astream(open_hanging)]
+
+    async def scenario():
+        with pytest.raises(TimeoutError):
+            await resilient.acall(hang)
+        await asyncio.sleep(0.06)
+
+        trial = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert breaker.allow() == "trial"
+
+    asyncio.run(scenario())
+
+
+def test_stream_retry_gets_its_own_attempt_timeout():
+    attempts = []
+
+    async def open_stream():
+        attempts.append(1)
+
+        async def items():
+            if len(attempts) == 1:
+                await hang()
+            await asyncio.sleep(0.05)
+            yield "a"
+            yield "b"
+
+        return items()
+
+    async def consume():
+        resilient = caller("stream-retry", attempt_timeout=0.2, deadline=2.0)
+        return [item async for item in resilient.astream(open_stream)]
+
+    assert asyncio.run(consume()) == ["a", "b"]
+    assert len(attempts) == 2
+
+
+def test_hedge_wins_over_slow_attempt():
+    resilient = caller("hedge", hedge_percentile=50, hedge_min_delay=0.01)
+    for _ in range(resilient.latencies.min_samples):
+        resilient.latencies.record(0.005)
+    calls = []
+
+    async def first_slow():
+        calls.append(1)
+        await asyncio.sleep(1.0 if len(calls) == 1 else 0.005)
+        return len(calls)
+
+    async def timed():
+        started = time.monotonic()
+        result = await resilient.acall(first_slow)
+        return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(timed())
+    assert result == 2
+    assert elapsed < 0.5
+
+
+def test_sync_call_times_out_and_retries():
+    calls = []
+
+    def slow_then_fast():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.3)
+        return "done"
+
+    resilient = caller("sync", attempt_timeout=0.1, deadline=1.0)
+    assert resilient.call(slow_then_fast) == "done"
+    assert len(calls) == 2
+
+
+def test_no_attempt_starts_once_backoff_used_up_the_deadline():
+    calls = []
+
+    class Unavailable(Exception):
+        status_code = 503
+
+    async def flaky():
+        calls.append(1)
+        raise Unavailable("try later")
+
+    resilient = caller("deadline-backoff", deadline=0.05, retries=3)
+    # Every backoff is cut to what is left of the deadline
+    resilient._backoff = lambda attempt: 10.0
+
+    with pytest.raises(TimeoutError) as error:
+        asyncio.run(resilient.acall(flaky))
+    assert len(calls) == 1
+    assert isinstance(error.value.__cause__, Unavailable)
+
+
+def test_stream_closes_provider_iterator_when_cut_short():
+    closed = []
+
+    async def open_stream():
+        async def items():
+            try:
+                yield "a"
+                yield "b"
+                await hang()
+            finally:
+                closed.append(1)
+        return items()
+
+    async def scenario():
+        # Consumer stops after the first item
+        stream = caller("stream-close").astream(open_stream)
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+        assert closed == [1]
+
+        # A later item misses its attempt deadline
+        with pytest.raises(asyncio.TimeoutError):
+            [item async for item in caller("stream-close", attempt_timeout=0.05).astream(open_stream)]
+        assert closed == [1, 1]
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.rag.agents.index_routing_agent import IndexRoutingAgent
+from app.rag.agents.local_index_router import LocalIndexRouter
+from app.rag.pipeline import AgenticRAGPipeline
+
+EXEMPLARS = {"products-index": ["product"], "services-index": ["service"]}
+KEYWORDS = {"products-index": {"buy"}, "services-index": {"book"}}
+VECTORS = {"product": [1.0, 0.0], "service": [0.0, 1.0]}
+
+
+class Embedder:
+    def embed(self, texts):
+        return [VECTORS[text] for text in texts]
+
+
+class Store:
+    embedder = Embedder()
+
+
+def pipeline():
+    rag = AgenticRAGPipeline(
+        {"products-index": Store(), "services-index": Store()},
+        llm=None,
+        reranker=object(),
+        speculative_retrieval=True
+    )
+    rag.routing_agent = IndexRoutingAgent(
+        None, local_router=LocalIndexRouter(Embedder(), EXEMPLARS, KEYWORDS), confidence_threshold=0.6
+    )
+    return rag
+
+
+def test_confident_local_decision_skips_speculation():
+    rag = pipeline()
+    # Centroids not built yet: the router may still need the LLM
+    assert rag._should_speculate("some query", [1.0, 0.0])
+
+    rag.routing_agent.local_router.ensure_centroids()
+    assert rag.routing_agent.decision_without_llm("some query", [1.0, 0.0]) == ["products-index"]
+    assert not rag._should_speculate("some query", [1.0, 0.0])
+    # Too close to call locally: the LLM decides, so speculate meanwhile
+    assert rag._should_speculate("some query", [0.7, 0.69])
+
+
+def test_cached_decision_skips_speculation():
+    rag = pipeline()
+    rag.routing_agent._remember(rag.routing_agent._cache_key("book a cleaning"), ["services-index"])
+
+    assert rag.routing_agent.decision_without_llm("book a cleaning") == ["services-index"]
+    assert not rag._should_speculate("book a cleaning", [0.7, 0.69])
+    assert rag.routing_agent.path_counts == {}
+
+
+def test_concurrent_first_requests_build_centroids_once():
+    class SlowEmbedder(Embedder):
+        calls = 0
+
+        async def aembed(self, texts):
+            SlowEmbedder.calls += 1
+            await asyncio.sleep(0.01)
+            return self.embed(texts)
+
+    router = LocalIndexRouter(SlowEmbedder(), EXEMPLARS, KEYWORDS)
+
+    async def run():
+        await asyncio.gather(*[router.aensure_centroids() for _ in range(5)])
+
+    asyncio.run(run())
+    assert SlowEmbedder.calls == len(EXEMPLARS)
+    assert set(router.centroids) == set(EXEMPLARS)
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from app.rag.cache.semantic_cache import SemanticAnswerCache, ShopVersions
+
+VECTOR = [1.0, 0.0, 0.0]
+RESULT = {"answer": "cached"}
+
+
+def cache(versions=None, settle_seconds=0.0):
+    return SemanticAnswerCache(
+        threshold=0.9, max_entries_per_shop=8, ttl_seconds=60,
+        settle_seconds=settle_seconds, versions=versions or ShopVersions()
+    )
+
+
+def test_hit_for_similar_query_only():
+    answers = cache()
+    answers.store(1, VECTOR, RESULT)
+
+    assert answers.lookup(1, [0.99, 0.05, 0.0]) == RESULT
+    assert answers.lookup(1, [0.0, 1.0, 0.0]) is None
+    assert answers.lookup(2, VECTOR) is None
+
+
+def test_invalidation_in_another_process_drops_entries():
+    # Two workers sharing one version store (Redis in production)
+    shared = ShopVersions()
+    api, ingest = cache(shared), cache(shared)
+    api.store(1, VECTOR, RESULT)
+
+    asyncio.run(ingest.ainvalidate_shop(1))
+
+    assert api.lookup(1, VECTOR) is None
+    assert api.stats()["entries"] == 0
+
+
+def test_answer_computed_before_invalidation_is_not_stored():
+    answers = cache()
+    version = answers.version(1)
+    answers.invalidate_shop(1)
+
+    answers.store(1, VECTOR, RESULT, version=version)
+
+    assert answers.lookup(1, VECTOR) is None
+
+
+def test_nothing_cached_while_shop_settles():
+    answers = cache(settle_seconds=0.05)
+    answers.invalidate_shop(1)
+
+    answers.store(1, VECTOR, RESULT, version=answers.version(1))
+    assert answers.lookup(1, VECTOR) is None
+
+    time.sleep(0.06)
+    answers.store(1, VECTOR, RESULT, version=answers.version(1))
+    assert answers.lookup(1, VECTOR) == RESULT
+
+
+def test_unreachable_version_store_disables_cache():
+    class Down(ShopVersions):
+        def get(self, shop_id):
+            raise ConnectionError("redis down")
+
+    answers = cache(Down())
+    answers.store(1, VECTOR, RESULT)
+
+    assert answers.version(1) is None
+    assert answers.lookup(1, VECTOR) is None
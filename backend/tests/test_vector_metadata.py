@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.rag.vectorstore.vectore_store import PineconeVectorStore
+from scripts.backfill_price_bounds import price_bounds
+
+
+class FakeAsyncIndex:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def fetch(self, ids):
+        return SimpleNamespace(vectors={
+            _id: SimpleNamespace(values=self.vectors[_id]["values"]) for _id in ids if _id in self.vectors
+        })
+
+    async def upsert(self, vectors):
+        for vector in vectors:
+            self.vectors[vector["id"]] = vector
+
+
+def store_with(vectors):
+    store = PineconeVectorStore.__new__(PineconeVectorStore)
+    store._async_index = FakeAsyncIndex(vectors)
+    return store
+
+
+def chunk(service_id, metadata):
+    return {"text": "t", "metadata": {"service_id": service_id, "chunk_index": 0, **metadata}}
+
+
+def test_metadata_update_replaces_removed_keys():
+    store = store_with({"7_0": {"values": [0.1, 0.2], "metadata": {"min_price": 500, "max_price": 900}}})
+
+    errors = asyncio.run(store.aupdate_chunk_metadata([chunk(7, {"price_range": "ask us"})], "service_id"))
+
+    assert errors == [None]
+    stored = store._async_index.vectors["7_0"]
+    assert stored["values"] == [0.1, 0.2]
+    assert "min_price" not in stored["metadata"]
+
+
+def test_metadata_update_of_missing_vector_is_an_error():
+    store = store_with({})
+
+    errors = asyncio.run(store.aupdate_chunk_metadata([chunk(7, {})], "service_id"))
+
+    assert errors[0] is not None and "not found" in errors[0]
+
+
+def test_backfill_bounds_from_existing_metadata():
+    product = {
+        "base_price": 1200.0,
+        "has_variants": True,
+        "variant_summary": "Variant: S | Price: 999.0 | Stock: 2\nVariant: L | Price: 1500.0 | Stock: 0"
+    }
+    assert price_bounds(product) == (999.0, 1500.0)
+    assert price_bounds({"base_price": 300, "has_variants": False, "variant_summary": ""}) == (300.0, 300.0)
+    assert price_bounds({"price_range": "₱500 - ₱1,200"}) == (500.0, 1200.0)
+    assert price_bounds({"price_range": ""}) is None